@@ -0,0 +1,38 @@
+"""user_streaks table + users.timezone
+
+Revision ID: 0a1b2c3d4e5f
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-17 19:00:00.000000
+
+既存データは `python -m src.jobs rebuild-streaks` で study_sessions からバックフィルする。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0a1b2c3d4e5f'
+down_revision: Union[str, None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('timezone', sa.String(length=64), nullable=True))
+    op.create_table(
+        'user_streaks',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=False),
+        sa.Column('longest_streak', sa.Integer(), nullable=False),
+        sa.Column('last_active_date', sa.Date(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_streaks')
+    op.drop_column('users', 'timezone')
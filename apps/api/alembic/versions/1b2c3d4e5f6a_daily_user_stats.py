@@ -0,0 +1,39 @@
+"""daily_user_stats table (per-user/per-course daily review rollup)
+
+Revision ID: 1b2c3d4e5f6a
+Revises: 0a1b2c3d4e5f
+Create Date: 2026-10-17 20:00:00.000000
+
+既存データは `python -m src.jobs rebuild-daily-stats` で review_logs からバックフィルする。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '1b2c3d4e5f6a'
+down_revision: Union[str, None] = '0a1b2c3d4e5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_user_stats',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('course_id', sa.UUID(), nullable=False),
+        sa.Column('stat_date', sa.Date(), nullable=False),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('time_spent_ms', sa.BigInteger(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'course_id', 'stat_date', name='uq_daily_user_stats_user_course_date'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_user_stats')
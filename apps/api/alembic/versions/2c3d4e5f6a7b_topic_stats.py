@@ -0,0 +1,68 @@
+"""topic_stats table + review_logs.retrievability_before
+
+Revision ID: 2c3d4e5f6a7b
+Revises: 1b2c3d4e5f6a
+Create Date: 2026-10-17 21:00:00.000000
+
+既存データは `python -m src.jobs rebuild-topic-stats` で review_logs・question_attempts から
+バックフィルする (既存 review_logs の retrievability_before は NULL)。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '2c3d4e5f6a7b'
+down_revision: Union[str, None] = '1b2c3d4e5f6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_CARD_MASTERY = (
+    "CASE WHEN card_count > 0 THEN GREATEST(0, 1 - lapses::float8 / (3 * card_count))"
+    " * CASE WHEN recall_reviews > 0 THEN retrievability_sum / recall_reviews ELSE 1 END END"
+)
+_QUESTION_ACCURACY = (
+    "CASE WHEN question_attempts > 0 THEN question_correct::float8 / question_attempts END"
+)
+TOPIC_MASTERY_SQL = (
+    f"CASE WHEN ({_CARD_MASTERY}) IS NOT NULL AND ({_QUESTION_ACCURACY}) IS NOT NULL"
+    f" THEN 0.7 * ({_CARD_MASTERY}) + 0.3 * ({_QUESTION_ACCURACY})"
+    f" ELSE COALESCE({_CARD_MASTERY}, {_QUESTION_ACCURACY}, 0) END"
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        'review_logs', sa.Column('retrievability_before', sa.Numeric(precision=8, scale=6), nullable=True)
+    )
+    op.create_table(
+        'topic_stats',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('topic_id', sa.UUID(), nullable=False),
+        sa.Column('course_id', sa.UUID(), nullable=False),
+        sa.Column('card_count', sa.Integer(), nullable=False),
+        sa.Column('lapses', sa.Integer(), nullable=False),
+        sa.Column('again_count', sa.Integer(), nullable=False),
+        sa.Column('hard_count', sa.Integer(), nullable=False),
+        sa.Column('good_count', sa.Integer(), nullable=False),
+        sa.Column('easy_count', sa.Integer(), nullable=False),
+        sa.Column('retrievability_sum', sa.Float(), nullable=False),
+        sa.Column('recall_reviews', sa.Integer(), nullable=False),
+        sa.Column('question_attempts', sa.Integer(), nullable=False),
+        sa.Column('question_correct', sa.Integer(), nullable=False),
+        sa.Column('mastery_score', sa.Float(), sa.Computed(TOPIC_MASTERY_SQL, persisted=True), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['topic_id'], ['topics.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'topic_id', name='uq_topic_stats_user_topic'),
+    )
+    op.create_index('ix_topic_stats_user_mastery', 'topic_stats', ['user_id', 'mastery_score'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_topic_stats_user_mastery', table_name='topic_stats')
+    op.drop_table('topic_stats')
+    op.drop_column('review_logs', 'retrievability_before')
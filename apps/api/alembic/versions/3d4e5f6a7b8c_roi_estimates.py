@@ -0,0 +1,43 @@
+"""roi_estimates table
+
+Revision ID: 3d4e5f6a7b8c
+Revises: 2c3d4e5f6a7b
+Create Date: 2026-10-17 22:00:00.000000
+
+推定値は `python -m src.jobs precompute-roi` (夜間) または初回の API 呼び出しで作成される。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3d4e5f6a7b8c'
+down_revision: Union[str, None] = '2c3d4e5f6a7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'roi_estimates',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('course_id', sa.UUID(), nullable=False),
+        sa.Column('total_cards', sa.Integer(), nullable=False),
+        sa.Column('mastered_cards', sa.Integer(), nullable=False),
+        sa.Column('expected_reviews', sa.Float(), nullable=False),
+        sa.Column('median_response_ms', sa.Integer(), nullable=False),
+        sa.Column('p90_response_ms', sa.Integer(), nullable=False),
+        sa.Column('estimated_hours_remaining', sa.Float(), nullable=False),
+        sa.Column('total_study_hours', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'course_id', name='uq_roi_estimates_user_course'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('roi_estimates')
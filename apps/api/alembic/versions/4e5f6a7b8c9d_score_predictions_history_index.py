@@ -0,0 +1,31 @@
+"""score_predictions (user_id, course_id, predicted_at) index
+
+Revision ID: 4e5f6a7b8c9d
+Revises: 3d4e5f6a7b8c
+Create Date: 2026-10-17 23:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4e5f6a7b8c9d'
+down_revision: Union[str, None] = '3d4e5f6a7b8c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_score_predictions_user_course_time',
+        'score_predictions',
+        ['user_id', 'course_id', 'predicted_at'],
+        unique=False,
+    )
+    # 複合インデックスの先頭列で代替できるため削除
+    op.drop_index('ix_score_predictions_user_id', table_name='score_predictions')
+
+
+def downgrade() -> None:
+    op.create_index('ix_score_predictions_user_id', 'score_predictions', ['user_id'], unique=False)
+    op.drop_index('ix_score_predictions_user_course_time', table_name='score_predictions')
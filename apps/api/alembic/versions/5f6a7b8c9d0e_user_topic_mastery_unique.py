@@ -0,0 +1,34 @@
+"""user_topic_mastery (user_id, topic_id) unique
+
+Revision ID: 5f6a7b8c9d0e
+Revises: 4e5f6a7b8c9d
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5f6a7b8c9d0e'
+down_revision: Union[str, None] = '4e5f6a7b8c9d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 同時レビューで作られた重複行は、レビュー数の最も多い行だけを残す
+    op.execute(
+        "DELETE FROM user_topic_mastery a USING user_topic_mastery b "
+        "WHERE a.user_id = b.user_id AND a.topic_id = b.topic_id "
+        "AND (a.total_reviews, a.updated_at, a.id) < (b.total_reviews, b.updated_at, b.id)"
+    )
+    op.create_unique_constraint(
+        'uq_user_topic_mastery_user_topic', 'user_topic_mastery', ['user_id', 'topic_id']
+    )
+    # 一意制約のインデックスの先頭列で代替できるため削除
+    op.drop_index('ix_user_topic_mastery_user_id', table_name='user_topic_mastery')
+
+
+def downgrade() -> None:
+    op.create_index('ix_user_topic_mastery_user_id', 'user_topic_mastery', ['user_id'], unique=False)
+    op.drop_constraint('uq_user_topic_mastery_user_topic', 'user_topic_mastery', type_='unique')
@@ -0,0 +1,48 @@
+"""topic_closure table (トピック階層の閉包テーブル)
+
+Revision ID: 6a7b8c9d0e1f
+Revises: 5f6a7b8c9d0e
+Create Date: 2026-10-18 01:00:00.000000
+
+既存トピックの閉包は upgrade 内で topics.parent_id から再帰CTEで構築する。
+以降は `python -m src.jobs rebuild-topic-closure` で再構築できる。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6a7b8c9d0e1f'
+down_revision: Union[str, None] = '5f6a7b8c9d0e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'topic_closure',
+        sa.Column('ancestor_id', sa.UUID(), nullable=False),
+        sa.Column('descendant_id', sa.UUID(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['topics.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['topics.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+    )
+    op.create_index(
+        'ix_topic_closure_descendant_ancestor', 'topic_closure', ['descendant_id', 'ancestor_id'], unique=False
+    )
+    op.execute(
+        "WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS ("
+        " SELECT id, id, 0 FROM topics"
+        " UNION ALL"
+        " SELECT tree.ancestor_id, topics.id, tree.depth + 1"
+        " FROM tree JOIN topics ON topics.parent_id = tree.descendant_id"
+        ") INSERT INTO topic_closure (ancestor_id, descendant_id, depth)"
+        " SELECT ancestor_id, descendant_id, depth FROM tree"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_topic_closure_descendant_ancestor', table_name='topic_closure')
+    op.drop_table('topic_closure')
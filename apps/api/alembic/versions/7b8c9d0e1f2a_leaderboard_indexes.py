@@ -0,0 +1,28 @@
+"""leaderboard indexes (user_xp.total_xp, xp_logs.earned_at)
+
+Revision ID: 7b8c9d0e1f2a
+Revises: 6a7b8c9d0e1f
+Create Date: 2026-10-18 02:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7b8c9d0e1f2a'
+down_revision: Union[str, None] = '6a7b8c9d0e1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_xp_total_xp', 'user_xp', ['total_xp'], unique=False)
+    # 期間別ランキングの集計をインデックスのみで行う
+    op.create_index(
+        'ix_xp_logs_earned_at', 'xp_logs', ['earned_at'], unique=False, postgresql_include=['user_id', 'amount']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_xp_logs_earned_at', table_name='xp_logs')
+    op.drop_index('ix_user_xp_total_xp', table_name='user_xp')
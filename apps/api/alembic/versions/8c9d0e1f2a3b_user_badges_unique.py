@@ -0,0 +1,32 @@
+"""user_badges (user_id, badge_id) unique
+
+Revision ID: 8c9d0e1f2a3b
+Revises: 7b8c9d0e1f2a
+Create Date: 2026-10-18 03:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8c9d0e1f2a3b'
+down_revision: Union[str, None] = '7b8c9d0e1f2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 重複付与されたバッジは最初の1件だけを残す
+    op.execute(
+        "DELETE FROM user_badges a USING user_badges b "
+        "WHERE a.user_id = b.user_id AND a.badge_id = b.badge_id "
+        "AND (a.earned_at, a.id) > (b.earned_at, b.id)"
+    )
+    op.create_unique_constraint('uq_user_badges_user_badge', 'user_badges', ['user_id', 'badge_id'])
+    # 一意制約のインデックスの先頭列で代替できるため削除
+    op.drop_index('ix_user_badges_user_id', table_name='user_badges')
+
+
+def downgrade() -> None:
+    op.create_index('ix_user_badges_user_id', 'user_badges', ['user_id'], unique=False)
+    op.drop_constraint('uq_user_badges_user_badge', 'user_badges', type_='unique')
@@ -0,0 +1,35 @@
+"""daily_missions (user_id, mission_date, mission_type) unique
+
+Revision ID: 9d0e1f2a3b4c
+Revises: 8c9d0e1f2a3b
+Create Date: 2026-10-18 04:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9d0e1f2a3b4c'
+down_revision: Union[str, None] = '8c9d0e1f2a3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 同時生成で重複したミッションは、進捗の最も進んだ1件だけを残す
+    op.execute(
+        "DELETE FROM daily_missions a USING daily_missions b "
+        "WHERE a.user_id = b.user_id AND a.mission_date = b.mission_date "
+        "AND a.mission_type = b.mission_type "
+        "AND (a.is_completed, a.current_value, a.id) < (b.is_completed, b.current_value, b.id)"
+    )
+    op.create_unique_constraint(
+        'uq_daily_missions_user_date_type', 'daily_missions', ['user_id', 'mission_date', 'mission_type']
+    )
+    # 一意制約のインデックスの先頭列で代替できるため削除
+    op.drop_index('ix_daily_missions_user_id', table_name='daily_missions')
+
+
+def downgrade() -> None:
+    op.create_index('ix_daily_missions_user_id', 'daily_missions', ['user_id'], unique=False)
+    op.drop_constraint('uq_daily_missions_user_date_type', 'daily_missions', type_='unique')
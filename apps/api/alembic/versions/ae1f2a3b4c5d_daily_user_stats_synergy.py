@@ -0,0 +1,29 @@
+"""daily_user_stats.synergy_reviews (badge totals from the daily rollup)
+
+Revision ID: ae1f2a3b4c5d
+Revises: 9d0e1f2a3b4c
+Create Date: 2026-10-18 12:00:00.000000
+
+既存データは `python -m src.jobs rebuild-daily-stats` で review_logs からバックフィルする。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'ae1f2a3b4c5d'
+down_revision: Union[str, None] = '9d0e1f2a3b4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'daily_user_stats',
+        sa.Column('synergy_reviews', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('daily_user_stats', 'synergy_reviews')
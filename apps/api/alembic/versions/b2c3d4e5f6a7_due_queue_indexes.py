@@ -0,0 +1,40 @@
+"""due queue indexes + card_reviews.course_id
+
+Revision ID: b2c3d4e5f6a7
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c3d4e5f6a7'
+down_revision: Union[str, None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # cards.course_id を非正規化 (コース別復習キューでJOINを不要にする)
+    op.add_column('card_reviews', sa.Column('course_id', sa.UUID(), sa.ForeignKey('courses.id'), nullable=True))
+    op.execute(
+        "UPDATE card_reviews SET course_id = cards.course_id "
+        "FROM cards WHERE cards.id = card_reviews.card_id"
+    )
+    op.alter_column('card_reviews', 'course_id', nullable=False)
+
+    op.create_index('ix_card_reviews_user_due_state', 'card_reviews', ['user_id', 'due', 'state'], unique=False)
+    op.create_index(
+        'ix_card_reviews_user_course_due_state', 'card_reviews', ['user_id', 'course_id', 'due', 'state'], unique=False
+    )
+    # 複合インデックスの先頭列で代替できるため削除
+    op.drop_index('ix_card_reviews_user_id', table_name='card_reviews')
+
+
+def downgrade() -> None:
+    op.create_index('ix_card_reviews_user_id', 'card_reviews', ['user_id'], unique=False)
+    op.drop_index('ix_card_reviews_user_course_due_state', table_name='card_reviews')
+    op.drop_index('ix_card_reviews_user_due_state', table_name='card_reviews')
+    op.drop_column('card_reviews', 'course_id')
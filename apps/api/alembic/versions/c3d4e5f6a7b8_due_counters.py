@@ -0,0 +1,41 @@
+"""due_counters table (per-user/per-course due-day buckets)
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d4e5f6a7b8'
+down_revision: Union[str, None] = 'b2c3d4e5f6a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'due_counters',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('course_id', sa.UUID(), nullable=False),
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'course_id', 'due_date', name='uq_due_counters_user_course_date'),
+    )
+    # 既存 CardReview からバックフィル
+    op.execute(
+        "INSERT INTO due_counters (id, user_id, course_id, due_date, count) "
+        "SELECT gen_random_uuid(), user_id, course_id, (due AT TIME ZONE 'UTC')::date, count(*) "
+        "FROM card_reviews GROUP BY user_id, course_id, (due AT TIME ZONE 'UTC')::date"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('due_counters')
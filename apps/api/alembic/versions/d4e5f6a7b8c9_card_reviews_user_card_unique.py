@@ -0,0 +1,49 @@
+"""card_reviews unique (user_id, card_id)
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-17 14:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e5f6a7b8c9'
+down_revision: Union[str, None] = 'c3d4e5f6a7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 重複行のうちレビュー回数が最も多い行を残す
+_RANKED = (
+    "WITH ranked AS ("
+    " SELECT id, first_value(id) OVER ("
+    "  PARTITION BY user_id, card_id ORDER BY reps DESC, created_at, id"
+    " ) AS keep_id FROM card_reviews"
+    ")"
+)
+
+
+def upgrade() -> None:
+    # 競合で作成された重複CardReviewを統合 (ReviewLogは残す行へ付け替え)
+    op.execute(
+        f"{_RANKED} UPDATE review_logs SET card_review_id = ranked.keep_id "
+        "FROM ranked WHERE review_logs.card_review_id = ranked.id AND ranked.id <> ranked.keep_id"
+    )
+    op.execute(
+        f"{_RANKED} DELETE FROM card_reviews USING ranked "
+        "WHERE card_reviews.id = ranked.id AND ranked.id <> ranked.keep_id"
+    )
+    # 削除した行の分を due_counters から除くため再構築
+    op.execute("DELETE FROM due_counters")
+    op.execute(
+        "INSERT INTO due_counters (id, user_id, course_id, due_date, count) "
+        "SELECT gen_random_uuid(), user_id, course_id, (due AT TIME ZONE 'UTC')::date, count(*) "
+        "FROM card_reviews GROUP BY user_id, course_id, (due AT TIME ZONE 'UTC')::date"
+    )
+
+    op.create_unique_constraint('uq_card_reviews_user_card', 'card_reviews', ['user_id', 'card_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_card_reviews_user_card', 'card_reviews', type_='unique')
@@ -0,0 +1,30 @@
+"""study_sessions review queue columns
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-17 16:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f6a7b8c9d0'
+down_revision: Union[str, None] = 'd4e5f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('study_sessions', sa.Column('review_queue', postgresql.ARRAY(sa.UUID()), nullable=True))
+    op.add_column('study_sessions', sa.Column('queue_position', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('study_sessions', 'queue_position', server_default=None)
+    op.add_column('study_sessions', sa.Column('queue_built_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('study_sessions', 'queue_built_at')
+    op.drop_column('study_sessions', 'queue_position')
+    op.drop_column('study_sessions', 'review_queue')
@@ -0,0 +1,66 @@
+"""FSRSパラメータ最適化ベンチマーク - レビュー履歴件数 vs 最適化時間
+
+使い方 (apps/api/ で実行、fsrs[optimizer] が必要):
+    python -m benchmarks.bench_fsrs_optimizer
+    python -m benchmarks.bench_fsrs_optimizer --sizes 500 2000 8000
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fsrs import Card as FSRSCard
+from fsrs import Rating, Scheduler
+
+from src.services.fsrs_optimizer import ReviewHistoryRow, fit_parameters
+
+REVIEWS_PER_CARD = 8
+
+
+def simulate_history(size: int, seed: int = 42) -> list[ReviewHistoryRow]:
+    """デフォルト重みのSchedulerで学習履歴を合成 (想起率に応じてAgain/Goodを抽選)"""
+    rng = random.Random(seed)
+    scheduler = Scheduler(enable_fuzzing=False)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    history: list[ReviewHistoryRow] = []
+
+    card_index = 0
+    while len(history) < size:
+        card = FSRSCard()
+        reviewed_at = start + timedelta(hours=rng.uniform(0, 24 * 30))
+        for _ in range(REVIEWS_PER_CARD):
+            retrievability = scheduler.get_card_retrievability(card, reviewed_at)
+            recalled = card.last_review is None or rng.random() < retrievability
+            rating = rng.choice([Rating.Good, Rating.Easy, Rating.Hard]) if recalled else Rating.Again
+            card, _ = scheduler.review_card(card, rating, review_datetime=reviewed_at)
+            history.append((card_index, int(rating), reviewed_at.timestamp(), rng.randint(2000, 15000)))
+            reviewed_at = card.due + timedelta(hours=rng.uniform(0, 48))
+        card_index += 1
+
+    return history[:size]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 5000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'reviews':>8} {'cards':>7} {'fit_sec':>9} {'reviews/sec':>12}")
+    # API と同じく spawn のワーカープロセスで実行 (プロセス間転送のコストを含む)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for size in args.sizes:
+            history = simulate_history(size)
+            cards = len({row[0] for row in history})
+
+            started = time.perf_counter()
+            pool.submit(fit_parameters, history).result()
+            elapsed = time.perf_counter() - started
+
+            print(f"{size:>8} {cards:>7} {elapsed:>9.2f} {size / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
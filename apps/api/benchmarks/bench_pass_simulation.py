@@ -0,0 +1,55 @@
+"""合格確率シミュレーションのベンチマーク - 試行回数 vs 計算時間
+
+使い方 (apps/api/ で実行):
+    python -m benchmarks.bench_pass_simulation
+    python -m benchmarks.bench_pass_simulation --runs 1000 10000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.services.pass_simulation_service import GUESS_RATE, ExamSection, simulate_exams
+
+
+def synthetic_sections(seed: int = 42) -> list[ExamSection]:
+    """CIA と同じ構成 (3 Part × 4〜6 Domain、計325問) のセクションを合成"""
+    rng = np.random.default_rng(seed)
+    sections = []
+    for name, questions, topic_count in [("Part 1", 125, 6), ("Part 2", 100, 4), ("Part 3", 100, 5)]:
+        weights = rng.uniform(5, 35, size=topic_count)
+        retrievability = rng.uniform(0.3, 0.95, size=topic_count)
+        sections.append(
+            ExamSection(
+                name=name,
+                questions=questions,
+                weight=33.3,
+                topic_weights=weights / weights.sum(),
+                correct_probs=GUESS_RATE + (1 - GUESS_RATE) * retrievability,
+            )
+        )
+    return sections
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="各試行回数の計測回数 (最速値を表示)")
+    args = parser.parse_args()
+
+    sections = synthetic_sections()
+    rng = np.random.default_rng(0)
+    print(f"{'runs':>8} {'ms':>9} {'sims/sec':>12} {'pass_prob':>10}")
+    for runs in args.runs:
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            scores = simulate_exams(sections, runs, rng)
+            best = min(best, time.perf_counter() - started)
+        pass_prob = float((scores >= 0.75).mean())
+        print(f"{runs:>8} {best * 1000:>9.2f} {runs / best:>12.0f} {pass_prob:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
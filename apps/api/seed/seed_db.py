@@ -11,6 +11,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import async_session_factory
 from src.models import Card, CardReview, Course, Topic, User, UserEnrollment
+from src.services.due_counter_service import due_counter_service
+from src.services.topic_tree_service import topic_tree_service
 
 SYLLABUS_DIR = Path(__file__).parent / "syllabus"
 
@@ -586,6 +588,8 @@ async def seed_courses_and_topics(db: AsyncSession) -> dict[str, uuid.UUID]:
                 topic_map[f"{data['code']}::{child['name']}"] = child_topic.id
                 sort_order += 1
 
+    # トピック階層の閉包テーブルを同期
+    await topic_tree_service.rebuild(db)
     return course_ids, topic_map
 
 
@@ -649,6 +653,7 @@ async def seed_sample_cards(
                 card_review = CardReview(
                     user_id=DEMO_USER_ID,
                     card_id=card.id,
+                    course_id=course_id,
                     difficulty=0,
                     stability=0,
                     retrievability=1.0,
@@ -670,6 +675,7 @@ async def main() -> None:
             course_ids, topic_map = await seed_courses_and_topics(db)
             await seed_demo_user(db, course_ids)
             await seed_sample_cards(db, course_ids, topic_map)
+            await due_counter_service.reconcile(db, DEMO_USER_ID)
             await db.commit()
             print(f"Seed complete: {len(course_ids)} courses, {len(topic_map)} topics")
         except Exception as e:
@@ -1,13 +1,17 @@
 """Admin endpoints - 管理画面用API"""
 
+import uuid
+
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import func, select
 
 from src.deps import CurrentUser, DbSession
+from src.jobs import JOBS
 from src.models.card import Card, CardReview
 from src.models.course import Course, Topic
 from src.models.user import User
 from src.plugins.registry import get_all_plugins, get_all_synergy_areas
+from src.services.fsrs_optimizer import fsrs_optimizer_service
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -172,3 +176,37 @@ async def list_courses_with_plugins(db: DbSession, current_user: CurrentUser):
             )
 
     return {"courses": courses, "total": len(courses)}
+
+
+@router.post("/fsrs/optimize/{user_id}")
+async def optimize_fsrs_parameters(user_id: uuid.UUID, db: DbSession, current_user: CurrentUser):
+    """個人別FSRSパラメータ最適化 (ワーカープロセスで実行、最適化中はDB接続を保持しない)"""
+    await _require_admin(current_user)
+
+    user = await db.get(User, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+
+    try:
+        result = await fsrs_optimizer_service.optimize_user(db, user)
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="最適化には fsrs[optimizer] のインストールが必要です",
+        ) from None
+    if result is None:
+        raise HTTPException(status_code=400, detail="最適化に必要なレビュー履歴が不足しています")
+
+    return result
+
+
+@router.post("/jobs/{job_name}")
+async def run_job(job_name: str, db: DbSession, current_user: CurrentUser):
+    """バッチジョブの手動実行 (`python -m src.jobs` と同じ処理)"""
+    await _require_admin(current_user)
+
+    job = JOBS.get(job_name)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+
+    return {"job": job_name, "result": await job(db)}
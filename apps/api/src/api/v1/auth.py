@@ -1,11 +1,20 @@
 """認証エンドポイント"""
 
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import select
 
 from src.deps import CurrentUser, DbSession
 from src.models.user import User
-from src.schemas.auth import ChangePasswordRequest, LoginRequest, RegisterRequest, TokenResponse, UserOut
+from src.schemas.auth import (
+    ChangePasswordRequest,
+    LoginRequest,
+    RegisterRequest,
+    TokenResponse,
+    UpdateProfileRequest,
+    UserOut,
+)
 from src.services.auth_service import (
     authenticate_user,
     create_access_token,
@@ -60,3 +69,23 @@ async def change_password(body: ChangePasswordRequest, db: DbSession, current_us
 async def get_me(current_user: CurrentUser) -> UserOut:
     """現在のユーザー情報取得（トークン検証）"""
     return UserOut.model_validate(current_user)
+
+
+@router.put("/me", response_model=UserOut)
+async def update_me(body: UpdateProfileRequest, db: DbSession, current_user: CurrentUser) -> UserOut:
+    """プロフィール更新 (表示名・タイムゾーン)
+
+    タイムゾーンは学習日・連続学習日数の日付の区切りに使う (未設定なら settings.default_timezone)。
+    """
+    if body.timezone is not None:
+        try:
+            ZoneInfo(body.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise HTTPException(status_code=422, detail="タイムゾーンが不正です") from None
+
+    if body.display_name is not None:
+        current_user.display_name = body.display_name
+    if "timezone" in body.model_fields_set:
+        current_user.timezone = body.timezone
+    await db.flush()
+    return UserOut.model_validate(current_user)
@@ -3,18 +3,28 @@
 import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Query
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, Query
 
 from src.deps import CurrentUser, DbSession
-from src.models.card import Card, CardReview
+from src.models.card import CardReview
 from src.schemas.card import (
-    CardWithReviewOut,
+    BatchReviewItemResult,
+    BatchReviewRequest,
+    BatchReviewResponse,
     DueCardsResponse,
+    ForecastDay,
+    ForecastResponse,
     ReviewRequest,
     ReviewResponse,
 )
-from src.services.fsrs_service import fsrs_service
+from src.services.daily_stats_service import daily_stats_service
+from src.services.dashboard_service import dashboard_service
+from src.services.due_counter_service import due_counter_service
+from src.services.forecast_service import ForecastTooLargeError, forecast_service
+from src.services.fsrs_service import ReviewTarget, fsrs_service, user_parameters
+from src.services.review_event_service import review_event_processor
+from src.services.session_service import local_date, session_service
+from src.services.topic_stats_service import TopicReview, topic_stats_service
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
@@ -25,53 +35,58 @@ async def get_due_cards(
     current_user: CurrentUser,
     course_id: uuid.UUID | None = Query(None, description="コースでフィルタ"),
     limit: int = Query(25, ge=1, le=100),
+    compact: bool = Query(False, description="レビューUI用の最小項目のみ返す"),
 ) -> DueCardsResponse:
-    """復習期日到来カード取得"""
-    card_reviews = await fsrs_service.get_due_cards(
+    """復習期日到来カード取得
+
+    due が0件なら未学習カードからCardReviewを一括作成する。
+    カード内容は1回の IN クエリで取得 (N+1回避)。
+    """
+    card_reviews = await fsrs_service.get_due_or_new_cards(
         db, user_id=current_user.id, course_id=course_id, limit=limit
     )
+    cards = await fsrs_service.load_cards(db, card_reviews, compact=compact)
+    return DueCardsResponse.build(card_reviews, cards, compact=compact)
+
+
+@router.get("/forecast", response_model=ForecastResponse)
+async def get_forecast(
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(30, ge=1, le=365, description="予測日数"),
+    monte_carlo: bool = Query(False, description="評価履歴からサンプリングするMonte Carloモード"),
+    runs: int = Query(200, ge=10, le=1000, description="Monte Carloの試行回数"),
+) -> ForecastResponse:
+    """今後N日間の日別復習数予測 (次回レビューまでキャッシュ)
 
-    # 新規ユーザー: due CardReview が0件なら、未学習カードからCardReviewを自動作成
-    if len(card_reviews) == 0:
-        existing_subq = select(CardReview.card_id).where(
-            CardReview.user_id == current_user.id
+    runs × カード数 × days が上限を超える場合は 422。
+    """
+    try:
+        forecast = await forecast_service.forecast(
+            db,
+            current_user.id,
+            days=days,
+            monte_carlo=monte_carlo,
+            runs=runs,
+            parameters=user_parameters(current_user.fsrs_parameters),
         )
-        stmt = select(Card).where(~Card.id.in_(existing_subq))
-        if course_id:
-            stmt = stmt.where(Card.course_id == course_id)
-        stmt = stmt.order_by(Card.created_at).limit(limit)
-        new_cards = (await db.execute(stmt)).scalars().all()
-
-        for card in new_cards:
-            cr = await fsrs_service.get_or_create_review(
-                db, user_id=current_user.id, card_id=card.id
+    except ForecastTooLargeError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from None
+    return ForecastResponse(
+        days=days,
+        monte_carlo=forecast.monte_carlo,
+        runs=forecast.runs,
+        total_reviews=round(float(forecast.mean.sum()), 1),
+        forecast=[
+            ForecastDay(
+                date=day,
+                reviews=round(float(mean), 2),
+                p10=float(p10),
+                p90=float(p90),
             )
-            card_reviews.append(cr)
-
-    cards_out = []
-    for cr in card_reviews:
-        # Eager load card data
-        card = await db.get(Card, cr.card_id)
-        if card:
-            cards_out.append(
-                CardWithReviewOut(
-                    id=card.id,
-                    course_id=card.course_id,
-                    topic_id=card.topic_id,
-                    front=card.front,
-                    back=card.back,
-                    is_synergy=card.is_synergy,
-                    difficulty_tier=card.difficulty_tier,
-                    tags=card.tags,
-                    state=cr.state,
-                    due=cr.due,
-                    difficulty=float(cr.difficulty),
-                    stability=float(cr.stability),
-                    retrievability=float(cr.retrievability),
-                )
-            )
-
-    return DueCardsResponse(cards=cards_out, total_due=len(cards_out))
+            for day, mean, p10, p90 in zip(forecast.dates(), forecast.mean, forecast.p10, forecast.p90, strict=True)
+        ],
+    )
 
 
 @router.post("/review", response_model=ReviewResponse)
@@ -81,29 +96,162 @@ async def submit_review(
     current_user: CurrentUser,
 ) -> ReviewResponse:
     """レビュー結果送信 → FSRS更新"""
-    # CardReview取得 or 新規作成
-    card_review = await fsrs_service.get_or_create_review(
-        db, user_id=current_user.id, card_id=body.card_id
+    # CardReview取得 or 新規作成 (登録コースの目標記憶率も同時に取得)
+    targets = await fsrs_service.get_or_create_reviews(
+        db,
+        user_id=current_user.id,
+        card_ids=[body.card_id],
+        parameters=user_parameters(current_user.fsrs_parameters),
     )
+    target = targets.get(body.card_id)
+    if target is None:
+        raise HTTPException(status_code=404, detail="カードが見つかりません")
 
     # FSRSレビュー実行
+    due_before = _due_before(target)
     updated_review, review_log = fsrs_service.review_card(
-        card_review, body.rating, body.response_time_ms
+        target.card_review, body.rating, body.response_time_ms, scheduler=target.scheduler
     )
 
-    # ReviewLog保存
+    # ReviewLog保存 + due件数カウンター更新
     db.add(review_log)
+    await due_counter_service.record(
+        db, current_user.id, [(updated_review.course_id, due_before, updated_review.due)]
+    )
+    # XP・ミッション・バッジ・習熟度はワーカーが非同期に反映
+    await review_event_processor.enqueue(
+        db, current_user.id, [(body.card_id, body.rating, body.response_time_ms)], review_log.reviewed_at
+    )
+    # 連続学習日数・日別集計 (ユーザーのローカル日付)
+    today = local_date(current_user.timezone, review_log.reviewed_at)
+    await session_service.record_activity(db, current_user.id, today)
+    await daily_stats_service.record(
+        db,
+        current_user.id,
+        today,
+        [(updated_review.course_id, body.rating, body.response_time_ms, target.is_synergy)],
+    )
+    dashboard_service.invalidate(current_user.id)
+    await topic_stats_service.record_reviews(
+        db,
+        current_user.id,
+        [
+            TopicReview(
+                topic_id=target.topic_id,
+                course_id=updated_review.course_id,
+                rating=review_log.rating,
+                state_before=review_log.state_before,
+                state_after=review_log.state_after,
+                retrievability_before=review_log.retrievability_before,
+            )
+        ],
+    )
+
+    return _review_response(updated_review, datetime.now(timezone.utc))
+
+
+@router.post("/review/batch", response_model=BatchReviewResponse)
+async def submit_review_batch(
+    body: BatchReviewRequest,
+    db: DbSession,
+    current_user: CurrentUser,
+) -> BatchReviewResponse:
+    """レビュー結果の一括送信 → FSRS一括更新
+
+    CardReview取得は1クエリ、ReviewLog保存は1回の複数行INSERTで行う。
+    存在しないカードは個別に失敗として返す。
+    """
+    targets = await fsrs_service.get_or_create_reviews(
+        db,
+        user_id=current_user.id,
+        card_ids=[r.card_id for r in body.reviews],
+        parameters=user_parameters(current_user.fsrs_parameters),
+    )
+
+    reviewed = [
+        (targets[r.card_id], r.rating, r.response_time_ms)
+        for r in body.reviews
+        if r.card_id in targets
+    ]
+    # 同一カードが複数回含まれても、カウンターは最初のdue → 最終due の1回分だけ動かす
+    dues_before = {card_id: _due_before(target) for card_id, target in targets.items()}
+    log_rows = fsrs_service.review_cards(reviewed)
+    await fsrs_service.insert_review_logs(db, log_rows)
+    await due_counter_service.record(
+        db,
+        current_user.id,
+        [
+            (target.card_review.course_id, dues_before[card_id], target.card_review.due)
+            for card_id, target in targets.items()
+        ],
+    )
 
-    # 次回レビューまでの時間計算
     now = datetime.now(timezone.utc)
-    next_hours = max(0, (updated_review.due - now).total_seconds() / 3600)
+    await review_event_processor.enqueue(
+        db,
+        current_user.id,
+        [(r.card_id, r.rating, r.response_time_ms) for r in body.reviews if r.card_id in targets],
+        now,
+    )
+    if reviewed:
+        today = local_date(current_user.timezone, now)
+        await session_service.record_activity(db, current_user.id, today)
+        await daily_stats_service.record(
+            db,
+            current_user.id,
+            today,
+            [
+                (target.card_review.course_id, rating, ms, target.is_synergy)
+                for target, rating, ms in reviewed
+            ],
+        )
+        dashboard_service.invalidate(current_user.id)
+        await topic_stats_service.record_reviews(
+            db,
+            current_user.id,
+            [
+                TopicReview.from_log(target.topic_id, target.card_review.course_id, log)
+                for (target, _, _), log in zip(reviewed, log_rows, strict=True)
+            ],
+        )
+
+    results = []
+    for r in body.reviews:
+        target = targets.get(r.card_id)
+        if target is None:
+            results.append(
+                BatchReviewItemResult(card_id=r.card_id, success=False, error="カードが見つかりません")
+            )
+        else:
+            results.append(
+                BatchReviewItemResult(
+                    card_id=r.card_id, success=True, review=_review_response(target.card_review, now)
+                )
+            )
+
+    succeeded = sum(1 for res in results if res.success)
+    return BatchReviewResponse(
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+    )
+
+
+def _due_before(target: ReviewTarget) -> datetime | None:
+    """レビュー前のdue (新規作成したCardReviewはカウンター未計上なので None)"""
+    return None if target.created else target.card_review.due
+
+
+def _review_response(card_review: CardReview, now: datetime) -> ReviewResponse:
+    """CardReview → ReviewResponse (次回レビューまでの時間付き)"""
+    next_hours = max(0, (card_review.due - now).total_seconds() / 3600)
 
     return ReviewResponse(
-        card_id=body.card_id,
-        state=updated_review.state,
-        due=updated_review.due,
-        difficulty=float(updated_review.difficulty),
-        stability=float(updated_review.stability),
-        retrievability=float(updated_review.retrievability),
+        card_id=card_review.card_id,
+        state=card_review.state,
+        due=card_review.due,
+        difficulty=float(card_review.difficulty),
+        stability=float(card_review.stability),
+        retrievability=float(card_review.retrievability),
         next_review_in_hours=round(next_hours, 1),
     )
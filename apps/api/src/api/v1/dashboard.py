@@ -1,19 +1,21 @@
 """Dashboard endpoints"""
 
-from datetime import datetime, timezone
+import time
+from datetime import timedelta
 
-from fastapi import APIRouter
-from sqlalchemy import case, func, select
+from fastapi import APIRouter, Query, Response
 
 from src.deps import CurrentUser, DbSession
-from src.models.card import Card, CardReview, ReviewLog
-from src.models.course import Course, Topic
-from src.models.enrollment import UserEnrollment
-from src.services.session_service import session_service
+from src.services.daily_stats_service import daily_stats_service
+from src.services.dashboard_service import dashboard_service
+from src.services.fsrs_service import user_parameters
+from src.services.session_service import local_date
+from src.services.topic_stats_service import topic_stats_service
 from src.schemas.dashboard import (
-    CourseSummary,
     DailyHistory,
     DashboardSummaryResponse,
+    HeatmapDay,
+    HeatmapResponse,
     HistoryResponse,
     WeakTopic,
     WeakTopicsResponse,
@@ -23,169 +25,75 @@ router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 
 @router.get("/summary", response_model=DashboardSummaryResponse)
-async def get_summary(db: DbSession, current_user: CurrentUser) -> DashboardSummaryResponse:
-    """登録済み資格の進捗サマリー（未登録コースは表示しない）"""
-    now = datetime.now(timezone.utc)
-
-    # ユーザーが登録しているコースIDを取得
-    enrolled_result = await db.execute(
-        select(UserEnrollment.course_id).where(
-            UserEnrollment.user_id == current_user.id,
-            UserEnrollment.is_active == True,  # noqa: E712
-        )
-    )
-    enrolled_course_ids = set(enrolled_result.scalars().all())
-
-    courses_result = await db.execute(
-        select(Course).where(Course.is_active == True).order_by(Course.sort_order)  # noqa: E712
-    )
-    all_courses = courses_result.scalars().all()
-
-    # 登録済みコースのみフィルタ（登録が0件の場合はデフォルトコースを表示）
-    if enrolled_course_ids:
-        courses = [c for c in all_courses if c.id in enrolled_course_ids]
-    else:
-        courses = [c for c in all_courses if getattr(c, "is_default", True)]
-
-    summaries = []
-    for course in courses:
-        # Total cards
-        total = (
-            await db.execute(
-                select(func.count(Card.id)).where(Card.course_id == course.id)
-            )
-        ).scalar() or 0
-
-        # Due today
-        due = (
-            await db.execute(
-                select(func.count(CardReview.id))
-                .join(Card, CardReview.card_id == Card.id)
-                .where(Card.course_id == course.id)
-                .where(CardReview.user_id == current_user.id)
-                .where(CardReview.due <= now)
-            )
-        ).scalar() or 0
-
-        # Mastered (state=2=Review, stability > 21 days)
-        mastered = (
-            await db.execute(
-                select(func.count(CardReview.id))
-                .join(Card, CardReview.card_id == Card.id)
-                .where(Card.course_id == course.id)
-                .where(CardReview.user_id == current_user.id)
-                .where(CardReview.state == 2)
-                .where(CardReview.stability > 21)
-            )
-        ).scalar() or 0
-
-        pass_prob = (mastered / total) if total > 0 else 0.0
-
-        summaries.append(
-            CourseSummary(
-                course_id=course.id,
-                course_code=course.code,
-                course_name=course.name,
-                color=course.color,
-                total_cards=total,
-                mastered=mastered,
-                due_today=due,
-                pass_probability=round(pass_prob, 4),
-            )
-        )
-
-    # 今日の学習数
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    studied_today = (
-        await db.execute(
-            select(func.count(ReviewLog.id))
-            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
-            .where(CardReview.user_id == current_user.id)
-            .where(ReviewLog.reviewed_at >= today_start)
-        )
-    ).scalar() or 0
-
-    streak = await session_service.get_streak_days(db, current_user.id)
-
-    return DashboardSummaryResponse(
-        courses=summaries,
-        total_studied_today=studied_today,
-        streak_days=streak,
+async def get_summary(
+    response: Response, db: DbSession, current_user: CurrentUser
+) -> DashboardSummaryResponse:
+    """登録済み資格の進捗サマリー（未登録コースは表示しない）
+
+    ユーザー単位で短時間キャッシュする。Server-Timing ヘッダーに所要時間とキャッシュ有無を返す。
+    """
+    started = time.perf_counter()
+    summary, cache_hit = await dashboard_service.get_summary(
+        db,
+        current_user.id,
+        parameters=user_parameters(current_user.fsrs_parameters),
+        tz_name=current_user.timezone,
     )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    cache_status = "hit" if cache_hit else "miss"
+    response.headers["Server-Timing"] = f'summary;dur={elapsed_ms:.1f}, cache;desc="{cache_status}"'
+    response.headers["X-Cache"] = cache_status.upper()
+    return summary
 
 
 @router.get("/weak-topics", response_model=WeakTopicsResponse)
 async def get_weak_topics(db: DbSession, current_user: CurrentUser) -> WeakTopicsResponse:
-    """弱点トピックTOP5"""
-    stmt = (
-        select(
-            Topic.id,
-            Topic.name,
-            Course.code,
-            Course.color,
-            func.count(CardReview.id).label("total"),
-            func.coalesce(func.sum(CardReview.lapses), 0).label("total_lapses"),
-        )
-        .join(Card, CardReview.card_id == Card.id)
-        .join(Topic, Card.topic_id == Topic.id)
-        .join(Course, Card.course_id == Course.id)
-        .where(CardReview.user_id == current_user.id)
-        .group_by(Topic.id, Topic.name, Course.code, Course.color)
-    )
-
-    result = await db.execute(stmt)
-    rows = result.all()
-
-    weak_topics = []
-    for row in rows:
-        total = row.total or 1
-        lapses = row.total_lapses or 0
-        mastery = max(0.0, 1.0 - (lapses / (total * 3)))
-        weak_topics.append(
+    """弱点トピックTOP5 (topic_stats を習熟度の昇順に読み出し)"""
+    rows = await topic_stats_service.get_weakest(db, current_user.id, limit=5)
+    return WeakTopicsResponse(
+        topics=[
             WeakTopic(
-                topic_id=row.id,
+                topic_id=row.topic_id,
                 topic_name=row.name,
                 course_code=row.code,
                 color=row.color,
-                mastery_score=round(mastery, 4),
-                total_cards=total,
-                failed_cards=min(int(lapses), total),
+                mastery_score=round(row.mastery_score, 4),
+                total_cards=row.card_count,
+                failed_cards=min(row.lapses, row.card_count),
             )
-        )
-
-    weak_topics.sort(key=lambda x: x.mastery_score)
-    return WeakTopicsResponse(topics=weak_topics[:5])
+            for row in rows
+        ]
+    )
 
 
 @router.get("/history", response_model=HistoryResponse)
 async def get_history(db: DbSession, current_user: CurrentUser) -> HistoryResponse:
-    """直近14日の学習履歴"""
-    # rating >= 3 (Good/Easy) を正答としてカウント
-    stmt = (
-        select(
-            func.date(ReviewLog.reviewed_at).label("review_date"),
-            func.count(ReviewLog.id).label("cards_reviewed"),
-            func.sum(
-                case((ReviewLog.rating >= 3, 1), else_=0)
-            ).label("correct_count"),
-        )
-        .join(CardReview, ReviewLog.card_review_id == CardReview.id)
-        .where(CardReview.user_id == current_user.id)
-        .group_by(func.date(ReviewLog.reviewed_at))
-        .order_by(func.date(ReviewLog.reviewed_at).desc())
-        .limit(14)
-    )
-    result = await db.execute(stmt)
-    rows = result.all()
-
+    """直近14日の学習履歴 (daily_user_stats から読み出し)"""
+    days = await daily_stats_service.get_days(db, current_user.id, limit=14)
     history = [
         DailyHistory(
-            date=str(row.review_date),
-            cards_reviewed=row.cards_reviewed,
-            correct=row.correct_count or 0,
-            minutes=row.cards_reviewed,
+            date=str(day.day),
+            cards_reviewed=day.reviews,
+            correct=day.correct,
+            minutes=day.minutes,
         )
-        for row in rows
+        for day in days
     ]
 
     return HistoryResponse(history=list(reversed(history)))
+
+
+@router.get("/history/heatmap", response_model=HeatmapResponse)
+async def get_history_heatmap(
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(365, ge=1, le=366),
+) -> HeatmapResponse:
+    """カレンダーヒートマップ用の日別レビュー数 (学習のあった日のみ、最大 days 行)"""
+    end = local_date(current_user.timezone)
+    stats = await daily_stats_service.get_year(db, current_user.id, end, days=days)
+    return HeatmapResponse(
+        start=str(end - timedelta(days=days - 1)),
+        end=str(end),
+        days=[HeatmapDay(date=str(day.day), count=day.reviews) for day in reversed(stats)],
+    )
@@ -1,5 +1,7 @@
 """Gamification API - XP, badges, daily missions"""
 
+from typing import Literal
+
 from fastapi import APIRouter, Query
 
 from src.deps import CurrentUser, DbSession
@@ -50,12 +52,26 @@ async def get_badges(db: DbSession, current_user: CurrentUser):
 @router.get("/leaderboard")
 async def get_leaderboard(
     db: DbSession,
+    window: Literal["all", "weekly", "monthly"] = Query("all", description="集計期間"),
     limit: int = Query(10, ge=1, le=50),
 ):
     """XPリーダーボード"""
     svc = GamificationService(db)
-    leaderboard = await svc.get_leaderboard(limit)
-    return {"leaderboard": leaderboard}
+    leaderboard = await svc.get_leaderboard(window, limit)
+    return {"window": window, "leaderboard": leaderboard}
+
+
+@router.get("/leaderboard/me")
+async def get_my_rank(
+    db: DbSession,
+    current_user: CurrentUser,
+    window: Literal["all", "weekly", "monthly"] = Query("all", description="集計期間"),
+    radius: int = Query(2, ge=0, le=10, description="前後に返す件数"),
+):
+    """自分の順位と前後のユーザー"""
+    svc = GamificationService(db)
+    rank = await svc.get_leaderboard_rank(current_user.id, window, radius)
+    return {"window": window, **rank}
 
 
 @router.post("/xp/award")
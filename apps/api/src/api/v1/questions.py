@@ -20,6 +20,7 @@ from src.schemas.question import (
     GenerateQuestionsResponse,
     QuestionOut,
 )
+from src.services.topic_stats_service import topic_stats_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/questions", tags=["questions"])
@@ -215,6 +216,9 @@ async def answer_question(body: AnswerRequest, db: DbSession, current_user: Curr
         response_time_ms=body.response_time_ms,
     )
     db.add(attempt)
+    await topic_stats_service.record_questions(
+        db, current_user.id, [(question.topic_id, question.course_id, is_correct)]
+    )
 
     return AnswerResponse(
         is_correct=is_correct,
@@ -1,14 +1,17 @@
-"""Study Session + Score Prediction endpoints"""
+"""Study Session + Mastery endpoints"""
 
 import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
+from sqlalchemy import select
 
 from src.deps import CurrentUser, DbSession
+from src.models.card import Card, CardReview
+from src.schemas.card import CardWithReviewOut, DueCardCompactOut
 from src.services.session_service import (
+    local_date,
     mastery_service,
-    score_prediction_service,
     session_service,
 )
 
@@ -34,10 +37,47 @@ async def start_session(body: StartSessionRequest, db: DbSession, current_user:
     session = await session_service.start_session(
         db, current_user.id, body.course_id, body.session_type
     )
+    await session_service.record_activity(db, current_user.id, local_date(current_user.timezone))
     return {
         "session_id": str(session.id),
         "started_at": session.started_at,
         "session_type": session.session_type,
+        "queue_size": len(session.review_queue or []),
+    }
+
+
+@router.get("/sessions/{session_id}/next")
+async def next_session_cards(
+    session_id: uuid.UUID,
+    db: DbSession,
+    current_user: CurrentUser,
+    n: int = Query(1, ge=1, le=50, description="取り出す枚数"),
+    compact: bool = Query(False, description="レビューUI用の最小項目のみ返す"),
+):
+    """セッションの復習キューから次の n 枚を取得"""
+    popped = await session_service.pop_review_queue(db, session_id, current_user.id, n)
+    if popped is None:
+        raise HTTPException(status_code=404, detail="セッションが見つかりません")
+    card_ids, remaining = popped
+
+    rows = (
+        await db.execute(
+            select(CardReview, Card)
+            .join(Card, CardReview.card_id == Card.id)
+            .where(CardReview.user_id == current_user.id, CardReview.card_id.in_(card_ids))
+        )
+    ).all()
+    by_card_id = {card.id: (card_review, card) for card_review, card in rows}
+    out_cls = DueCardCompactOut if compact else CardWithReviewOut
+
+    return {
+        "session_id": str(session_id),
+        "cards": [
+            out_cls.from_review(by_card_id[card_id][1], by_card_id[card_id][0])
+            for card_id in card_ids
+            if card_id in by_card_id
+        ],
+        "remaining": remaining,
     }
 
 
@@ -86,28 +126,11 @@ async def get_recent_sessions(db: DbSession, current_user: CurrentUser, limit: i
 @router.get("/sessions/today")
 async def get_today_stats(db: DbSession, current_user: CurrentUser):
     """今日の学習統計"""
-    stats = await session_service.get_today_stats(db, current_user.id)
-    streak = await session_service.get_streak_days(db, current_user.id)
-    return {**stats, "streak_days": streak}
-
-
-# --- Score Prediction ---
-@router.get("/predictions/{course_id}")
-async def predict_score(course_id: uuid.UUID, db: DbSession, current_user: CurrentUser):
-    """合格確率予測"""
-    result = await score_prediction_service.predict_pass_probability(
-        db, current_user.id, course_id
-    )
-    return result
-
-
-@router.get("/predictions/{course_id}/roi")
-async def get_study_roi(course_id: uuid.UUID, db: DbSession, current_user: CurrentUser):
-    """学習ROI推定"""
-    result = await score_prediction_service.get_study_roi(
-        db, current_user.id, course_id
+    stats = await session_service.get_today_stats(db, current_user.id, current_user.timezone)
+    streak, longest = await session_service.get_streak(
+        db, current_user.id, today=local_date(current_user.timezone)
     )
-    return result
+    return {**stats, "streak_days": streak, "longest_streak": longest}
 
 
 # --- Mastery ---
@@ -18,12 +18,43 @@ class Settings(BaseSettings):
     api_port: int = 8000
     api_reload: bool = True
     debug: bool = False
+    default_timezone: str = "Asia/Tokyo"  # ユーザーのタイムゾーン未設定時の日付の区切り
 
     # Auth
     jwt_secret: str = "change-me-in-production"
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 1440
 
+    # FSRS パラメータ最適化 (fsrs[optimizer] が必要)
+    fsrs_optimizer_workers: int = 1
+    fsrs_optimizer_min_reviews: int = 400
+
+    # 学習セッション (サーバー側レビューキュー)
+    review_queue_size: int = 100
+
+    # レビュー副作用 (review_events outbox)
+    review_event_workers: int = 1
+    review_event_batch_size: int = 500
+    review_event_poll_seconds: float = 5.0
+    review_event_retention_days: int = 7  # 処理済みの review_events を保持する日数
+
+    # ダッシュボード
+    dashboard_cache_ttl_seconds: float = 30.0
+
+    # 合格予測・学習ROI
+    prediction_snapshot_min_delta: float = 0.01  # 合格確率がこれ以上変化したら予測を保存
+    roi_estimate_max_age_hours: float = 24.0  # これより古いROI推定はAPI呼び出し時に再計算
+    roi_active_days: int = 30  # 夜間のROI事前計算の対象 (直近N日にレビューしたユーザー)
+
+    # 復習数予測
+    forecast_max_cells: int = 20_000_000  # runs × カード数 × 日数 の上限
+    forecast_max_sim_cells: int = 1_000_000  # 同時に保持する runs × カード数 の上限 (runs を分割)
+
+    # ゲーミフィケーション
+    mission_active_days: int = 7  # 夜間のデイリーミッション一括生成の対象 (直近N日に学習したユーザー)
+    leaderboard_reload_seconds: float = 300.0  # プロセス内ランキングを DB から読み直す間隔
+    badge_catalog_check_seconds: float = 60.0  # バッジ定義の変更を確認する間隔
+
     # Azure AI Foundry (統一エンドポイント)
     azure_foundry_endpoint: str = ""
     azure_foundry_api_key: str = ""
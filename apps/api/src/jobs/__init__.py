@@ -0,0 +1,90 @@
+"""バッチジョブ - cron などから `python -m src.jobs <job>` で実行
+
+各ジョブは `async def job(db: AsyncSession) -> dict` の形で定義し、JOBS に登録する。
+管理者APIからも同じ関数を呼び出せる。
+"""
+
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.services.daily_stats_service import daily_stats_service
+from src.services.due_counter_service import due_counter_service
+from src.services.gamification_service import GamificationService, mission_today
+from src.services.review_event_service import review_event_processor
+from src.services.roi_service import roi_service
+from src.services.session_service import session_service
+from src.services.topic_stats_service import topic_stats_service
+from src.services.topic_tree_service import topic_tree_service
+
+Job = Callable[[AsyncSession], Awaitable[dict]]
+
+
+async def reconcile_due_counters(db: AsyncSession) -> dict:
+    """due_counters を CardReview から全件再構築 (増分更新のずれを修復)"""
+    rows = await due_counter_service.reconcile(db)
+    return {"due_counter_rows": rows}
+
+
+async def process_review_events(db: AsyncSession) -> dict:
+    """未処理のレビュー副作用 (review_events) をすべて反映"""
+    processed = 0
+    while batch := await review_event_processor.process_batch(db):
+        processed += batch
+    return {"processed_events": processed}
+
+
+async def purge_review_events(db: AsyncSession) -> dict:
+    """処理済みから保持期間を過ぎた review_events を削除 (日次実行)"""
+    rows = await review_event_processor.purge(db, settings.review_event_retention_days)
+    return {"purged_events": rows}
+
+
+async def rebuild_streaks(db: AsyncSession) -> dict:
+    """全ユーザーの連続学習日数を study_sessions から再構築"""
+    rows = await session_service.rebuild_streaks(db)
+    return {"streak_rows": rows}
+
+
+async def rebuild_daily_stats(db: AsyncSession) -> dict:
+    """全ユーザーの日別レビュー集計を review_logs から再構築"""
+    rows = await daily_stats_service.rebuild(db)
+    return {"daily_stat_rows": rows}
+
+
+async def rebuild_topic_stats(db: AsyncSession) -> dict:
+    """全ユーザーのトピック別集計を review_logs・question_attempts から再構築"""
+    rows = await topic_stats_service.rebuild(db)
+    return {"topic_stat_rows": rows}
+
+
+async def rebuild_topic_closure(db: AsyncSession) -> dict:
+    """全コースのトピック階層の閉包テーブルを topics.parent_id から再構築"""
+    rows = await topic_tree_service.rebuild(db)
+    return {"topic_closure_rows": rows}
+
+
+async def precompute_roi(db: AsyncSession) -> dict:
+    """直近に学習したユーザーの学習ROI推定を再計算 (夜間実行)"""
+    rows = await roi_service.precompute(db)
+    return {"roi_estimate_rows": rows}
+
+
+async def pregenerate_daily_missions(db: AsyncSession) -> dict:
+    """直近に学習したユーザーの今日のデイリーミッションを一括生成 (UTC の日付変更直後に実行)"""
+    rows = await GamificationService(db).pregenerate_daily_missions(mission_today())
+    return {"daily_mission_rows": rows}
+
+
+JOBS: dict[str, Job] = {
+    "reconcile-due-counters": reconcile_due_counters,
+    "process-review-events": process_review_events,
+    "purge-review-events": purge_review_events,
+    "rebuild-streaks": rebuild_streaks,
+    "rebuild-daily-stats": rebuild_daily_stats,
+    "rebuild-topic-stats": rebuild_topic_stats,
+    "rebuild-topic-closure": rebuild_topic_closure,
+    "precompute-roi": precompute_roi,
+    "pregenerate-daily-missions": pregenerate_daily_missions,
+}
@@ -0,0 +1,45 @@
+"""バッチジョブ実行 CLI
+
+Usage (apps/api/ で実行):
+    python -m src.jobs reconcile-due-counters
+    python -m src.jobs process-review-events
+    python -m src.jobs purge-review-events
+    python -m src.jobs rebuild-streaks
+    python -m src.jobs rebuild-daily-stats
+    python -m src.jobs rebuild-topic-stats
+    python -m src.jobs rebuild-topic-closure
+    python -m src.jobs precompute-roi
+    python -m src.jobs pregenerate-daily-missions
+"""
+
+import argparse
+import asyncio
+
+from loguru import logger
+
+from src.database import async_session_factory
+from src.jobs import JOBS
+
+
+async def run(name: str) -> dict:
+    """ジョブを1トランザクションで実行"""
+    async with async_session_factory() as db:
+        try:
+            result = await JOBS[name](db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    logger.info(f"Job finished: {name} {result}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="バッチジョブ実行")
+    parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+    asyncio.run(run(args.job))
+
+
+if __name__ == "__main__":
+    main()
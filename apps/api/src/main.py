@@ -40,7 +40,18 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     except Exception as e:
         logger.warning(f"Badge seed skipped: {e}")
 
+    # レビュー副作用 (XP・ミッション・バッジ・習熟度) の非同期反映ワーカー
+    from src.database import async_session_factory
+    from src.services.review_event_service import review_event_processor
+
+    review_event_processor.start(async_session_factory, workers=settings.review_event_workers)
+
     yield
+
+    from src.services.fsrs_optimizer import fsrs_optimizer_service
+
+    await review_event_processor.stop()
+    fsrs_optimizer_service.shutdown()
     logger.info("GRC Triple Crown API shutting down...")
 
 
@@ -1,11 +1,18 @@
 """SQLAlchemy ORM models - 全モデルをここからインポート"""
 
 from src.models.base import Base
-from src.models.card import Card, CardReview, ReviewLog
-from src.models.course import Course, Topic
+from src.models.card import Card, CardReview, DailyUserStat, DueCounter, ReviewEvent, ReviewLog
+from src.models.course import Course, Topic, TopicClosure
 from src.models.enrollment import UserEnrollment
 from src.models.gamification import Badge, DailyMission, UserBadge, UserXP, XPLog
-from src.models.mastery import ScorePrediction, StudySession, UserTopicMastery
+from src.models.mastery import (
+    RoiEstimate,
+    ScorePrediction,
+    StudySession,
+    TopicStat,
+    UserStreak,
+    UserTopicMastery,
+)
 from src.models.mock_exam import MockExamResult
 from src.models.question import Question, QuestionAttempt
 from src.models.synergy import SynergyMapping
@@ -16,9 +23,13 @@ __all__ = [
     "User",
     "Course",
     "Topic",
+    "TopicClosure",
     "Card",
     "CardReview",
     "ReviewLog",
+    "DueCounter",
+    "DailyUserStat",
+    "ReviewEvent",
     "UserEnrollment",
     "Question",
     "QuestionAttempt",
@@ -26,7 +37,10 @@ __all__ = [
     "SynergyMapping",
     "UserTopicMastery",
     "StudySession",
+    "UserStreak",
+    "TopicStat",
     "ScorePrediction",
+    "RoiEstimate",
     "UserXP",
     "XPLog",
     "Badge",
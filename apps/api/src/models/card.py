@@ -1,9 +1,22 @@
 """Card, CardReview, ReviewLog models"""
 
 import uuid
-from datetime import datetime
-
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, SmallInteger, String, Text
+from datetime import date, datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    SmallInteger,
+    String,
+    Text,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -40,12 +53,17 @@ class CardReview(UUIDPrimaryKeyMixin, TimestampMixin, Base):
 
     __tablename__ = "card_reviews"
 
+    # user_id 単独の検索は下記複合インデックスの先頭列で賄う
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     card_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("cards.id"), nullable=False, index=True
     )
+    # cards.course_id の非正規化 (復習キューのコース絞り込みでJOINを不要にする)
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False
+    )
     # FSRS DSR model
     difficulty: Mapped[float] = mapped_column(Numeric(8, 6), default=0)
     stability: Mapped[float] = mapped_column(Numeric(12, 6), default=0)
@@ -63,7 +81,12 @@ class CardReview(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     review_logs = relationship("ReviewLog", back_populates="card_review", lazy="noload")
 
     __table_args__ = (
-        # user_id + card_id でユニーク (1ユーザーにつきカード1レコード)
+        # 復習キュー: user_id + due の範囲スキャン (state で並べ替え)
+        Index("ix_card_reviews_user_due_state", "user_id", "due", "state"),
+        # コース別復習キュー / due件数 (インデックスのみで集計可能)
+        Index("ix_card_reviews_user_course_due_state", "user_id", "course_id", "due", "state"),
+        # ユーザー×カードで1行 (新規カード導入の ON CONFLICT 対象)
+        UniqueConstraint("user_id", "card_id", name="uq_card_reviews_user_card"),
         {"comment": "FSRS state per user per card"},
     )
 
@@ -85,6 +108,8 @@ class ReviewLog(UUIDPrimaryKeyMixin, Base):
     difficulty_after: Mapped[float] = mapped_column(Numeric(8, 6), default=0)
     stability_before: Mapped[float] = mapped_column(Numeric(12, 6), default=0)
     stability_after: Mapped[float] = mapped_column(Numeric(12, 6), default=0)
+    # レビュー直前の想起率 (新規カードは None)
+    retrievability_before: Mapped[float | None] = mapped_column(Numeric(8, 6), default=None)
     response_time_ms: Mapped[int] = mapped_column(Integer, default=0)
     reviewed_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False
@@ -92,3 +117,74 @@ class ReviewLog(UUIDPrimaryKeyMixin, Base):
 
     # Relationships
     card_review = relationship("CardReview", back_populates="review_logs")
+
+
+class DueCounter(UUIDPrimaryKeyMixin, Base):
+    """ユーザー × コース × due日 ごとの復習カード数 (レビュー時に増分更新)"""
+
+    __tablename__ = "due_counters"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False
+    )
+    due_date: Mapped[date] = mapped_column(Date, nullable=False)  # UTC日付
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "course_id", "due_date", name="uq_due_counters_user_course_date"),
+    )
+
+
+class DailyUserStat(UUIDPrimaryKeyMixin, Base):
+    """ユーザー × コース × 日 ごとのレビュー集計 (レビュー時に増分更新)"""
+
+    __tablename__ = "daily_user_stats"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False
+    )
+    stat_date: Mapped[date] = mapped_column(Date, nullable=False)  # ユーザーのローカル日付
+    reviews: Mapped[int] = mapped_column(Integer, default=0)
+    correct: Mapped[int] = mapped_column(Integer, default=0)  # Good/Easy
+    time_spent_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    synergy_reviews: Mapped[int] = mapped_column(Integer, default=0)  # シナジーカードのレビュー数
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "course_id", "stat_date", name="uq_daily_user_stats_user_course_date"),
+    )
+
+
+class ReviewEvent(UUIDPrimaryKeyMixin, Base):
+    """レビュー副作用 (XP・ミッション・バッジ・習熟度) の outbox
+
+    レビューと同じトランザクションで書き込み、ReviewEventProcessor が非同期に反映する。
+    """
+
+    __tablename__ = "review_events"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    card_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("cards.id"), nullable=False
+    )
+    rating: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    response_time_ms: Mapped[int] = mapped_column(Integer, default=0)
+    reviewed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)  # 反映失敗回数
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+
+    __table_args__ = (
+        # 未処理イベントの取り出し (処理済み行はインデックスに含めない)
+        Index(
+            "ix_review_events_pending",
+            "reviewed_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
@@ -1,8 +1,8 @@
-"""Course and Topic models"""
+"""Course, Topic and TopicClosure models"""
 
 import uuid
 
-from sqlalchemy import ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import ForeignKey, Index, Integer, Numeric, String, Text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -47,3 +47,26 @@ class Topic(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     course = relationship("Course", back_populates="topics")
     parent = relationship("Topic", remote_side="Topic.id", lazy="selectin")
     cards = relationship("Card", back_populates="topic", lazy="noload")
+
+
+class TopicClosure(Base):
+    """トピック階層の閉包テーブル (祖先 × 子孫、自身も depth=0 で含む)
+
+    任意の階層への集計を「子孫トピックの集計行 → 祖先トピック」の1回の結合で行う。
+    トピックの追加・親変更後は topic_tree_service.rebuild で同期する。
+    """
+
+    __tablename__ = "topic_closure"
+
+    ancestor_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        # 子孫 → 祖先 の向きの集計用 (主キーは 祖先 → 子孫)
+        Index("ix_topic_closure_descendant_ancestor", "descendant_id", "ancestor_id"),
+    )
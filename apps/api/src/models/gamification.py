@@ -3,7 +3,17 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Date, DateTime, ForeignKey, Integer, SmallInteger, String, func
+from sqlalchemy import (
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,7 +28,7 @@ class UserXP(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, unique=True, index=True
     )
-    total_xp: Mapped[int] = mapped_column(Integer, default=0)
+    total_xp: Mapped[int] = mapped_column(Integer, default=0, index=True)
     level: Mapped[int] = mapped_column(SmallInteger, default=1)
     # 各資格別XP
     cia_xp: Mapped[int] = mapped_column(Integer, default=0)
@@ -44,6 +54,11 @@ class XPLog(UUIDPrimaryKeyMixin, Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    __table_args__ = (
+        # 期間別ランキングの集計をインデックスのみで行う
+        Index("ix_xp_logs_earned_at", "earned_at", postgresql_include=["user_id", "amount"]),
+    )
+
 
 class Badge(UUIDPrimaryKeyMixin, Base):
     """バッジ定義マスター"""
@@ -67,7 +82,7 @@ class UserBadge(UUIDPrimaryKeyMixin, Base):
     __tablename__ = "user_badges"
 
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     badge_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("badges.id"), nullable=False
@@ -78,6 +93,11 @@ class UserBadge(UUIDPrimaryKeyMixin, Base):
 
     badge = relationship("Badge", lazy="joined")
 
+    __table_args__ = (
+        # 同じバッジは1回だけ付与 (ON CONFLICT DO NOTHING の対象)
+        UniqueConstraint("user_id", "badge_id", name="uq_user_badges_user_badge"),
+    )
+
 
 class DailyMission(UUIDPrimaryKeyMixin, Base):
     """デイリーミッション定義"""
@@ -85,7 +105,7 @@ class DailyMission(UUIDPrimaryKeyMixin, Base):
     __tablename__ = "daily_missions"
 
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     mission_date: Mapped[datetime] = mapped_column(Date, nullable=False)
     mission_type: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -96,3 +116,10 @@ class DailyMission(UUIDPrimaryKeyMixin, Base):
     xp_reward: Mapped[int] = mapped_column(Integer, default=30)
     is_completed: Mapped[bool] = mapped_column(default=False)
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+
+    __table_args__ = (
+        # 1日・1種類につき1件 (一括生成・遅延生成の ON CONFLICT 対象)
+        UniqueConstraint(
+            "user_id", "mission_date", "mission_type", name="uq_daily_missions_user_date_type"
+        ),
+    )
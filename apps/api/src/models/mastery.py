@@ -1,10 +1,22 @@
 """UserTopicMastery and StudySession models"""
 
 import uuid
-from datetime import datetime
-
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, SmallInteger, func
-from sqlalchemy.dialects.postgresql import UUID
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Computed,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    SmallInteger,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.models.base import Base, TimestampMixin, UUIDPrimaryKeyMixin
@@ -16,7 +28,7 @@ class UserTopicMastery(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     __tablename__ = "user_topic_mastery"
 
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     topic_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("topics.id"), nullable=False, index=True
@@ -26,6 +38,67 @@ class UserTopicMastery(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     correct_reviews: Mapped[int] = mapped_column(Integer, default=0)
     avg_response_ms: Mapped[int] = mapped_column(Integer, default=0)
 
+    __table_args__ = (
+        # ユーザー×トピックで1行 (習熟度更新の ON CONFLICT 対象)
+        UniqueConstraint("user_id", "topic_id", name="uq_user_topic_mastery_user_topic"),
+    )
+
+
+# カード由来の習熟度: 失敗率ベース × レビュー直前の平均想起率 (カード未学習なら NULL)
+_CARD_MASTERY = (
+    "CASE WHEN card_count > 0 THEN GREATEST(0, 1 - lapses::float8 / (3 * card_count))"
+    " * CASE WHEN recall_reviews > 0 THEN retrievability_sum / recall_reviews ELSE 1 END END"
+)
+# 問題演習の正答率 (未回答なら NULL)
+_QUESTION_ACCURACY = (
+    "CASE WHEN question_attempts > 0 THEN question_correct::float8 / question_attempts END"
+)
+# 両方あればカード 7 : 問題 3 で合成
+TOPIC_MASTERY_SQL = (
+    f"CASE WHEN ({_CARD_MASTERY}) IS NOT NULL AND ({_QUESTION_ACCURACY}) IS NOT NULL"
+    f" THEN 0.7 * ({_CARD_MASTERY}) + 0.3 * ({_QUESTION_ACCURACY})"
+    f" ELSE COALESCE({_CARD_MASTERY}, {_QUESTION_ACCURACY}, 0) END"
+)
+
+
+class TopicStat(UUIDPrimaryKeyMixin, Base):
+    """ユーザー × トピックのレビュー・問題演習集計 (レビュー・回答時に増分更新)
+
+    mastery_score は集計列から計算される生成列。(user_id, mastery_score) の
+    インデックスで弱点トピック上位k件をインデックス順に読み出す。
+    """
+
+    __tablename__ = "topic_stats"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    topic_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("topics.id"), nullable=False
+    )
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False
+    )
+    card_count: Mapped[int] = mapped_column(Integer, default=0)  # 1回以上レビューしたカード数
+    lapses: Mapped[int] = mapped_column(Integer, default=0)
+    # 評価ヒストグラム
+    again_count: Mapped[int] = mapped_column(Integer, default=0)
+    hard_count: Mapped[int] = mapped_column(Integer, default=0)
+    good_count: Mapped[int] = mapped_column(Integer, default=0)
+    easy_count: Mapped[int] = mapped_column(Integer, default=0)
+    # レビュー直前の想起率の合計と件数 (新規カードの初回レビューは含まない)
+    retrievability_sum: Mapped[float] = mapped_column(Float, default=0)
+    recall_reviews: Mapped[int] = mapped_column(Integer, default=0)
+    question_attempts: Mapped[int] = mapped_column(Integer, default=0)
+    question_correct: Mapped[int] = mapped_column(Integer, default=0)
+    mastery_score: Mapped[float] = mapped_column(Float, Computed(TOPIC_MASTERY_SQL, persisted=True))
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic_id", name="uq_topic_stats_user_topic"),
+        # 弱点トピック上位k件 (習熟度の昇順)
+        Index("ix_topic_stats_user_mastery", "user_id", "mastery_score"),
+    )
+
 
 class StudySession(UUIDPrimaryKeyMixin, Base):
     """学習セッション追跡"""
@@ -46,18 +119,37 @@ class StudySession(UUIDPrimaryKeyMixin, Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
     ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    # レビューキュー: 開始時に復習対象カードIDを並べ、queue_position から順に取り出す
+    review_queue: Mapped[list[uuid.UUID] | None] = mapped_column(
+        ARRAY(UUID(as_uuid=True)), default=None
+    )
+    queue_position: Mapped[int] = mapped_column(Integer, default=0)
+    queue_built_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
 
     # Relationships
     user = relationship("User", back_populates="study_sessions")
 
 
+class UserStreak(UUIDPrimaryKeyMixin, Base):
+    """連続学習日数 (ユーザーのローカル日付で増分管理)"""
+
+    __tablename__ = "user_streaks"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, unique=True
+    )
+    current_streak: Mapped[int] = mapped_column(Integer, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, default=0)
+    last_active_date: Mapped[date] = mapped_column(Date, nullable=False)
+
+
 class ScorePrediction(UUIDPrimaryKeyMixin, Base):
     """合格確率予測"""
 
     __tablename__ = "score_predictions"
 
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     course_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False, index=True
@@ -69,3 +161,37 @@ class ScorePrediction(UUIDPrimaryKeyMixin, Base):
     predicted_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
+
+    __table_args__ = (
+        # 予測履歴の期間スキャン / 直近スナップショットの取得
+        Index("ix_score_predictions_user_course_time", "user_id", "course_id", "predicted_at"),
+    )
+
+
+class RoiEstimate(UUIDPrimaryKeyMixin, Base):
+    """ユーザー × コースの学習ROI推定 (夜間ジョブで事前計算、APIは読み出しのみ)"""
+
+    __tablename__ = "roi_estimates"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    course_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False
+    )
+    total_cards: Mapped[int] = mapped_column(Integer, default=0)
+    mastered_cards: Mapped[int] = mapped_column(Integer, default=0)
+    # 未習熟カードを習熟させるまでの期待レビュー回数の合計
+    expected_reviews: Mapped[float] = mapped_column(Float, default=0)
+    # 1レビューあたりの回答時間 (ReviewLog.response_time_ms の中央値・90パーセンタイル)
+    median_response_ms: Mapped[int] = mapped_column(Integer, default=0)
+    p90_response_ms: Mapped[int] = mapped_column(Integer, default=0)
+    estimated_hours_remaining: Mapped[float] = mapped_column(Float, default=0)
+    total_study_hours: Mapped[float] = mapped_column(Float, default=0)
+    computed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "course_id", name="uq_roi_estimates_user_course"),
+    )
@@ -16,6 +16,8 @@ class User(UUIDPrimaryKeyMixin, TimestampMixin, Base):
     role: Mapped[str] = mapped_column(String(20), default="learner")  # learner / admin
     # FSRS per-user parameters (optimized over time)
     fsrs_parameters: Mapped[dict | None] = mapped_column(JSONB, default=None)
+    # IANA タイムゾーン (日付の区切り。未設定なら settings.default_timezone)
+    timezone: Mapped[str | None] = mapped_column(String(64), default=None)
     is_active: Mapped[bool] = mapped_column(default=True)
 
     # Relationships
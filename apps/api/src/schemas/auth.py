@@ -26,10 +26,18 @@ class ChangePasswordRequest(BaseModel):
     new_password: str = Field(min_length=8, max_length=128)
 
 
+class UpdateProfileRequest(BaseModel):
+    """プロフィール更新 (指定した項目のみ変更。timezone に null を指定すると既定に戻す)"""
+
+    display_name: str | None = Field(None, min_length=1, max_length=100)
+    timezone: str | None = Field(None, max_length=64, description="IANA タイムゾーン (例: Asia/Tokyo)")
+
+
 class UserOut(BaseModel):
     id: uuid.UUID
     email: str
     display_name: str
     role: str
+    timezone: str | None = None
 
     model_config = {"from_attributes": True}
@@ -1,10 +1,12 @@
 """Card and Review schemas"""
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
 from pydantic import BaseModel, Field
 
+from src.models.card import Card, CardReview
+
 
 class CardOut(BaseModel):
     """カード情報レスポンス"""
@@ -32,6 +34,46 @@ class CardWithReviewOut(CardOut):
 
     model_config = {"from_attributes": True}
 
+    @classmethod
+    def from_review(cls, card: Card, card_review: CardReview) -> "CardWithReviewOut":
+        return cls(
+            id=card.id,
+            course_id=card.course_id,
+            topic_id=card.topic_id,
+            front=card.front,
+            back=card.back,
+            is_synergy=card.is_synergy,
+            difficulty_tier=card.difficulty_tier,
+            tags=card.tags,
+            state=card_review.state,
+            due=card_review.due,
+            difficulty=float(card_review.difficulty),
+            stability=float(card_review.stability),
+            retrievability=float(card_review.retrievability),
+        )
+
+
+class DueCardCompactOut(BaseModel):
+    """レビューUI用の軽量カード (compact=true)"""
+
+    id: uuid.UUID
+    course_id: uuid.UUID
+    front: str
+    back: str
+    state: int
+    due: datetime
+
+    @classmethod
+    def from_review(cls, card: Card, card_review: CardReview) -> "DueCardCompactOut":
+        return cls(
+            id=card.id,
+            course_id=card.course_id,
+            front=card.front,
+            back=card.back,
+            state=card_review.state,
+            due=card_review.due,
+        )
+
 
 class ReviewRequest(BaseModel):
     """レビュー送信"""
@@ -55,8 +97,63 @@ class ReviewResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BatchReviewRequest(BaseModel):
+    """一括レビュー送信 (セッション終了時のまとめ送信)"""
+
+    reviews: list[ReviewRequest] = Field(min_length=1, max_length=100)
+
+
+class BatchReviewItemResult(BaseModel):
+    """一括レビューの個別結果"""
+
+    card_id: uuid.UUID
+    success: bool
+    review: ReviewResponse | None = None
+    error: str | None = None
+
+
+class BatchReviewResponse(BaseModel):
+    """一括レビュー結果 (部分失敗を含む)"""
+
+    results: list[BatchReviewItemResult]
+    succeeded: int
+    failed: int
+
+
 class DueCardsResponse(BaseModel):
     """復習カードリスト"""
 
-    cards: list[CardWithReviewOut]
+    cards: list[CardWithReviewOut] | list[DueCardCompactOut]
     total_due: int
+
+    @classmethod
+    def build(
+        cls, card_reviews: list[CardReview], cards: dict[uuid.UUID, Card], compact: bool = False
+    ) -> "DueCardsResponse":
+        """CardReview の順序でカード内容と組み合わせる (カードが見つからない行は除外)"""
+        out_cls = DueCardCompactOut if compact else CardWithReviewOut
+        cards_out = [
+            out_cls.from_review(cards[cr.card_id], cr)
+            for cr in card_reviews
+            if cr.card_id in cards
+        ]
+        return cls(cards=cards_out, total_due=len(cards_out))
+
+
+class ForecastDay(BaseModel):
+    """日別の予測復習数"""
+
+    date: date
+    reviews: float
+    p10: float
+    p90: float
+
+
+class ForecastResponse(BaseModel):
+    """今後N日間の復習数予測"""
+
+    days: int
+    monte_carlo: bool
+    runs: int
+    total_reviews: float
+    forecast: list[ForecastDay]
@@ -16,6 +16,7 @@ class CourseSummary(BaseModel):
     mastered: int
     due_today: int
     pass_probability: float
+    avg_retrievability: float = 0.0  # 現在時点の平均想起率
 
 
 class DashboardSummaryResponse(BaseModel):
@@ -57,3 +58,18 @@ class HistoryResponse(BaseModel):
     """学習履歴"""
 
     history: list[DailyHistory]
+
+
+class HeatmapDay(BaseModel):
+    """ヒートマップの1日分"""
+
+    date: str
+    count: int
+
+
+class HeatmapResponse(BaseModel):
+    """カレンダーヒートマップ (学習のあった日のみ)"""
+
+    start: str
+    end: str
+    days: list[HeatmapDay]
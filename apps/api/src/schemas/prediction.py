@@ -1,20 +1,25 @@
 """Prediction schemas"""
 
+import uuid
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
 class WeakTopicPrediction(BaseModel):
     """弱点トピック（予測用）"""
 
+    topic_id: uuid.UUID
     topic_name: str
     mastery_score: float
+    weight_pct: float
     priority: int
 
 
 class PredictionResponse(BaseModel):
     """コース別合格予測"""
 
-    predicted_score: int
+    predicted_score: float
     pass_probability: float
     passing_score: int
     weak_topics: list[WeakTopicPrediction]
@@ -23,11 +28,58 @@ class PredictionResponse(BaseModel):
     recommendation: str
 
 
+class PredictionHistoryPoint(BaseModel):
+    """合格予測の推移 (時間バケット内の平均)"""
+
+    predicted_at: datetime
+    pass_probability: float
+    predicted_score: float
+    samples: int
+
+
+class PredictionHistoryResponse(BaseModel):
+    """合格予測の推移 (points 個以下にダウンサンプリング)"""
+
+    start: datetime
+    end: datetime
+    points: list[PredictionHistoryPoint]
+
+
+class SectionSimulation(BaseModel):
+    """模擬試験セクション別の期待正答率"""
+
+    name: str
+    questions: int
+    weight_pct: float
+    expected_score: float
+
+
+class PassSimulationResponse(BaseModel):
+    """Monte Carlo 合格確率 (確率・得点は%)"""
+
+    runs: int
+    pass_probability: float
+    ci_low: float
+    ci_high: float
+    passing_score: int
+    mean_score: float
+    score_p5: float
+    score_p50: float
+    score_p95: float
+    sections: list[SectionSimulation]
+    elapsed_ms: float
+    sims_per_sec: float
+
+
 class ROIResponse(BaseModel):
-    """学習ROI分析"""
+    """学習ROI分析 (実測の回答時間から推定)"""
 
     total_cards: int
     mastered_cards: int
     remaining_cards: int
+    expected_reviews_remaining: float
+    median_seconds_per_review: float
+    p90_seconds_per_review: float
     estimated_hours_remaining: float
     total_study_hours: float
+    computed_at: datetime
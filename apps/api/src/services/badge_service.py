@@ -0,0 +1,173 @@
+"""Badge catalog - バッジ定義のプロセス内カタログ + ユーザー別獲得済みビットセット
+
+バッジ定義 (badges) は初回参照時に読み込み、条件タイプごとにしきい値の昇順で
+索引する。各バッジにはビット番号を割り当て、ユーザーの獲得済みバッジは整数のビットセットで
+LRU キャッシュする。判定は渡された指標 (レビュー数・連続日数など) に対応する条件タイプの
+未獲得バッジだけを調べるため、獲得が発生しない通常のレビューではクエリを発行しない。
+
+読み込み後も settings.badge_catalog_check_seconds ごとにバッジ定義の版 (件数と全行の md5) を
+1クエリで確認し、変わっていれば読み直す (他ワーカーでの定義変更も反映される)。
+同じプロセスで定義を変更した場合は invalidate() ですぐに読み直せる。
+獲得時はそのユーザーのビットセットを破棄し、次回判定時に user_badges から読み直す
+(ロールバックされた付与をキャッシュに残さない)。
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.gamification import Badge, UserBadge
+
+BADGE_CACHE_SIZE = 4096
+
+# 条件タイプ → (判定に使う指標, condition のしきい値キー)
+CONDITION_METRICS = {
+    "reviews": ("total_reviews", "count"),
+    "synergy_reviews": ("synergy_reviews", "count"),
+    "streak": ("streak_days", "days"),
+    "triple_course": ("course_count", None),
+}
+# しきい値キーのない条件タイプのしきい値
+FIXED_THRESHOLDS = {"triple_course": 3}
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    """判定用に展開したバッジ定義"""
+
+    bit: int
+    badge_id: uuid.UUID
+    code: str
+    name: str
+    icon: str
+    xp_reward: int
+    metric: str
+    threshold: int
+
+
+class BadgeCatalog:
+    """バッジ定義の索引 + ユーザー別獲得済みビットセットのキャッシュ"""
+
+    def __init__(self, cache_size: int = BADGE_CACHE_SIZE, check_seconds: float = 60.0):
+        self._cache_size = cache_size
+        self._check_seconds = check_seconds
+        self._bits: dict[uuid.UUID, int] | None = None
+        # 読み込んだバッジ定義の版と、次に版を確認する時刻 (monotonic)
+        self._stamp: tuple | None = None
+        self._check_at = 0.0
+        # 指標 → しきい値の昇順のルール
+        self._by_metric: dict[str, list[BadgeRule]] = {}
+        self._earned: OrderedDict[uuid.UUID, int] = OrderedDict()
+
+    def invalidate(self, user_id: uuid.UUID | None = None) -> None:
+        """user_id 指定時はそのユーザーの獲得済みキャッシュ、省略時はカタログごと破棄"""
+        if user_id is not None:
+            self._earned.pop(user_id, None)
+            return
+        self._bits = None
+        self._stamp = None
+        self._by_metric = {}
+        self._earned.clear()
+
+    async def open_metrics(self, db: AsyncSession, user_id: uuid.UUID) -> set[str]:
+        """未獲得のバッジが残っている指標 (呼び出し側はこれらの指標だけ集計すればよい)"""
+        await self._load(db)
+        earned = await self._earned_bits(db, user_id)
+        return {
+            metric
+            for metric, rules in self._by_metric.items()
+            if any(not earned >> rule.bit & 1 for rule in rules)
+        }
+
+    async def evaluate(
+        self, db: AsyncSession, user_id: uuid.UUID, metrics: dict[str, int]
+    ) -> list[BadgeRule]:
+        """指標の値で新たに条件を満たした未獲得バッジ (渡された指標の条件タイプだけを判定)"""
+        await self._load(db)
+        earned = await self._earned_bits(db, user_id)
+        newly = []
+        for metric, value in metrics.items():
+            for rule in self._by_metric.get(metric, []):
+                if rule.threshold > value:
+                    break
+                if not earned >> rule.bit & 1:
+                    newly.append(rule)
+        return newly
+
+    async def _load(self, db: AsyncSession) -> None:
+        """未読み込み・版の確認時刻を過ぎて定義が変わっていた場合に読み込む"""
+        if self._bits is not None and time.monotonic() < self._check_at:
+            return
+        stamp = await self._version(db)
+        self._check_at = time.monotonic() + self._check_seconds
+        if self._bits is not None and stamp == self._stamp:
+            return
+        self._stamp = stamp
+
+        badges = (await db.execute(select(Badge).order_by(Badge.code))).scalars().all()
+        by_metric: dict[str, list[BadgeRule]] = {}
+        for bit, badge in enumerate(badges):
+            condition_type = badge.condition.get("type")
+            if condition_type not in CONDITION_METRICS:
+                continue
+            metric, key = CONDITION_METRICS[condition_type]
+            threshold = badge.condition.get(key, 0) if key else FIXED_THRESHOLDS[condition_type]
+            by_metric.setdefault(metric, []).append(
+                BadgeRule(
+                    bit=bit,
+                    badge_id=badge.id,
+                    code=badge.code,
+                    name=badge.name,
+                    icon=badge.icon,
+                    xp_reward=badge.xp_reward,
+                    metric=metric,
+                    threshold=int(threshold),
+                )
+            )
+        for rules in by_metric.values():
+            rules.sort(key=lambda rule: rule.threshold)
+        self._by_metric = by_metric
+        self._bits = {badge.id: bit for bit, badge in enumerate(badges)}
+        self._earned.clear()
+
+    async def _version(self, db: AsyncSession) -> tuple:
+        """バッジ定義の件数と全行の md5 (追加・削除・条件や報酬の変更で変化する)"""
+        result = await db.execute(
+            select(
+                func.count(),
+                func.md5(
+                    func.string_agg(
+                        literal_column("badges::text"),
+                        aggregate_order_by(literal_column("','"), Badge.code),
+                    )
+                ),
+            ).select_from(Badge)
+        )
+        return tuple(result.one())
+
+    async def _earned_bits(self, db: AsyncSession, user_id: uuid.UUID) -> int:
+        """獲得済みバッジのビットセット (キャッシュになければ user_badges から読む)"""
+        bits = self._earned.get(user_id)
+        if bits is not None:
+            self._earned.move_to_end(user_id)
+            return bits
+
+        result = await db.execute(select(UserBadge.badge_id).where(UserBadge.user_id == user_id))
+        bits = 0
+        for (badge_id,) in result.all():
+            if badge_id in self._bits:
+                bits |= 1 << self._bits[badge_id]
+        self._earned[user_id] = bits
+        if len(self._earned) > self._cache_size:
+            self._earned.popitem(last=False)
+        return bits
+
+
+# シングルトン
+badge_catalog = BadgeCatalog(check_seconds=settings.badge_catalog_check_seconds)
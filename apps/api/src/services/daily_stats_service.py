@@ -0,0 +1,199 @@
+"""Daily stats service - (ユーザー, コース, 日) 単位のレビュー集計を増分管理
+
+学習履歴・今日の学習数などの日付単位の集計は review_logs を走査せず、
+daily_user_stats の集計行から読み出す。日付はユーザーのローカル日付。
+バッジ判定の累計 (レビュー数・シナジーレビュー数・学習コース) も同じ集計行から求める。
+レビュー時に1回の複数行UPSERTで加算し、rebuild で ReviewLog から再構築する。
+"""
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from sqlalchemy import BigInteger, Date, cast, delete, distinct, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import Card, CardReview, DailyUserStat, ReviewLog
+from src.models.course import Course
+from src.models.user import User
+
+# (course_id, rating, response_time_ms, is_synergy)
+ReviewEntry = tuple[uuid.UUID, int, int, bool]
+
+
+@dataclass
+class DayStats:
+    """1日分の集計 (全コース合計)"""
+
+    day: date
+    reviews: int = 0
+    correct: int = 0
+    time_spent_ms: int = 0
+
+    @property
+    def minutes(self) -> int:
+        return round(self.time_spent_ms / 60000)
+
+
+class DailyStatsService:
+    """daily_user_stats の増分更新・読み出し・再構築"""
+
+    async def record(
+        self, db: AsyncSession, user_id: uuid.UUID, day: date, entries: list[ReviewEntry]
+    ) -> None:
+        """レビュー結果をその日の集計に加算 (コースごとにまとめて1回の複数行UPSERT)"""
+        totals: dict[uuid.UUID, list[int]] = defaultdict(lambda: [0, 0, 0, 0])
+        for course_id, rating, response_time_ms, is_synergy in entries:
+            total = totals[course_id]
+            total[0] += 1
+            total[1] += int(rating >= 3)
+            total[2] += response_time_ms
+            total[3] += int(is_synergy)
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "course_id": course_id,
+                "stat_date": day,
+                "reviews": reviews,
+                "correct": correct,
+                "time_spent_ms": time_spent_ms,
+                "synergy_reviews": synergy_reviews,
+            }
+            for course_id, (reviews, correct, time_spent_ms, synergy_reviews) in totals.items()
+        ]
+        if not rows:
+            return
+
+        stmt = insert(DailyUserStat).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_daily_user_stats_user_course_date",
+            set_={
+                "reviews": DailyUserStat.reviews + stmt.excluded.reviews,
+                "correct": DailyUserStat.correct + stmt.excluded.correct,
+                "time_spent_ms": DailyUserStat.time_spent_ms + stmt.excluded.time_spent_ms,
+                "synergy_reviews": DailyUserStat.synergy_reviews + stmt.excluded.synergy_reviews,
+            },
+        )
+        await db.execute(stmt)
+
+    async def get_days(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        start: date | None = None,
+        end: date | None = None,
+        limit: int | None = None,
+    ) -> list[DayStats]:
+        """学習のあった日の集計 (全コース合計、新しい日付順)"""
+        stmt = (
+            select(
+                DailyUserStat.stat_date,
+                func.sum(DailyUserStat.reviews),
+                func.sum(DailyUserStat.correct),
+                func.sum(DailyUserStat.time_spent_ms),
+            )
+            .where(DailyUserStat.user_id == user_id)
+            .group_by(DailyUserStat.stat_date)
+            .order_by(DailyUserStat.stat_date.desc())
+        )
+        if start is not None:
+            stmt = stmt.where(DailyUserStat.stat_date >= start)
+        if end is not None:
+            stmt = stmt.where(DailyUserStat.stat_date <= end)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        result = await db.execute(stmt)
+        return [
+            DayStats(day=day, reviews=int(reviews), correct=int(correct), time_spent_ms=int(time_ms))
+            for day, reviews, correct, time_ms in result.all()
+        ]
+
+    async def get_day(self, db: AsyncSession, user_id: uuid.UUID, day: date) -> DayStats:
+        """指定日の集計 (学習がなければ0件)"""
+        days = await self.get_days(db, user_id, start=day, end=day)
+        return days[0] if days else DayStats(day=day)
+
+    async def get_year(self, db: AsyncSession, user_id: uuid.UUID, end: date, days: int = 365) -> list[DayStats]:
+        """end までの days 日間 (ヒートマップ用、最大 days 行)"""
+        return await self.get_days(db, user_id, start=end - timedelta(days=days - 1), end=end)
+
+    async def get_totals(self, db: AsyncSession, user_id: uuid.UUID) -> tuple[int, int, list[str]]:
+        """累計 (レビュー数, シナジーレビュー数, 学習したコースコード) をバッジ判定用に返す"""
+        total_reviews, synergy_reviews, courses_studied = (
+            await db.execute(
+                select(
+                    func.coalesce(func.sum(DailyUserStat.reviews), 0),
+                    func.coalesce(func.sum(DailyUserStat.synergy_reviews), 0),
+                    func.array_agg(distinct(Course.code)).filter(DailyUserStat.reviews > 0),
+                )
+                .join(Course, DailyUserStat.course_id == Course.id)
+                .where(DailyUserStat.user_id == user_id)
+            )
+        ).one()
+        return int(total_reviews), int(synergy_reviews), list(courses_studied or [])
+
+    async def rebuild(self, db: AsyncSession, user_id: uuid.UUID | None = None) -> int:
+        """ReviewLog から集計を再構築 (user_id 省略時は全ユーザー)
+
+        削除後に同時レビューが record() で作成した行とは ON CONFLICT で加算して合流する。
+
+        Returns:
+            再構築後の集計行数
+        """
+        tz = func.coalesce(User.timezone, settings.default_timezone)
+        stat_date = cast(func.timezone(tz, ReviewLog.reviewed_at), Date)
+        source = (
+            select(
+                func.gen_random_uuid(),
+                CardReview.user_id,
+                CardReview.course_id,
+                stat_date,
+                func.count(),
+                func.count().filter(ReviewLog.rating >= 3),
+                func.coalesce(func.sum(cast(ReviewLog.response_time_ms, BigInteger)), 0),
+                func.count().filter(Card.is_synergy.is_(True)),
+            )
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .join(Card, CardReview.card_id == Card.id)
+            .join(User, CardReview.user_id == User.id)
+            .group_by(CardReview.user_id, CardReview.course_id, stat_date)
+        )
+        clear = delete(DailyUserStat)
+        if user_id is not None:
+            source = source.where(CardReview.user_id == user_id)
+            clear = clear.where(DailyUserStat.user_id == user_id)
+
+        await db.execute(clear)
+        stmt = insert(DailyUserStat).from_select(
+            [
+                "id",
+                "user_id",
+                "course_id",
+                "stat_date",
+                "reviews",
+                "correct",
+                "time_spent_ms",
+                "synergy_reviews",
+            ],
+            source,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_daily_user_stats_user_course_date",
+            set_={
+                "reviews": DailyUserStat.reviews + stmt.excluded.reviews,
+                "correct": DailyUserStat.correct + stmt.excluded.correct,
+                "time_spent_ms": DailyUserStat.time_spent_ms + stmt.excluded.time_spent_ms,
+                "synergy_reviews": DailyUserStat.synergy_reviews + stmt.excluded.synergy_reviews,
+            },
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+
+# シングルトン
+daily_stats_service = DailyStatsService()
@@ -0,0 +1,187 @@
+"""Dashboard service - ダッシュボードサマリーの集計 + ユーザー単位の短期キャッシュ
+
+コース別の総カード数・習熟カード数は1回の GROUP BY 集計 (count(*) FILTER) で取得する。
+組み立てたサマリーは TTL 付きでユーザーごとにキャッシュし、ユーザーの入力の版
+(今日のレビュー数・有効な登録コース・最終学習日・ローカル日付) と一緒に保存する。
+版は増分管理している集計行 (daily_user_stats・user_streaks) を読むだけの軽いクエリで、
+参照時に読み直して比較するため、他ワーカーでのレビューやコース登録の変更もコミット後に反映される。
+レビューしたワーカーでは invalidate() で即座に破棄する。TTL は未学習カードの導入や
+コースのカード追加など、版に現れない変更の反映に使う。
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import Card, CardReview, DailyUserStat
+from src.models.course import Course
+from src.models.enrollment import UserEnrollment
+from src.models.mastery import UserStreak
+from src.schemas.dashboard import CourseSummary, DashboardSummaryResponse
+from src.services.daily_stats_service import daily_stats_service
+from src.services.due_counter_service import due_counter_service
+from src.services.retrievability_service import retrievability_service
+from src.services.session_service import local_date, session_service
+
+DASHBOARD_CACHE_SIZE = 1024
+
+# 習熟カード: Review状態 (state=2) かつ stability > 21日
+MASTERED_STABILITY_DAYS = 21
+
+
+class DashboardService:
+    """ダッシュボードサマリーの組み立て + TTLキャッシュ"""
+
+    def __init__(self, ttl_seconds: float = 30.0, cache_size: int = DASHBOARD_CACHE_SIZE):
+        self._ttl_seconds = ttl_seconds
+        self._cache_size = cache_size
+        # user_id -> (期限 (monotonic), 版, サマリー)
+        self._cache: OrderedDict[uuid.UUID, tuple[float, tuple, DashboardSummaryResponse]] = OrderedDict()
+
+    async def get_summary(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        parameters: tuple[float, ...] | None = None,
+        tz_name: str | None = None,
+    ) -> tuple[DashboardSummaryResponse, bool]:
+        """サマリー取得 → (サマリー, キャッシュヒットか)"""
+        today = local_date(tz_name)
+        stamp = (today, *(await self._stamp(db, user_id, today)))
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > time.monotonic() and cached[1] == stamp:
+            self._cache.move_to_end(user_id)
+            return cached[2], True
+
+        summary = await self.build_summary(db, user_id, parameters, tz_name)
+        self._cache[user_id] = (time.monotonic() + self._ttl_seconds, stamp, summary)
+        self._cache.move_to_end(user_id)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return summary, False
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        """ユーザーのキャッシュを破棄 (レビュー時)"""
+        self._cache.pop(user_id, None)
+
+    async def _stamp(self, db: AsyncSession, user_id: uuid.UUID, today: date) -> tuple:
+        """今日のレビュー数・有効な登録コース・最終学習日
+
+        (レビュー・コース登録の変更・セッション開始で変化する。デッキ全体は集計しない)
+        """
+        reviews = (
+            select(func.coalesce(func.sum(DailyUserStat.reviews), 0))
+            .where(DailyUserStat.user_id == user_id, DailyUserStat.stat_date == today)
+            .scalar_subquery()
+        )
+        enrolled = (
+            select(
+                func.array_agg(
+                    aggregate_order_by(UserEnrollment.course_id, UserEnrollment.course_id)
+                )
+            )
+            .where(UserEnrollment.user_id == user_id, UserEnrollment.is_active == True)  # noqa: E712
+            .scalar_subquery()
+        )
+        last_active = (
+            select(UserStreak.last_active_date).where(UserStreak.user_id == user_id).scalar_subquery()
+        )
+        row = (await db.execute(select(reviews, enrolled, last_active))).one()
+        reviews_today, course_ids, last_active_date = row
+        return reviews_today, tuple(course_ids or ()), last_active_date
+
+    async def build_summary(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        parameters: tuple[float, ...] | None = None,
+        tz_name: str | None = None,
+    ) -> DashboardSummaryResponse:
+        """登録済み資格の進捗サマリーを組み立て（未登録コースは表示しない）"""
+        now = datetime.now(timezone.utc)
+        rows = await self.get_course_counts(db, user_id)
+
+        # 登録済みコースのみ（登録が0件の場合はデフォルトコースを表示）
+        if any(row.enrolled for row in rows):
+            rows = [row for row in rows if row.enrolled]
+        else:
+            rows = [row for row in rows if row.is_default]
+
+        # コース別の現在平均想起率 (全カードを1クエリで読み込み一括計算)
+        deck = await retrievability_service.get_deck_retrievability(db, user_id, parameters=parameters)
+        course_retrievability = deck.by_course()
+
+        # コース別の今日の復習数 (due_counters のバケット合計)
+        due_counts = await due_counter_service.get_due_counts(db, user_id, on=now.date())
+
+        summaries = []
+        for row in rows:
+            total = row.total_cards or 0
+            mastered = row.mastered or 0
+            pass_prob = (mastered / total) if total > 0 else 0.0
+            summaries.append(
+                CourseSummary(
+                    course_id=row.id,
+                    course_code=row.code,
+                    course_name=row.name,
+                    color=row.color,
+                    total_cards=total,
+                    mastered=mastered,
+                    due_today=due_counts.get(row.id, 0),
+                    pass_probability=round(pass_prob, 4),
+                    avg_retrievability=round(course_retrievability.get(row.id, 0.0), 4),
+                )
+            )
+
+        # 今日の学習数・連続学習日数 (ユーザーのローカル日付)
+        today = local_date(tz_name)
+        studied_today = (await daily_stats_service.get_day(db, user_id, today)).reviews
+        streak, _ = await session_service.get_streak(db, user_id, today=today)
+
+        return DashboardSummaryResponse(
+            courses=summaries,
+            total_studied_today=studied_today,
+            streak_days=streak,
+        )
+
+    async def get_course_counts(self, db: AsyncSession, user_id: uuid.UUID) -> list:
+        """有効コースごとの登録有無・総カード数・習熟カード数を1クエリで集計"""
+        enrolled = exists().where(
+            UserEnrollment.user_id == user_id,
+            UserEnrollment.course_id == Course.id,
+            UserEnrollment.is_active == True,  # noqa: E712
+        )
+        stmt = (
+            select(
+                Course.id,
+                Course.code,
+                Course.name,
+                Course.color,
+                Course.is_default,
+                enrolled.label("enrolled"),
+                func.count(Card.id).label("total_cards"),
+                func.count(CardReview.id)
+                .filter(CardReview.state == 2, CardReview.stability > MASTERED_STABILITY_DAYS)
+                .label("mastered"),
+            )
+            .outerjoin(Card, Card.course_id == Course.id)
+            .outerjoin(
+                CardReview,
+                and_(CardReview.card_id == Card.id, CardReview.user_id == user_id),
+            )
+            .where(Course.is_active == True)  # noqa: E712
+            .group_by(Course.id)
+            .order_by(Course.sort_order)
+        )
+        result = await db.execute(stmt)
+        return list(result.all())
+
+
+# シングルトン
+dashboard_service = DashboardService(ttl_seconds=settings.dashboard_cache_ttl_seconds)
@@ -0,0 +1,102 @@
+"""Due counter service - (ユーザー, コース, due日) 単位の復習カード数を増分管理
+
+ダッシュボードの「今日の復習数」を CardReview の COUNT ではなく
+due_counters の小さな集計行から読み出す。レビュー時は旧due日のバケットを -1、
+新due日のバケットを +1 し、ずれは reconcile で CardReview から再構築して修復する。
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Date, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.card import CardReview, DueCounter
+
+# (course_id, 変更前due (新規作成時None), 変更後due)
+DueChange = tuple[uuid.UUID, datetime | None, datetime]
+
+
+def due_bucket(due: datetime) -> date:
+    """due日時 → バケット日付 (UTC)"""
+    return due.astimezone(timezone.utc).date()
+
+
+class DueCounterService:
+    """due_counters の増分更新・読み出し・再構築"""
+
+    async def record(
+        self, db: AsyncSession, user_id: uuid.UUID, changes: list[DueChange]
+    ) -> None:
+        """CardReview の作成・due変更をカウンターに反映 (1回の複数行UPSERT)"""
+        deltas: dict[tuple[uuid.UUID, date], int] = defaultdict(int)
+        for course_id, old_due, new_due in changes:
+            if old_due is not None:
+                deltas[(course_id, due_bucket(old_due))] -= 1
+            deltas[(course_id, due_bucket(new_due))] += 1
+
+        rows = [
+            {"id": uuid.uuid4(), "user_id": user_id, "course_id": course_id, "due_date": day, "count": n}
+            for (course_id, day), n in deltas.items()
+            if n != 0
+        ]
+        if not rows:
+            return
+
+        stmt = insert(DueCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_due_counters_user_course_date",
+            set_={"count": DueCounter.count + stmt.excluded.count},
+        )
+        await db.execute(stmt)
+
+    async def get_due_counts(
+        self, db: AsyncSession, user_id: uuid.UUID, on: date | None = None
+    ) -> dict[uuid.UUID, int]:
+        """コース別の復習期日到来数 (due日 <= on のバケット合計)"""
+        on = on or datetime.now(timezone.utc).date()
+        result = await db.execute(
+            select(DueCounter.course_id, func.sum(DueCounter.count))
+            .where(DueCounter.user_id == user_id, DueCounter.due_date <= on)
+            .group_by(DueCounter.course_id)
+        )
+        return {course_id: max(int(total or 0), 0) for course_id, total in result.all()}
+
+    async def reconcile(self, db: AsyncSession, user_id: uuid.UUID | None = None) -> int:
+        """CardReview からカウンターを再構築 (user_id 省略時は全ユーザー)
+
+        削除後に同時レビューが record() で作成した行とは ON CONFLICT で加算して合流する
+        (一意制約違反でジョブを失敗させない)。
+
+        Returns:
+            再構築後のカウンター行数
+        """
+        due_date = cast(func.timezone("UTC", CardReview.due), Date)
+        source = select(
+            func.gen_random_uuid(),
+            CardReview.user_id,
+            CardReview.course_id,
+            due_date,
+            func.count(),
+        ).group_by(CardReview.user_id, CardReview.course_id, due_date)
+        clear = delete(DueCounter)
+        if user_id is not None:
+            source = source.where(CardReview.user_id == user_id)
+            clear = clear.where(DueCounter.user_id == user_id)
+
+        await db.execute(clear)
+        stmt = insert(DueCounter).from_select(
+            ["id", "user_id", "course_id", "due_date", "count"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_due_counters_user_course_date",
+            set_={"count": DueCounter.count + stmt.excluded.count},
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+
+# シングルトン
+due_counter_service = DueCounterService()
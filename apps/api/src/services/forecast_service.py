@@ -0,0 +1,354 @@
+"""Review forecast - 今後N日間の日別復習数をFSRSでシミュレーション
+
+ユーザーの全CardReviewを配列に読み込み、FSRSの難易度・安定度・間隔の式を
+NumPyでベクトル化して1日ずつ進める。Monte Carlo モードでは ReviewLog の
+評価分布から評価をサンプリングし、runs 本のシミュレーションを同時に計算する。
+
+日単位の予測のため、同日内の (再)学習ステップは Again 時の追加レビュー1回として数える。
+結果はユーザーの次回レビュー (CardReview の更新) まで再利用する。
+シミュレーションは CPU を使うためスレッドで実行し、runs × カード数 × 日数が
+settings.forecast_max_cells を超える要求は ForecastTooLargeError で拒否する。
+作業配列は runs × カード数 の大きさになるため、runs を分割して同時に保持する要素数を
+settings.forecast_max_sim_cells 以下に抑える。
+"""
+
+import asyncio
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from fsrs.scheduler import DEFAULT_PARAMETERS, MAX_DIFFICULTY, MIN_DIFFICULTY, STABILITY_MIN
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import CardReview, ReviewLog
+from src.models.enrollment import UserEnrollment
+from src.services.fsrs_service import DEFAULT_RETENTION
+from src.services.retrievability_service import SECONDS_PER_DAY, forgetting_curve
+
+MAXIMUM_INTERVAL = 36500
+FORECAST_CACHE_SIZE = 256
+
+# 評価履歴がない場合の分布 (決定論モードと同じく Good のみ)
+DEFAULT_RATING_PROBS = np.array([0.0, 0.0, 1.0, 0.0])
+
+
+class ForecastTooLargeError(ValueError):
+    """シミュレーション規模 (runs × カード数 × 日数) が上限を超えた"""
+
+
+class FSRSVectorModel:
+    """py-fsrs Scheduler の状態遷移式を配列演算で評価"""
+
+    def __init__(self, parameters: tuple[float, ...] | None = None):
+        self.w = np.asarray(parameters or DEFAULT_PARAMETERS, dtype=np.float64)
+        self.decay = self.w[20]
+        self.factor = 0.9 ** (1 / -self.decay) - 1
+
+    def initial_stability(self, rating: np.ndarray) -> np.ndarray:
+        return np.maximum(self.w[rating - 1], STABILITY_MIN)
+
+    def initial_difficulty(self, rating: np.ndarray, clamp: bool = True) -> np.ndarray:
+        difficulty = self.w[4] - np.exp(self.w[5] * (rating - 1)) + 1
+        return np.clip(difficulty, MIN_DIFFICULTY, MAX_DIFFICULTY) if clamp else difficulty
+
+    def next_difficulty(self, difficulty: np.ndarray, rating: np.ndarray) -> np.ndarray:
+        delta = -(self.w[6] * (rating - 3))
+        damped = difficulty + (10.0 - difficulty) * delta / 9.0
+        target = self.initial_difficulty(np.array(4), clamp=False)
+        reverted = self.w[7] * target + (1 - self.w[7]) * damped
+        return np.clip(reverted, MIN_DIFFICULTY, MAX_DIFFICULTY)
+
+    def next_stability(
+        self,
+        difficulty: np.ndarray,
+        stability: np.ndarray,
+        retrievability: np.ndarray,
+        rating: np.ndarray,
+    ) -> np.ndarray:
+        w = self.w
+        hard_penalty = np.where(rating == 2, w[15], 1.0)
+        easy_bonus = np.where(rating == 4, w[16], 1.0)
+        recall = stability * (
+            1
+            + np.exp(w[8])
+            * (11 - difficulty)
+            * stability ** -w[9]
+            * (np.exp((1 - retrievability) * w[10]) - 1)
+            * hard_penalty
+            * easy_bonus
+        )
+        forget = np.minimum(
+            w[11]
+            * difficulty ** -w[12]
+            * ((stability + 1) ** w[13] - 1)
+            * np.exp((1 - retrievability) * w[14]),
+            stability / np.exp(w[17] * w[18]),
+        )
+        return np.maximum(np.where(rating == 1, forget, recall), STABILITY_MIN)
+
+    def next_interval(self, stability: np.ndarray, desired_retention: np.ndarray) -> np.ndarray:
+        """次回までの日数 (1日以上、最大間隔以下に丸め)"""
+        interval = stability / self.factor * (desired_retention ** (1 / -self.decay) - 1)
+        return np.clip(np.rint(interval), 1, MAXIMUM_INTERVAL).astype(np.int64)
+
+
+@dataclass
+class DeckState:
+    """シミュレーション開始時点のカード状態 (日数は開始日0時UTC基準)"""
+
+    due_day: np.ndarray
+    last_review_day: np.ndarray  # 未レビューは NaN
+    stability: np.ndarray
+    difficulty: np.ndarray
+    is_new: np.ndarray
+    desired_retention: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.due_day)
+
+
+@dataclass
+class Forecast:
+    """日別復習数の予測 (Monte Carlo 時は runs 本の平均と10/90パーセンタイル)"""
+
+    start: date
+    mean: np.ndarray
+    p10: np.ndarray
+    p90: np.ndarray
+    monte_carlo: bool
+    runs: int
+
+    def dates(self) -> list[date]:
+        return [self.start + timedelta(days=i) for i in range(len(self.mean))]
+
+
+def simulate_reviews(
+    state: DeckState,
+    days: int,
+    model: FSRSVectorModel,
+    rating_probs_new: np.ndarray | None = None,
+    rating_probs_review: np.ndarray | None = None,
+    runs: int = 1,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """日別復習数を (runs, days) 配列で返す
+
+    評価分布を省略した場合は全レビューを Good とする決定論シミュレーション。
+    """
+    counts = np.zeros((runs, days))
+    if not len(state):
+        return counts
+
+    def tile(values: np.ndarray) -> np.ndarray:
+        return np.tile(values, (runs, 1))
+
+    due = tile(np.maximum(np.floor(state.due_day), 0).astype(np.int64))
+    last_review = tile(state.last_review_day)
+    stability = tile(state.stability)
+    difficulty = tile(state.difficulty)
+    is_new = tile(state.is_new)
+
+    sampled = rating_probs_new is not None and rating_probs_review is not None
+    if sampled:
+        rng = rng or np.random.default_rng()
+        cum_new = np.cumsum(rating_probs_new)
+        cum_review = np.cumsum(rating_probs_review)
+
+    for day in range(days):
+        run_idx, card_idx = np.nonzero(due == day)
+        if not len(run_idx):
+            continue
+        new = is_new[run_idx, card_idx]
+
+        if sampled:
+            u = rng.random(len(run_idx))
+            ratings = np.where(
+                new,
+                np.searchsorted(cum_new, u, side="right"),
+                np.searchsorted(cum_review, u, side="right"),
+            )
+            ratings = np.minimum(ratings, 3) + 1
+        else:
+            ratings = np.full(len(run_idx), 3)
+
+        s = stability[run_idx, card_idx]
+        d = difficulty[run_idx, card_idx]
+        r = forgetting_curve(s, day - last_review[run_idx, card_idx], model.decay)
+        # 新規カードは初期値の式 (レビュー済みの式は安定度0で発散するため仮の値を渡す)
+        s_next = np.where(
+            new,
+            model.initial_stability(ratings),
+            model.next_stability(np.where(new, 5.0, d), np.where(new, 1.0, s), r, ratings),
+        )
+        d_next = np.where(new, model.initial_difficulty(ratings), model.next_difficulty(d, ratings))
+
+        # Again は同日内の (再)学習ステップで1回多くレビューする
+        np.add.at(counts[:, day], run_idx, 1 + (ratings == 1))
+
+        stability[run_idx, card_idx] = s_next
+        difficulty[run_idx, card_idx] = d_next
+        last_review[run_idx, card_idx] = day
+        is_new[run_idx, card_idx] = False
+        due[run_idx, card_idx] = day + model.next_interval(
+            s_next, state.desired_retention[card_idx]
+        )
+
+    return counts
+
+
+def simulate_reviews_chunked(
+    state: DeckState,
+    days: int,
+    model: FSRSVectorModel,
+    rating_probs_new: np.ndarray | None = None,
+    rating_probs_review: np.ndarray | None = None,
+    runs: int = 1,
+    max_cells: int | None = None,
+) -> np.ndarray:
+    """simulate_reviews を runs × カード数 が max_cells 以下になる本数ずつ実行して結合"""
+    chunk = max(1, (max_cells or settings.forecast_max_sim_cells) // max(len(state), 1))
+    return np.concatenate(
+        [
+            simulate_reviews(
+                state, days, model, rating_probs_new, rating_probs_review, runs=min(chunk, runs - start)
+            )
+            for start in range(0, runs, chunk)
+        ]
+    )
+
+
+class ForecastService:
+    """復習数予測 + ユーザー単位のキャッシュ (次回レビューで無効化)"""
+
+    def __init__(self, cache_size: int = FORECAST_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple, tuple[tuple, Forecast]] = OrderedDict()
+
+    async def forecast(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        days: int,
+        monte_carlo: bool = False,
+        runs: int = 200,
+        parameters: tuple[float, ...] | None = None,
+        now: datetime | None = None,
+    ) -> Forecast:
+        """今日から days 日間の日別復習数を予測
+
+        Raises:
+            ForecastTooLargeError: runs × カード数 × days が settings.forecast_max_cells を超える
+        """
+        now = now or datetime.now(timezone.utc)
+        runs = runs if monte_carlo else 1
+        key = (user_id, days, monte_carlo, runs, parameters)
+        stamp = (now.date(), *(await self._review_stamp(db, user_id)))
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            self._cache.move_to_end(key)
+            return cached[1]
+
+        state = await self.load_deck_state(db, user_id, now)
+        cells = runs * len(state) * days
+        if cells > settings.forecast_max_cells:
+            raise ForecastTooLargeError(
+                f"予測の規模が上限を超えています (runs × カード数 {len(state)} × 日数 = {cells}、"
+                f"上限 {settings.forecast_max_cells})。runs または days を減らしてください"
+            )
+        model = FSRSVectorModel(parameters)
+        # NumPy の計算中もイベントループを止めない (runs は作業配列の上限ごとに分割)
+        if monte_carlo:
+            probs_new, probs_review = await self.rating_distribution(db, user_id)
+            counts = await asyncio.to_thread(
+                simulate_reviews_chunked, state, days, model, probs_new, probs_review, runs=runs
+            )
+        else:
+            counts = await asyncio.to_thread(simulate_reviews, state, days, model)
+
+        result = Forecast(
+            start=now.date(),
+            mean=counts.mean(axis=0),
+            p10=np.percentile(counts, 10, axis=0),
+            p90=np.percentile(counts, 90, axis=0),
+            monte_carlo=monte_carlo,
+            runs=runs,
+        )
+        self._cache[key] = (stamp, result)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _review_stamp(self, db: AsyncSession, user_id: uuid.UUID) -> tuple:
+        """CardReview の件数と最終レビュー日時 (レビュー・カード追加で変化する)"""
+        result = await db.execute(
+            select(func.count(), func.max(CardReview.last_review)).where(
+                CardReview.user_id == user_id
+            )
+        )
+        return tuple(result.one())
+
+    async def load_deck_state(
+        self, db: AsyncSession, user_id: uuid.UUID, now: datetime
+    ) -> DeckState:
+        """ユーザーの全CardReviewを1クエリで配列化 (登録コースの目標記憶率付き)"""
+        stmt = (
+            select(
+                cast(func.extract("epoch", CardReview.due), Float),
+                cast(func.extract("epoch", CardReview.last_review), Float),
+                cast(CardReview.stability, Float),
+                cast(CardReview.difficulty, Float),
+                CardReview.state,
+                cast(func.coalesce(UserEnrollment.desired_retention, DEFAULT_RETENTION), Float),
+            )
+            .outerjoin(
+                UserEnrollment,
+                (UserEnrollment.course_id == CardReview.course_id)
+                & (UserEnrollment.user_id == user_id),
+            )
+            .where(CardReview.user_id == user_id)
+        )
+        rows = (await db.execute(stmt)).all()
+        columns = list(zip(*rows, strict=True)) if rows else [()] * 6
+        due, last_review, stability, difficulty, state, retention = (
+            np.array(c, dtype=np.float64) for c in columns
+        )
+
+        start = datetime.combine(now.date(), datetime.min.time(), tzinfo=timezone.utc)
+        start_ts = start.timestamp()
+        return DeckState(
+            due_day=(due - start_ts) / SECONDS_PER_DAY,
+            last_review_day=(last_review - start_ts) / SECONDS_PER_DAY,
+            stability=stability,
+            difficulty=difficulty,
+            is_new=(state == 0) | (stability <= 0),
+            desired_retention=retention,
+        )
+
+    async def rating_distribution(
+        self, db: AsyncSession, user_id: uuid.UUID
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """ReviewLog の評価分布 (新規カードの初回 / それ以外)"""
+        is_first = ReviewLog.state_before == 0
+        result = await db.execute(
+            select(is_first, ReviewLog.rating, func.count())
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .where(CardReview.user_id == user_id)
+            .group_by(is_first, ReviewLog.rating)
+        )
+        histogram = np.zeros((2, 4))
+        for first, rating, count in result.all():
+            histogram[int(first), rating - 1] = count
+
+        def normalize(row: np.ndarray) -> np.ndarray:
+            return row / row.sum() if row.sum() else DEFAULT_RATING_PROBS
+
+        return normalize(histogram[1]), normalize(histogram[0])
+
+
+# シングルトン
+forecast_service = ForecastService()
@@ -0,0 +1,132 @@
+"""FSRS parameter optimizer - ReviewLog から個人別パラメータを最適化
+
+最適化 (py-fsrs Optimizer, PyTorch) はCPU負荷が高いため ProcessPoolExecutor で実行し、
+APIのイベントループをブロックしない。最適化中は DB 接続を保持せず (履歴の読み込み後に
+トランザクションを終えて接続をプールに返す)、結果は新しい短いトランザクションで
+User.fsrs_parameters に保存し、FSRSService がレビュー時に読み込む。
+
+`pip install "fsrs[optimizer]"` が必要。
+"""
+
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import CardReview, ReviewLog
+from src.models.user import User
+
+# (card_index, rating, reviewed_at epoch秒, response_time_ms)
+ReviewHistoryRow = tuple[int, int, float, int]
+
+
+def fit_parameters(history: list[ReviewHistoryRow]) -> list[float]:
+    """レビュー履歴からFSRSパラメータを最適化 (ワーカープロセスで実行)
+
+    プロセス間で受け渡すため、引数はプリミティブ値のタプルのみとする。
+    """
+    from fsrs import Optimizer, Rating
+    from fsrs import ReviewLog as FSRSReviewLog
+
+    review_logs = [
+        FSRSReviewLog(
+            card_id=card_index,
+            rating=Rating(rating),
+            review_datetime=datetime.fromtimestamp(reviewed_at, tz=timezone.utc),
+            review_duration=response_time_ms or None,
+        )
+        for card_index, rating, reviewed_at, response_time_ms in history
+    ]
+    return list(Optimizer(review_logs).compute_optimal_parameters())
+
+
+class FSRSOptimizerService:
+    """個人別FSRSパラメータの最適化ジョブ"""
+
+    def __init__(self, max_workers: int = 1):
+        self._max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn: イベントループやDB接続を子プロセスに複製しない
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        """ワーカープロセス停止 (アプリ終了時)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def load_review_history(
+        self, db: AsyncSession, user_id: uuid.UUID
+    ) -> list[ReviewHistoryRow]:
+        """ユーザーの全ReviewLogを1クエリで取得 (カードIDは連番に変換)"""
+        stmt = (
+            select(
+                ReviewLog.card_review_id,
+                ReviewLog.rating,
+                cast(func.extract("epoch", ReviewLog.reviewed_at), Float),
+                ReviewLog.response_time_ms,
+            )
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .where(CardReview.user_id == user_id)
+            .order_by(ReviewLog.reviewed_at)
+        )
+        rows = (await db.execute(stmt)).all()
+
+        card_index: dict[uuid.UUID, int] = {}
+        return [
+            (card_index.setdefault(card_review_id, len(card_index)), rating, reviewed_at, response_ms or 0)
+            for card_review_id, rating, reviewed_at, response_ms in rows
+        ]
+
+    async def optimize_user(self, db: AsyncSession, user: User) -> dict | None:
+        """ユーザーのFSRSパラメータを最適化して保存
+
+        履歴を読み込んだら db のトランザクションをコミットして接続を返し、最適化後の
+        パラメータ更新は新しいトランザクションで行う (コミットは呼び出し側)。
+        レビュー数が fsrs_optimizer_min_reviews 未満の場合は None を返す。
+        fsrs[optimizer] 未インストール時は ImportError を送出する。
+        """
+        history = await self.load_review_history(db, user.id)
+        if len(history) < settings.fsrs_optimizer_min_reviews:
+            return None
+        # 最適化 (数十秒) の間、接続とトランザクションを保持しない
+        await db.commit()
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        parameters = await loop.run_in_executor(self._get_executor(), fit_parameters, history)
+        fit_seconds = time.perf_counter() - started
+
+        user.fsrs_parameters = {
+            "parameters": parameters,
+            "review_count": len(history),
+            "optimized_at": datetime.now(timezone.utc).isoformat(),
+        }
+        logger.info(
+            f"FSRS parameters optimized: user={user.id} reviews={len(history)} "
+            f"fit={fit_seconds:.2f}s"
+        )
+        return {
+            "user_id": str(user.id),
+            "review_count": len(history),
+            "parameters": parameters,
+            "fit_seconds": round(fit_seconds, 2),
+        }
+
+
+# シングルトン
+fsrs_optimizer_service = FSRSOptimizerService(max_workers=settings.fsrs_optimizer_workers)
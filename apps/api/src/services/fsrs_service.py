@@ -1,24 +1,82 @@
 """FSRS (Free Spaced Repetition Scheduler) service"""
 
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 
 from fsrs import Card as FSRSCard
 from fsrs import Rating, Scheduler, State
-from sqlalchemy import select
+from fsrs.scheduler import DEFAULT_PARAMETERS
+from sqlalchemy import DateTime, Select, func, literal, select
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 from src.models.card import Card, CardReview, ReviewLog
+from src.models.enrollment import UserEnrollment
+from src.services.due_counter_service import due_counter_service
+
+DEFAULT_RETENTION = 0.9
+
+# (目標記憶率, パラメータセット) ごとのSchedulerキャッシュ上限
+SCHEDULER_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=SCHEDULER_CACHE_SIZE)
+def _build_scheduler(desired_retention: float, parameters: tuple[float, ...]) -> Scheduler:
+    return Scheduler(
+        parameters=parameters,
+        desired_retention=desired_retention,
+        enable_fuzzing=True,
+    )
+
+
+def get_scheduler(
+    desired_retention: float = DEFAULT_RETENTION,
+    parameters: tuple[float, ...] | None = None,
+) -> Scheduler:
+    """目標記憶率 × パラメータセットに対応するSchedulerを取得 (LRUキャッシュ)
+
+    Numeric列由来のDecimalと浮動小数点の誤差で別キーにならないよう、
+    記憶率は小数第3位 (desired_retention列の精度) に丸める。
+    """
+    return _build_scheduler(
+        round(float(desired_retention), 3),
+        tuple(parameters) if parameters else DEFAULT_PARAMETERS,
+    )
+
+
+def user_parameters(fsrs_parameters: dict | None) -> tuple[float, ...] | None:
+    """User.fsrs_parameters (最適化済みの重み) → Schedulerパラメータ
+
+    未最適化、または形式の異なる旧パラメータの場合は None (デフォルト重み) を返す。
+    """
+    if not fsrs_parameters:
+        return None
+    parameters = fsrs_parameters.get("parameters")
+    if not parameters or len(parameters) != len(DEFAULT_PARAMETERS):
+        return None
+    return tuple(float(p) for p in parameters)
+
+
+@dataclass
+class ReviewTarget:
+    """レビュー対象: CardReview + 登録コースの目標記憶率に応じたScheduler"""
+
+    card_review: CardReview
+    scheduler: Scheduler
+    created: bool = False  # このリクエストで新規作成したCardReviewか
+    topic_id: uuid.UUID | None = None
+    is_synergy: bool = False
 
 
 class FSRSService:
     """py-fsrs v6 wrapper for spaced repetition scheduling"""
 
-    def __init__(self, desired_retention: float = 0.9):
-        self.scheduler = Scheduler(
-            desired_retention=desired_retention,
-            enable_fuzzing=True,
-        )
+    def __init__(self, desired_retention: float = DEFAULT_RETENTION):
+        self.scheduler = get_scheduler(desired_retention)
 
     @staticmethod
     def rating_from_int(value: int) -> Rating:
@@ -49,24 +107,56 @@ class FSRSService:
         card_review: CardReview,
         rating_int: int,
         response_time_ms: int = 0,
+        scheduler: Scheduler | None = None,
     ) -> tuple[CardReview, ReviewLog]:
         """カードをレビューしてFSRS状態を更新"""
-        rating = self.rating_from_int(rating_int)
         now = datetime.now(timezone.utc)
+        log_values = self._schedule(
+            card_review, rating_int, response_time_ms, now, scheduler or self.scheduler
+        )
+        return card_review, ReviewLog(**log_values)
+
+    def review_cards(
+        self,
+        items: list[tuple[ReviewTarget, int, int]],
+    ) -> list[dict]:
+        """複数カードを一括レビュー → ReviewLog の行データ一覧を返す
+
+        items: (ReviewTarget, rating, response_time_ms) のリスト
+        """
+        now = datetime.now(timezone.utc)
+        return [
+            self._schedule(target.card_review, rating_int, response_time_ms, now, target.scheduler)
+            for target, rating_int, response_time_ms in items
+        ]
+
+    def _schedule(
+        self,
+        card_review: CardReview,
+        rating_int: int,
+        response_time_ms: int,
+        now: datetime,
+        scheduler: Scheduler,
+    ) -> dict:
+        """CardReview をFSRSで更新し、ReviewLog の列値を返す"""
+        rating = self.rating_from_int(rating_int)
 
         # 現在の状態を保存
         state_before = card_review.state
         difficulty_before = float(card_review.difficulty)
         stability_before = float(card_review.stability)
 
-        # py-fsrs Card に変換してレビュー
+        # py-fsrs Card に変換してレビュー (レビュー直前の想起率も記録、新規カードは None)
         fsrs_card = self._card_review_to_fsrs_card(card_review)
-        updated_card, _review_log = self.scheduler.review_card(fsrs_card, rating)
+        retrievability_before = (
+            scheduler.get_card_retrievability(fsrs_card, now) if state_before != 0 else None
+        )
+        updated_card, _review_log = scheduler.review_card(fsrs_card, rating)
 
         # DB CardReview を更新
         card_review.difficulty = updated_card.difficulty
         card_review.stability = updated_card.stability
-        card_review.retrievability = self.scheduler.get_card_retrievability(updated_card)
+        card_review.retrievability = scheduler.get_card_retrievability(updated_card)
         new_state = updated_card.state.value
         card_review.due = updated_card.due
         card_review.last_review = now
@@ -76,21 +166,25 @@ class FSRSService:
             card_review.lapses += 1
         card_review.state = new_state
 
-        # ReviewLog 作成
-        review_log = ReviewLog(
-            card_review_id=card_review.id,
-            rating=rating_int,
-            state_before=state_before,
-            state_after=updated_card.state.value,
-            difficulty_before=difficulty_before,
-            difficulty_after=updated_card.difficulty,
-            stability_before=stability_before,
-            stability_after=updated_card.stability,
-            response_time_ms=response_time_ms,
-            reviewed_at=now,
-        )
+        return {
+            "id": uuid.uuid4(),
+            "card_review_id": card_review.id,
+            "rating": rating_int,
+            "state_before": state_before,
+            "state_after": new_state,
+            "difficulty_before": difficulty_before,
+            "difficulty_after": updated_card.difficulty,
+            "stability_before": stability_before,
+            "stability_after": updated_card.stability,
+            "retrievability_before": retrievability_before,
+            "response_time_ms": response_time_ms,
+            "reviewed_at": now,
+        }
 
-        return card_review, review_log
+    async def insert_review_logs(self, db: AsyncSession, rows: list[dict]) -> None:
+        """ReviewLog を1回の複数行INSERTで保存"""
+        if rows:
+            await db.execute(insert(ReviewLog).values(rows))
 
     async def get_due_cards(
         self,
@@ -102,52 +196,211 @@ class FSRSService:
         """復習期日到来カードを取得"""
         now = datetime.now(timezone.utc)
 
+        result = await db.execute(self.due_cards_stmt(user_id, now, course_id, limit))
+        return list(result.scalars().all())
+
+    async def get_due_or_new_cards(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID | None = None,
+        limit: int = 25,
+    ) -> list[CardReview]:
+        """復習期日到来カード (0件なら未学習カードからCardReviewを一括作成)"""
+        card_reviews = await self.get_due_cards(db, user_id, course_id=course_id, limit=limit)
+        if card_reviews:
+            return card_reviews
+
+        card_reviews = await self.introduce_new_cards(db, user_id, course_id=course_id, limit=limit)
+        await due_counter_service.record(
+            db, user_id, [(cr.course_id, None, cr.due) for cr in card_reviews]
+        )
+        return card_reviews
+
+    async def load_cards(
+        self,
+        db: AsyncSession,
+        card_reviews: list[CardReview],
+        compact: bool = False,
+    ) -> dict[uuid.UUID, Card]:
+        """CardReview に対応するカード内容を1回の IN クエリで取得
+
+        compact: レビューUIで使う列 (表面・裏面) のみ読み込む
+        """
+        if not card_reviews:
+            return {}
+        stmt = select(Card).where(Card.id.in_({cr.card_id for cr in card_reviews}))
+        if compact:
+            stmt = stmt.options(load_only(Card.course_id, Card.front, Card.back))
+        result = await db.execute(stmt)
+        return {card.id: card for card in result.scalars().all()}
+
+    @staticmethod
+    def due_cards_stmt(
+        user_id: uuid.UUID,
+        now: datetime,
+        course_id: uuid.UUID | None = None,
+        limit: int = 25,
+    ) -> Select:
+        """復習キューのクエリ
+
+        ix_card_reviews_user_(course_)due_state の範囲スキャンになるよう、
+        コース絞り込みは非正規化した CardReview.course_id で行う (JOINなし)。
+        """
         stmt = (
             select(CardReview)
             .where(CardReview.user_id == user_id)
             .where(CardReview.due <= now)
         )
         if course_id:
-            stmt = stmt.join(Card, CardReview.card_id == Card.id).where(
-                Card.course_id == course_id
-            )
+            stmt = stmt.where(CardReview.course_id == course_id)
         # New cards first, then by due date
-        stmt = stmt.order_by(CardReview.state, CardReview.due).limit(limit)
+        return stmt.order_by(CardReview.state, CardReview.due).limit(limit)
 
+    async def introduce_new_cards(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID | None = None,
+        limit: int = 25,
+    ) -> list[CardReview]:
+        """未学習カードのCardReviewを1回の INSERT ... SELECT で一括作成
+
+        同時リクエストで同じカードが選ばれても ON CONFLICT (user_id, card_id) で
+        重複作成せず、実際に挿入された行だけを返す。
+        """
+        now = datetime.now(timezone.utc)
+        seen = select(CardReview.id).where(
+            CardReview.user_id == user_id, CardReview.card_id == Card.id
+        )
+        source = select(
+            func.gen_random_uuid(),
+            literal(user_id, PG_UUID(as_uuid=True)),
+            Card.id,
+            Card.course_id,
+            literal(0),
+            literal(0),
+            literal(1.0),
+            literal(0),  # New
+            literal(now, DateTime(timezone=True)),
+            literal(0),
+            literal(0),
+        ).where(~seen.exists())
+        if course_id:
+            source = source.where(Card.course_id == course_id)
+        source = source.order_by(Card.created_at).limit(limit)
+
+        stmt = (
+            insert(CardReview)
+            .from_select(
+                [
+                    "id", "user_id", "card_id", "course_id", "difficulty", "stability",
+                    "retrievability", "state", "due", "reps", "lapses",
+                ],
+                source,
+            )
+            .on_conflict_do_nothing(constraint="uq_card_reviews_user_card")
+            .returning(CardReview)
+        )
         result = await db.execute(stmt)
         return list(result.scalars().all())
 
-    async def get_or_create_review(
+    async def get_or_create_reviews(
         self,
         db: AsyncSession,
         user_id: uuid.UUID,
-        card_id: uuid.UUID,
-    ) -> CardReview:
-        """ユーザー×カードのCardReviewを取得 or 新規作成"""
-        stmt = select(CardReview).where(
-            CardReview.user_id == user_id,
-            CardReview.card_id == card_id,
+        card_ids: list[uuid.UUID],
+        parameters: tuple[float, ...] | None = None,
+    ) -> dict[uuid.UUID, ReviewTarget]:
+        """複数カードのCardReviewを1クエリで取得 (未作成分は新規作成)
+
+        登録コースの desired_retention も同じクエリで取得し、
+        対応するSchedulerをキャッシュから割り当てる。
+        未作成分は INSERT ... ON CONFLICT (user_id, card_id) DO NOTHING で作成し、
+        同時リクエストが先に作成した行は読み直す (一意制約違反にしない)。
+        存在しないカードIDは結果に含まれない。
+        """
+        stmt = (
+            select(
+                Card.id,
+                Card.course_id,
+                Card.topic_id,
+                Card.is_synergy,
+                CardReview,
+                func.coalesce(UserEnrollment.desired_retention, DEFAULT_RETENTION),
+            )
+            .outerjoin(
+                CardReview,
+                (CardReview.card_id == Card.id) & (CardReview.user_id == user_id),
+            )
+            .outerjoin(
+                UserEnrollment,
+                (UserEnrollment.course_id == Card.course_id)
+                & (UserEnrollment.user_id == user_id),
+            )
+            .where(Card.id.in_(set(card_ids)))
         )
-        result = await db.execute(stmt)
-        card_review = result.scalar_one_or_none()
-
-        if card_review is None:
-            now = datetime.now(timezone.utc)
-            card_review = CardReview(
-                user_id=user_id,
-                card_id=card_id,
-                difficulty=0,
-                stability=0,
-                retrievability=1.0,
-                state=0,  # New
-                due=now,
-                reps=0,
-                lapses=0,
+        rows = (await db.execute(stmt)).all()
+
+        missing = {
+            card_id: course_id for card_id, course_id, _, _, card_review, _ in rows if card_review is None
+        }
+        created = await self._insert_reviews(db, user_id, missing) if missing else {}
+        existing = {}
+        if len(created) < len(missing):
+            result = await db.execute(
+                select(CardReview).where(
+                    CardReview.user_id == user_id,
+                    CardReview.card_id.in_(missing.keys() - created.keys()),
+                )
+            )
+            existing = {card_review.card_id: card_review for card_review in result.scalars().all()}
+
+        targets: dict[uuid.UUID, ReviewTarget] = {}
+        for card_id, _, topic_id, is_synergy, card_review, desired_retention in rows:
+            targets[card_id] = ReviewTarget(
+                card_review=card_review or created.get(card_id) or existing[card_id],
+                scheduler=get_scheduler(desired_retention, parameters),
+                created=card_id in created,
+                topic_id=topic_id,
+                is_synergy=is_synergy,
             )
-            db.add(card_review)
-            await db.flush()
+        return targets
 
-        return card_review
+    async def _insert_reviews(
+        self, db: AsyncSession, user_id: uuid.UUID, course_ids: dict[uuid.UUID, uuid.UUID]
+    ) -> dict[uuid.UUID, CardReview]:
+        """New状態のCardReviewを1回の複数行INSERTで作成 (card_id → course_id)
+
+        Returns:
+            実際に挿入された行 (card_id → CardReview)。同時に作成済みだった分は含まない
+        """
+        now = datetime.now(timezone.utc)
+        stmt = (
+            insert(CardReview)
+            .values(
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "card_id": card_id,
+                        "course_id": course_id,
+                        "difficulty": 0,
+                        "stability": 0,
+                        "retrievability": 1.0,
+                        "state": 0,  # New
+                        "due": now,
+                        "reps": 0,
+                        "lapses": 0,
+                    }
+                    for card_id, course_id in course_ids.items()
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_card_reviews_user_card")
+            .returning(CardReview)
+        )
+        result = await db.execute(stmt)
+        return {card_review.card_id: card_review for card_review in result.scalars().all()}
 
 
 # Default service instance
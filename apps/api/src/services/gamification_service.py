@@ -1,13 +1,26 @@
-"""Gamification service - XP, badges, daily missions"""
+"""Gamification service - XP, badges, daily missions
 
-import random
+XP付与は add_xp でリクエスト (サービスインスタンス) 内に溜め、flush_xp で
+ユーザーごとの加算を1回の UPSERT (total_xp = total_xp + n ... RETURNING) と
+XPLog の1回の複数行INSERTにまとめて反映する。読み取り → 加算 → 書き戻しをしないため、
+同時付与でも加算が失われない。
+"""
+
+import bisect
+import hashlib
 import uuid
-from datetime import date, datetime, timezone
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
 
-from sqlalchemy import func, select
+from sqlalchemy import Integer, String, case, cast, column, func, literal, select, true, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import settings
+from src.models.card import DailyUserStat
 from src.models.gamification import Badge, DailyMission, UserBadge, UserXP, XPLog
+from src.services.badge_service import badge_catalog
+from src.services.leaderboard_service import LeaderboardEntry, leaderboard_service
 
 # XP配分テーブル
 XP_TABLE = {
@@ -21,6 +34,9 @@ XP_TABLE = {
     "mission_complete": 0,  # ミッション報酬はミッション定義に従う
 }
 
+# 資格別XPの列
+COURSE_XP_COLUMNS = {"CIA": "cia_xp", "CISA": "cisa_xp", "CFE": "cfe_xp"}
+
 # レベル閾値 (累積XP)
 LEVEL_THRESHOLDS = [
     0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5200,     # Lv1-10
@@ -134,13 +150,57 @@ MISSION_TEMPLATES = [
     {"type": "speed_review", "title": "{n}枚を10分以内にレビューしよう", "target": 15, "xp": 45},
 ]
 
+# 1日のミッション数 (種類の重複なし)
+MISSIONS_PER_DAY = 3
+
 
 def _calc_level(total_xp: int) -> int:
-    """累積XPからレベルを算出"""
-    for i in range(len(LEVEL_THRESHOLDS) - 1, -1, -1):
-        if total_xp >= LEVEL_THRESHOLDS[i]:
-            return i + 1
-    return 1
+    """累積XPからレベルを算出 (閾値以下の個数 = SQL の width_bucket と同じ)"""
+    return max(bisect.bisect_right(LEVEL_THRESHOLDS, total_xp), 1)
+
+
+def review_xp(rating: int, is_synergy: bool = False) -> tuple[int, str]:
+    """レビュー評価 → (XP, source)"""
+    source_map = {1: "review_again", 2: "review_hard", 3: "review_good", 4: "review_easy"}
+    source = source_map.get(rating, "review_good")
+    amount = XP_TABLE[source]
+    if is_synergy:
+        amount += XP_TABLE["synergy_bonus"]
+    return amount, source
+
+
+def _mission_key(text: str) -> str:
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def mission_today(at: datetime | None = None) -> date:
+    """デイリーミッションの日付 (at 時点、省略時は現在の UTC 日付)
+
+    API・レビュー反映ワーカー・夜間の一括生成で共通。レビューの反映ではレビュー日時を渡す。
+    """
+    return (at or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+
+
+def pick_mission_templates(user_id: uuid.UUID, mission_date: date) -> list[dict]:
+    """(ユーザー, 日付) で決まるミッションテンプレートの選択
+
+    種類ごとに md5("{user_id}:{日付}:{種類}:{テンプレート番号}") が最小のテンプレートを1つ、
+    そのうち md5("{user_id}:{日付}:{種類}") の小さい順に MISSIONS_PER_DAY 種類を選ぶ。
+    一括生成の SQL (pregenerate_daily_missions) と同じ規則なので、同時に生成しても
+    どちらの経路でも同じミッションになる。
+    """
+    base = f"{user_id}:{mission_date.isoformat()}:"
+    best: dict[str, tuple[str, dict]] = {}
+    for index, tmpl in enumerate(MISSION_TEMPLATES):
+        key = _mission_key(f"{base}{tmpl['type']}:{index}")
+        if tmpl["type"] not in best or key < best[tmpl["type"]][0]:
+            best[tmpl["type"]] = (key, tmpl)
+    types = sorted(best, key=lambda mission_type: _mission_key(base + mission_type))
+    return [best[mission_type][1] for mission_type in types[:MISSIONS_PER_DAY]]
+
+
+def _mission_title(tmpl: dict) -> str:
+    return tmpl["title"].replace("{n}", str(tmpl["target"]))
 
 
 def _xp_for_next_level(level: int) -> int:
@@ -155,11 +215,15 @@ class GamificationService:
 
     def __init__(self, db: AsyncSession):
         self.db = db
+        # flush_xp 待ちの付与: (user_id, amount, source, detail, course_code)
+        self._pending_xp: list[tuple[uuid.UUID, int, str, str | None, str | None]] = []
 
     async def get_or_create_xp(self, user_id: uuid.UUID) -> UserXP:
         """ユーザーXPレコード取得（なければ作成）"""
         result = await self.db.execute(
-            select(UserXP).where(UserXP.user_id == user_id)
+            select(UserXP)
+            .where(UserXP.user_id == user_id)
+            .execution_options(populate_existing=True)
         )
         xp = result.scalar_one_or_none()
         if not xp:
@@ -168,6 +232,17 @@ class GamificationService:
             await self.db.flush()
         return xp
 
+    def add_xp(
+        self,
+        user_id: uuid.UUID,
+        amount: int,
+        source: str,
+        detail: str | None = None,
+        course_code: str | None = None,
+    ) -> None:
+        """XP付与を溜める (DBへの反映は flush_xp)"""
+        self._pending_xp.append((user_id, amount, source, detail, course_code))
+
     async def award_xp(
         self,
         user_id: uuid.UUID,
@@ -176,33 +251,87 @@ class GamificationService:
         detail: str | None = None,
         course_code: str | None = None,
     ) -> dict:
-        """XP付与 + レベルアップ判定"""
-        xp = await self.get_or_create_xp(user_id)
-        old_level = xp.level
-
-        xp.total_xp += amount
-        # 資格別XP
-        if course_code == "CIA":
-            xp.cia_xp += amount
-        elif course_code == "CISA":
-            xp.cisa_xp += amount
-        elif course_code == "CFE":
-            xp.cfe_xp += amount
-
-        xp.level = _calc_level(xp.total_xp)
+        """XP付与 + レベルアップ判定 (溜めていた付与もまとめて反映)"""
+        self.add_xp(user_id, amount, source, detail, course_code)
+        return (await self.flush_xp())[user_id]
+
+    async def flush_xp(self) -> dict[uuid.UUID, dict]:
+        """溜めたXP付与を反映
+
+        UserXP はユーザーごとの合計を1回の複数行UPSERTで加算し、レベルは加算後の
+        total_xp から SQL 側 (width_bucket) で求めて RETURNING で受け取る。
+        XPLog は付与ごとに1行、1回の複数行INSERTで記録する。
+        ランキングへの反映はトランザクションのコミット後 (record_after_commit)。
+
+        Returns:
+            user_id → {xp_gained, total_xp, level, leveled_up, xp_to_next}
+        """
+        pending, self._pending_xp = self._pending_xp, []
+        if not pending:
+            return {}
+
+        totals: dict[uuid.UUID, dict[str, int]] = defaultdict(
+            lambda: dict.fromkeys(("total_xp", *COURSE_XP_COLUMNS.values()), 0)
+        )
+        for user_id, amount, _, _, course_code in pending:
+            totals[user_id]["total_xp"] += amount
+            if course_code in COURSE_XP_COLUMNS:
+                totals[user_id][COURSE_XP_COLUMNS[course_code]] += amount
 
-        # ログ記録
-        log = XPLog(user_id=user_id, amount=amount, source=source, detail=detail)
-        self.db.add(log)
+        stmt = insert(UserXP).values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    **values,
+                    "level": _calc_level(values["total_xp"]),
+                }
+                for user_id, values in totals.items()
+            ]
+        )
+        new_total = UserXP.total_xp + stmt.excluded.total_xp
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserXP.user_id],
+            set_={
+                **{
+                    column: getattr(UserXP, column) + getattr(stmt.excluded, column)
+                    for column in ("total_xp", *COURSE_XP_COLUMNS.values())
+                },
+                "level": func.greatest(
+                    func.width_bucket(new_total, literal(LEVEL_THRESHOLDS, ARRAY(Integer))), 1
+                ),
+                "updated_at": func.now(),
+            },
+        ).returning(UserXP.user_id, UserXP.total_xp, UserXP.level)
+        updated = (await self.db.execute(stmt)).all()
+
+        await self.db.execute(
+            insert(XPLog).values(
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "amount": amount,
+                        "source": source,
+                        "detail": detail,
+                    }
+                    for user_id, amount, source, detail, _ in pending
+                ]
+            )
+        )
 
-        leveled_up = xp.level > old_level
-        return {
-            "xp_gained": amount,
-            "total_xp": xp.total_xp,
-            "level": xp.level,
-            "leveled_up": leveled_up,
-            "xp_to_next": _xp_for_next_level(xp.level) - xp.total_xp,
-        }
+        results = {}
+        for user_id, total_xp, level in updated:
+            gained = totals[user_id]["total_xp"]
+            leaderboard_service.record_after_commit(self.db, user_id, total_xp, gained)
+            results[user_id] = {
+                "xp_gained": gained,
+                "total_xp": total_xp,
+                "level": level,
+                "leveled_up": level > _calc_level(total_xp - gained),
+                "xp_to_next": _xp_for_next_level(level) - total_xp,
+            }
+        return results
 
     async def award_review_xp(
         self,
@@ -212,13 +341,7 @@ class GamificationService:
         is_synergy: bool = False,
     ) -> dict:
         """レビュー評価に基づくXP付与"""
-        source_map = {1: "review_again", 2: "review_hard", 3: "review_good", 4: "review_easy"}
-        source = source_map.get(rating, "review_good")
-        amount = XP_TABLE[source]
-
-        if is_synergy:
-            amount += XP_TABLE["synergy_bonus"]
-
+        amount, source = review_xp(rating, is_synergy)
         return await self.award_xp(user_id, amount, source, course_code=course_code)
 
     async def get_user_profile(self, user_id: uuid.UUID) -> dict:
@@ -266,17 +389,11 @@ class GamificationService:
 
     async def get_daily_missions(self, user_id: uuid.UUID) -> list[dict]:
         """今日のデイリーミッション取得（なければ生成）"""
-        today = date.today()
-        result = await self.db.execute(
-            select(DailyMission).where(
-                DailyMission.user_id == user_id,
-                DailyMission.mission_date == today,
-            )
-        )
-        missions = result.scalars().all()
-
+        today = mission_today()
+        missions = await self._load_daily_missions(user_id, today)
         if not missions:
-            missions = await self._generate_daily_missions(user_id, today)
+            await self._generate_daily_missions(user_id, today)
+            missions = await self._load_daily_missions(user_id, today)
 
         return [
             {
@@ -292,103 +409,229 @@ class GamificationService:
             for m in missions
         ]
 
-    async def _generate_daily_missions(
+    async def _load_daily_missions(
         self, user_id: uuid.UUID, mission_date: date
     ) -> list[DailyMission]:
-        """デイリーミッション自動生成（3つ）"""
-        templates = random.sample(MISSION_TEMPLATES, min(3, len(MISSION_TEMPLATES)))
-        missions = []
-        for tmpl in templates:
-            title = tmpl["title"].replace("{n}", str(tmpl["target"]))
-            m = DailyMission(
-                user_id=user_id,
-                mission_date=mission_date,
-                mission_type=tmpl["type"],
-                title=title,
-                target_value=tmpl["target"],
-                xp_reward=tmpl["xp"],
+        result = await self.db.execute(
+            select(DailyMission)
+            .where(DailyMission.user_id == user_id, DailyMission.mission_date == mission_date)
+            .order_by(DailyMission.mission_type)
+        )
+        return list(result.scalars().all())
+
+    async def _generate_daily_missions(self, user_id: uuid.UUID, mission_date: date) -> None:
+        """デイリーミッション生成 (夜間の一括生成に漏れたユーザー用)
+
+        同時リクエストで重複しないよう ON CONFLICT DO NOTHING で挿入する。
+        """
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "mission_date": mission_date,
+                "mission_type": tmpl["type"],
+                "title": _mission_title(tmpl),
+                "target_value": tmpl["target"],
+                "current_value": 0,
+                "xp_reward": tmpl["xp"],
+                "is_completed": False,
+            }
+            for tmpl in pick_mission_templates(user_id, mission_date)
+        ]
+        await self.db.execute(
+            insert(DailyMission)
+            .values(rows)
+            .on_conflict_do_nothing(constraint="uq_daily_missions_user_date_type")
+        )
+
+    async def pregenerate_daily_missions(self, mission_date: date | None = None) -> int:
+        """直近 mission_active_days 日に学習したユーザーのミッションを1回の INSERT ... SELECT で生成
+
+        テンプレートの選択は pick_mission_templates と同じ md5 の順位を SQL で計算する。
+
+        Returns:
+            生成したミッション数
+        """
+        mission_date = mission_date or mission_today()
+        templates = (
+            values(
+                column("template_index", Integer),
+                column("mission_type", String),
+                column("title", String),
+                column("target_value", Integer),
+                column("xp_reward", Integer),
+                name="templates",
+            )
+            .data(
+                [
+                    (index, tmpl["type"], _mission_title(tmpl), tmpl["target"], tmpl["xp"])
+                    for index, tmpl in enumerate(MISSION_TEMPLATES)
+                ]
             )
-            self.db.add(m)
-            missions.append(m)
-        await self.db.flush()
-        return missions
+            .alias("templates")
+        )
+        active = (
+            select(DailyUserStat.user_id)
+            .where(
+                DailyUserStat.stat_date
+                >= mission_date - timedelta(days=settings.mission_active_days)
+            )
+            .distinct()
+            .subquery("active_users")
+        )
+        type_key = (
+            cast(active.c.user_id, String)
+            + literal(f":{mission_date.isoformat()}:")
+            + templates.c.mission_type
+        )
+        ranked = (
+            select(
+                active.c.user_id,
+                templates.c.mission_type,
+                templates.c.title,
+                templates.c.target_value,
+                templates.c.xp_reward,
+                func.md5(type_key).label("type_key"),
+                func.row_number()
+                .over(
+                    partition_by=(active.c.user_id, templates.c.mission_type),
+                    order_by=func.md5(
+                        type_key + literal(":") + cast(templates.c.template_index, String)
+                    ).collate("C"),
+                )
+                .label("template_rank"),
+            )
+            .select_from(active.join(templates, true()))
+            .subquery("ranked")
+        )
+        chosen = (
+            select(
+                ranked,
+                func.row_number()
+                .over(partition_by=ranked.c.user_id, order_by=ranked.c.type_key.collate("C"))
+                .label("type_rank"),
+            )
+            .where(ranked.c.template_rank == 1)
+            .subquery("chosen")
+        )
+        stmt = (
+            insert(DailyMission)
+            .from_select(
+                [
+                    "id",
+                    "user_id",
+                    "mission_date",
+                    "mission_type",
+                    "title",
+                    "target_value",
+                    "current_value",
+                    "xp_reward",
+                    "is_completed",
+                ],
+                select(
+                    func.gen_random_uuid(),
+                    chosen.c.user_id,
+                    literal(mission_date),
+                    chosen.c.mission_type,
+                    chosen.c.title,
+                    chosen.c.target_value,
+                    literal(0),
+                    chosen.c.xp_reward,
+                    literal(False),
+                ).where(chosen.c.type_rank <= MISSIONS_PER_DAY),
+            )
+            .on_conflict_do_nothing(constraint="uq_daily_missions_user_date_type")
+        )
+        result = await self.db.execute(stmt)
+        return result.rowcount
 
     async def update_mission_progress(
         self,
         user_id: uuid.UUID,
         mission_type: str,
         increment: int = 1,
+        mission_date: date | None = None,
     ) -> list[dict]:
-        """ミッション進捗更新 + 完了判定"""
-        today = date.today()
+        """ミッション進捗更新 + 完了判定 (完了XPは flush_xp で反映)
+
+        読み取り → 加算 → 書き戻しをせず1回の UPDATE ... RETURNING で加算と完了判定を行う。
+        未完了の行だけを更新するため、同じユーザーを同時に処理しても増分は失われず、
+        完了XPは完了に切り替わった1回だけ付与される。
+
+        mission_date: ミッションの日付 (省略時は今日。レビューの反映ではレビュー日時の日付)
+        """
+        new_value = DailyMission.current_value + increment
+        completes = new_value >= DailyMission.target_value
         result = await self.db.execute(
-            select(DailyMission).where(
+            update(DailyMission)
+            .where(
                 DailyMission.user_id == user_id,
-                DailyMission.mission_date == today,
+                DailyMission.mission_date == (mission_date or mission_today()),
                 DailyMission.mission_type == mission_type,
-                DailyMission.is_completed == False,
+                DailyMission.is_completed == False,  # noqa: E712
+            )
+            .values(
+                current_value=new_value,
+                is_completed=completes,
+                completed_at=case((completes, func.now()), else_=DailyMission.completed_at),
             )
+            .returning(DailyMission.title, DailyMission.xp_reward, DailyMission.is_completed)
+            .execution_options(synchronize_session=False)
         )
-        missions = result.scalars().all()
-        completed = []
 
-        for m in missions:
-            m.current_value += increment
-            if m.current_value >= m.target_value and not m.is_completed:
-                m.is_completed = True
-                m.completed_at = datetime.now(timezone.utc)
+        completed = []
+        for title, xp_reward, is_completed in result.all():
+            if is_completed:
                 # ミッション完了XP
-                await self.award_xp(user_id, m.xp_reward, "mission_complete", detail=m.title)
-                completed.append({"title": m.title, "xp_reward": m.xp_reward})
-
+                self.add_xp(user_id, xp_reward, "mission_complete", detail=title)
+                completed.append({"title": title, "xp_reward": xp_reward})
         return completed
 
     async def check_and_award_badges(
         self,
         user_id: uuid.UUID,
-        total_reviews: int = 0,
-        streak_days: int = 0,
-        synergy_reviews: int = 0,
+        total_reviews: int | None = None,
+        streak_days: int | None = None,
+        synergy_reviews: int | None = None,
         courses_studied: list[str] | None = None,
     ) -> list[dict]:
-        """バッジ獲得条件チェック + 付与"""
-        # 既に獲得済みバッジ
-        result = await self.db.execute(
-            select(UserBadge.badge_id).where(UserBadge.user_id == user_id)
+        """バッジ獲得条件チェック + 付与 (報酬XPは flush_xp で反映)
+
+        渡された (None でない) 指標の条件タイプのバッジだけを badge_catalog で判定する。
+        user_badges は (user_id, badge_id) 一意なので、同時に判定しても付与は1回。
+        """
+        metrics = {
+            "total_reviews": total_reviews,
+            "streak_days": streak_days,
+            "synergy_reviews": synergy_reviews,
+            "course_count": len(set(courses_studied)) if courses_studied is not None else None,
+        }
+        rules = await badge_catalog.evaluate(
+            self.db, user_id, {k: v for k, v in metrics.items() if v is not None}
         )
-        earned_ids = {row[0] for row in result.all()}
+        if not rules:
+            return []
 
-        # 全バッジ取得
-        result = await self.db.execute(select(Badge))
-        all_badges = result.scalars().all()
+        result = await self.db.execute(
+            insert(UserBadge)
+            .values([{"id": uuid.uuid4(), "user_id": user_id, "badge_id": r.badge_id} for r in rules])
+            .on_conflict_do_nothing(constraint="uq_user_badges_user_badge")
+            .returning(UserBadge.badge_id)
+        )
+        inserted = set(result.scalars().all())
+        badge_catalog.invalidate(user_id)
 
         newly_earned = []
-        for badge in all_badges:
-            if badge.id in earned_ids:
+        for rule in rules:
+            if rule.badge_id not in inserted:
                 continue
-
-            earned = False
-            cond = badge.condition
-
-            if cond.get("type") == "reviews" and total_reviews >= cond.get("count", 0):
-                earned = True
-            elif cond.get("type") == "streak" and streak_days >= cond.get("days", 0):
-                earned = True
-            elif cond.get("type") == "synergy_reviews" and synergy_reviews >= cond.get("count", 0):
-                earned = True
-            elif cond.get("type") == "triple_course" and courses_studied and len(set(courses_studied)) >= 3:
-                earned = True
-
-            if earned:
-                ub = UserBadge(user_id=user_id, badge_id=badge.id)
-                self.db.add(ub)
-                await self.award_xp(user_id, badge.xp_reward, "badge_earned", detail=badge.name)
-                newly_earned.append({
-                    "code": badge.code,
-                    "name": badge.name,
-                    "icon": badge.icon,
-                    "xp_reward": badge.xp_reward,
-                })
+            self.add_xp(user_id, rule.xp_reward, "badge_earned", detail=rule.name)
+            newly_earned.append({
+                "code": rule.code,
+                "name": rule.name,
+                "icon": rule.icon,
+                "xp_reward": rule.xp_reward,
+            })
 
         return newly_earned
 
@@ -411,21 +654,32 @@ class GamificationService:
             for log in logs
         ]
 
-    async def get_leaderboard(self, limit: int = 10) -> list[dict]:
-        """XPリーダーボード"""
-        result = await self.db.execute(
-            select(UserXP).order_by(UserXP.total_xp.desc()).limit(limit)
-        )
-        entries = result.scalars().all()
-        return [
-            {
-                "rank": i + 1,
-                "user_id": str(e.user_id),
-                "total_xp": e.total_xp,
-                "level": e.level,
-            }
-            for i, e in enumerate(entries)
-        ]
+    async def get_leaderboard(self, window: str = "all", limit: int = 10) -> list[dict]:
+        """XPリーダーボード (window: all / weekly / monthly)"""
+        entries = await leaderboard_service.top(self.db, window, limit)
+        return [_leaderboard_entry(e, window) for e in entries]
+
+    async def get_leaderboard_rank(
+        self, user_id: uuid.UUID, window: str = "all", radius: int = 2
+    ) -> dict:
+        """自分の順位 + 前後 radius 件"""
+        me = await leaderboard_service.rank(self.db, user_id, window)
+        neighbors = await leaderboard_service.around(self.db, user_id, window, radius)
+        return {
+            "rank": me.rank if me else None,
+            "xp": me.xp if me else 0,
+            "total_users": await leaderboard_service.size(self.db, window),
+            "neighbors": [_leaderboard_entry(e, window) for e in neighbors],
+        }
+
+
+def _leaderboard_entry(entry: LeaderboardEntry, window: str) -> dict:
+    """ランキング1行 (累計ランキングはレベルも返す)"""
+    row = {"rank": entry.rank, "user_id": str(entry.user_id), "xp": entry.xp}
+    if window == "all":
+        row["total_xp"] = entry.xp
+        row["level"] = _calc_level(entry.xp)
+    return row
 
 
 async def seed_badges(db: AsyncSession) -> None:
@@ -438,3 +692,4 @@ async def seed_badges(db: AsyncSession) -> None:
             badge = Badge(**badge_def)
             db.add(badge)
     await db.commit()
+    badge_catalog.invalidate()
@@ -0,0 +1,254 @@
+"""Leaderboard service - XPランキングのプロセス内インデックス
+
+ランキングは期間 (累計 all / 今週 weekly / 今月 monthly) ごとに SortedScoreSet で保持し、
+上位N件・自分の順位・前後の順位を O(log n) で返す。初回参照時 (および
+settings.leaderboard_reload_seconds 経過後・期間の切り替わり時) に
+累計は user_xp.total_xp、期間別は xp_logs の期間内合計から読み込み、
+以降は XP 付与ごとに record で増分反映する。複数ワーカー間のずれは再読み込みで収束する。
+トランザクション内の XP 付与は record_after_commit で Session.info に積み、コミット後に
+反映する (ロールバック・セーブポイントの巻き戻しで取り消された付与はランキングに載せない)。
+
+SortedScoreSet のメソッドは Redis sorted set (ZADD / ZINCRBY / ZREVRANK / ZREVRANGE) に
+対応しており、同じインターフェースのクラスを board_factory に渡せば共有ストアに差し替えられる。
+"""
+
+import bisect
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+from src.config import settings
+from src.models.gamification import UserXP, XPLog
+
+# Session.info のキー: コミット待ちの XP 付与 / セーブポイント開始時点の件数
+PENDING_KEY = "leaderboard_pending"
+SAVEPOINTS_KEY = "leaderboard_savepoints"
+
+
+class SortedScoreSet:
+    """スコア降順のメンバー集合 (同点はメンバーIDの昇順)
+
+    (-score, member) のソート済みリストと member → score の辞書を持ち、
+    順位・範囲の参照は二分探索で O(log n)。
+    """
+
+    def __init__(self) -> None:
+        self._scores: dict[uuid.UUID, int] = {}
+        self._keys: list[tuple[int, uuid.UUID]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, scores: dict[uuid.UUID, int]) -> None:
+        """全メンバーを一括で置き換え (O(n log n))"""
+        self._scores = dict(scores)
+        self._keys = sorted((-score, member) for member, score in self._scores.items())
+
+    def score(self, member: uuid.UUID) -> int | None:
+        return self._scores.get(member)
+
+    def set(self, member: uuid.UUID, score: int) -> None:
+        """スコアを設定 (ZADD)"""
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, member))]
+        self._scores[member] = score
+        bisect.insort(self._keys, (-score, member))
+
+    def incr(self, member: uuid.UUID, amount: int) -> int:
+        """スコアに加算 (ZINCRBY)"""
+        score = self._scores.get(member, 0) + amount
+        self.set(member, score)
+        return score
+
+    def rank(self, member: uuid.UUID) -> int | None:
+        """0始まりの順位 (ZREVRANK)、未登録なら None"""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._keys, (-score, member))
+
+    def range(self, start: int, stop: int) -> list[tuple[uuid.UUID, int]]:
+        """順位 start 以上 stop 未満の (member, score) (ZREVRANGE)"""
+        return [(member, -neg) for neg, member in self._keys[max(start, 0) : max(stop, 0)]]
+
+
+@dataclass
+class LeaderboardEntry:
+    rank: int  # 1始まり
+    user_id: uuid.UUID
+    xp: int
+
+
+def window_start(window: str, now: datetime | None = None) -> datetime | None:
+    """期間の開始日時 (UTC の月曜0時 / 月初0時、累計は None)"""
+    now = now or datetime.now(timezone.utc)
+    midnight = now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == "weekly":
+        return midnight - timedelta(days=midnight.weekday())
+    if window == "monthly":
+        return midnight.replace(day=1)
+    return None
+
+
+class LeaderboardService:
+    """期間別ランキングの読み込み・増分更新・参照"""
+
+    def __init__(
+        self,
+        reload_seconds: float = 300.0,
+        board_factory: Callable[[], SortedScoreSet] = SortedScoreSet,
+    ):
+        self._reload_seconds = reload_seconds
+        self._board_factory = board_factory
+        # window -> (期間開始, 再読み込み期限 (monotonic), ランキング)
+        self._boards: dict[str, tuple[datetime | None, float, SortedScoreSet]] = {}
+        # 読み込み中 (DB の応答待ち) に届いた XP 付与 (読み込み1回につき1つ)
+        self._loading: list[list[tuple[uuid.UUID, int, int, datetime]]] = []
+
+    def record(
+        self, user_id: uuid.UUID, total_xp: int, gained: int, earned_at: datetime | None = None
+    ) -> None:
+        """XP付与を読み込み済みのランキングに反映 (未読み込みの期間は次回参照時に DB から読む)
+
+        付与をコミットした後に呼ぶこと (トランザクション内では record_after_commit を使う)。
+        読み込み中の期間には、読み込んだランキングを差し替える前に適用する。
+        """
+        earned_at = earned_at or datetime.now(timezone.utc)
+        for window, (start, _, board) in self._boards.items():
+            self._apply(board, window, start, user_id, total_xp, gained, earned_at)
+        for buffer in self._loading:
+            buffer.append((user_id, total_xp, gained, earned_at))
+
+    @staticmethod
+    def _apply(
+        board: SortedScoreSet,
+        window: str,
+        start: datetime | None,
+        user_id: uuid.UUID,
+        total_xp: int,
+        gained: int,
+        earned_at: datetime,
+    ) -> None:
+        if window == "all":
+            board.set(user_id, total_xp)
+        elif start is not None and earned_at >= start:
+            board.incr(user_id, gained)
+
+    def record_after_commit(
+        self, db: AsyncSession, user_id: uuid.UUID, total_xp: int, gained: int
+    ) -> None:
+        """XP付与をセッションに積み、トランザクションのコミット後に record する"""
+        pending = db.info.setdefault(PENDING_KEY, [])
+        pending.append((user_id, total_xp, gained, datetime.now(timezone.utc)))
+
+    async def top(
+        self, db: AsyncSession, window: str = "all", limit: int = 10, offset: int = 0
+    ) -> list[LeaderboardEntry]:
+        """上位 limit 件 (offset 位以降)"""
+        board = await self._board(db, window)
+        return [
+            LeaderboardEntry(rank=offset + i + 1, user_id=member, xp=score)
+            for i, (member, score) in enumerate(board.range(offset, offset + limit))
+        ]
+
+    async def rank(
+        self, db: AsyncSession, user_id: uuid.UUID, window: str = "all"
+    ) -> LeaderboardEntry | None:
+        """ユーザーの順位 (ランキングに載っていなければ None)"""
+        board = await self._board(db, window)
+        rank = board.rank(user_id)
+        if rank is None:
+            return None
+        return LeaderboardEntry(rank=rank + 1, user_id=user_id, xp=board.score(user_id))
+
+    async def around(
+        self, db: AsyncSession, user_id: uuid.UUID, window: str = "all", radius: int = 2
+    ) -> list[LeaderboardEntry]:
+        """ユーザーの前後 radius 件ずつ (本人を含む)"""
+        board = await self._board(db, window)
+        rank = board.rank(user_id)
+        if rank is None:
+            return []
+        start = max(rank - radius, 0)
+        return [
+            LeaderboardEntry(rank=start + i + 1, user_id=member, xp=score)
+            for i, (member, score) in enumerate(board.range(start, rank + radius + 1))
+        ]
+
+    async def size(self, db: AsyncSession, window: str = "all") -> int:
+        return len(await self._board(db, window))
+
+    async def _board(self, db: AsyncSession, window: str) -> SortedScoreSet:
+        """期間のランキング (未読み込み・期限切れ・期間の切り替わり時は DB から読み込む)"""
+        start = window_start(window)
+        cached = self._boards.get(window)
+        if cached is not None and cached[0] == start and cached[1] > time.monotonic():
+            return cached[2]
+
+        if start is None:
+            stmt = select(UserXP.user_id, UserXP.total_xp).where(UserXP.total_xp > 0)
+        else:
+            # ix_xp_logs_earned_at (user_id, amount を INCLUDE) の範囲スキャン
+            stmt = (
+                select(XPLog.user_id, func.sum(XPLog.amount))
+                .where(XPLog.earned_at >= start)
+                .group_by(XPLog.user_id)
+            )
+        # 応答待ちの間に他のリクエストが record した付与も新しいランキングに適用する
+        buffer: list[tuple[uuid.UUID, int, int, datetime]] = []
+        self._loading.append(buffer)
+        try:
+            rows = (await db.execute(stmt)).all()
+        finally:
+            self._loading = [pending for pending in self._loading if pending is not buffer]
+        board = self._board_factory()
+        board.load({user_id: int(xp) for user_id, xp in rows})
+        for recorded in buffer:
+            self._apply(board, window, start, *recorded)
+        self._boards[window] = (start, time.monotonic() + self._reload_seconds, board)
+        return board
+
+
+# シングルトン
+leaderboard_service = LeaderboardService(reload_seconds=settings.leaderboard_reload_seconds)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session: Session, transaction: SessionTransaction) -> None:
+    """セーブポイント開始時点のコミット待ち件数を記録 (巻き戻し時にそこまで切り詰める)"""
+    if transaction.nested and PENDING_KEY in session.info:
+        session.info.setdefault(SAVEPOINTS_KEY, {})[transaction] = len(session.info[PENDING_KEY])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous_transaction: SessionTransaction) -> None:
+    if not previous_transaction.nested:
+        return
+    pending = session.info.get(PENDING_KEY)
+    if pending:
+        del pending[session.info.get(SAVEPOINTS_KEY, {}).pop(previous_transaction, 0) :]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    for user_id, total_xp, gained, earned_at in session.info.pop(PENDING_KEY, []):
+        leaderboard_service.record(user_id, total_xp, gained, earned_at)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _clear_pending(session: Session, transaction: SessionTransaction) -> None:
+    """最上位トランザクションの終了 (コミット済み・ロールバック・close) で積み残しを破棄"""
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+        session.info.pop(SAVEPOINTS_KEY, None)
@@ -0,0 +1,258 @@
+"""Pass simulation - 模擬本試験の Monte Carlo シミュレーションによる合格確率
+
+プラグインの ExamConfig.sections (問題数・配点比率) と Topic.weight_pct (出題比率) から
+本試験を runs 回合成し、各問題の正誤をカードの現在想起率から抽選して合格ラインと比較する。
+
+1問ごとに「トピックを出題比率で選ぶ → トピック内のカードを一様に選ぶ → 想起率で正誤」
+と抽選すると、各問題は独立に p = Σ 出題比率 × トピックの平均正答確率 で正答する。
+そのためセクションの正答数は二項分布 Binomial(問題数, p) から直接サンプリングでき、
+全試行を NumPy で一括計算する。Part / Domain のカード数・想起率は topic_closure で
+配下の全トピックから合算する。未学習カードの想起率は0、
+正答確率には択一式の当て推量 (GUESS_RATE) を加える。
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.card import Card
+from src.models.course import Course, Topic
+from src.plugins.registry import get_plugin
+from src.services.prediction_service import passing_score_ratio
+from src.services.retrievability_service import retrievability_service
+from src.services.topic_tree_service import roll_up, topic_tree_service
+
+# 4択MCQ の当て推量で正答する確率
+GUESS_RATE = 0.25
+
+# 合格確率の信頼区間 (95%) の z 値
+CONFIDENCE_Z = 1.96
+
+
+@dataclass
+class ExamSection:
+    """模擬試験の1セクション (トピック配列はセクション内の出題対象)"""
+
+    name: str
+    questions: int
+    weight: float  # 総合得点に占める配点比率
+    topic_weights: np.ndarray  # セクション内の出題比率 (合計1)
+    correct_probs: np.ndarray  # トピック別の1問あたり正答確率
+
+    @property
+    def expected_score(self) -> float:
+        """セクション正答率の期待値"""
+        return float(self.topic_weights @ self.correct_probs)
+
+
+@dataclass
+class PassSimulation:
+    """シミュレーション結果 (得点・合格確率は 0.0-1.0)"""
+
+    runs: int
+    passing_score: float
+    pass_probability: float
+    ci_low: float
+    ci_high: float
+    mean_score: float
+    score_p5: float
+    score_p50: float
+    score_p95: float
+    elapsed_ms: float
+    sections: list[ExamSection] = field(default_factory=list)
+
+    @property
+    def sims_per_sec(self) -> float:
+        return self.runs / (self.elapsed_ms / 1000) if self.elapsed_ms > 0 else 0.0
+
+
+def simulate_exams(
+    sections: list[ExamSection], runs: int, rng: np.random.Generator | None = None
+) -> np.ndarray:
+    """runs 回分の総合得点 (0.0-1.0) を返す
+
+    Returns:
+        (runs,) の配列。セクション正答率を配点比率で加重平均した値
+    """
+    rng = rng or np.random.default_rng()
+    scores = np.zeros(runs)
+    total_weight = sum(section.weight for section in sections)
+    for section in sections:
+        if section.questions <= 0 or total_weight <= 0:
+            continue
+        correct = rng.binomial(section.questions, section.expected_score, size=runs)
+        scores += section.weight / total_weight * correct / section.questions
+    return scores
+
+
+def wilson_interval(successes: int, runs: int, z: float = CONFIDENCE_Z) -> tuple[float, float]:
+    """二項比率の Wilson スコア信頼区間"""
+    if runs <= 0:
+        return 0.0, 0.0
+    p = successes / runs
+    denominator = 1 + z**2 / runs
+    center = (p + z**2 / (2 * runs)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / runs + z**2 / (4 * runs**2)) / denominator
+    return max(0.0, float(center - margin)), min(1.0, float(center + margin))
+
+
+def _normalized(weights: list[float]) -> np.ndarray:
+    """比率を合計1に正規化 (全て0なら均等)"""
+    arr = np.asarray(weights, dtype=np.float64)
+    if arr.sum() <= 0:
+        arr = np.ones(len(arr))
+    return arr / arr.sum()
+
+
+class PassSimulationService:
+    """コースの出題構成 + ユーザーの想起率から合格確率をシミュレーション"""
+
+    async def simulate(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID,
+        runs: int = 10000,
+        parameters: tuple[float, ...] | None = None,
+        now: datetime | None = None,
+        rng: np.random.Generator | None = None,
+    ) -> PassSimulation | None:
+        """合格確率を Monte Carlo で推定 (コースが存在しなければ None)"""
+        course = await db.get(Course, course_id)
+        if course is None:
+            return None
+
+        sections = await self.build_sections(db, user_id, course, parameters, now)
+        passing = passing_score_ratio(course.code, course.exam_config)
+
+        started = time.perf_counter()
+        scores = simulate_exams(sections, runs, rng)
+        passed = int((scores >= passing).sum())
+        p5, p50, p95 = np.percentile(scores, [5, 50, 95])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        ci_low, ci_high = wilson_interval(passed, runs)
+        return PassSimulation(
+            runs=runs,
+            passing_score=passing,
+            pass_probability=passed / runs,
+            ci_low=ci_low,
+            ci_high=ci_high,
+            mean_score=float(scores.mean()),
+            score_p5=float(p5),
+            score_p50=float(p50),
+            score_p95=float(p95),
+            elapsed_ms=elapsed_ms,
+            sections=sections,
+        )
+
+    async def build_sections(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course: Course,
+        parameters: tuple[float, ...] | None = None,
+        now: datetime | None = None,
+    ) -> list[ExamSection]:
+        """ExamConfig.sections を Part (level=0) または Domain (level=1) トピックに対応付ける
+
+        セクション数が Part 数と一致すれば Part 配下の Domain を、Domain 数と一致すれば
+        Domain 1つを各セクションの出題対象とする。どちらでもなければ全 Domain を
+        (Part の比率 × Domain の比率) で出題する1セクションとして扱う。
+        """
+        topics = (
+            await db.execute(
+                select(Topic.id, Topic.parent_id, Topic.name, Topic.level, Topic.weight_pct)
+                .where(Topic.course_id == course.id, Topic.level <= 1)
+                .order_by(Topic.sort_order)
+            )
+        ).all()
+        pairs = await topic_tree_service.ancestor_pairs(db, course.id, max_level=1)
+        topic_counts = (
+            await db.execute(
+                select(Card.topic_id, func.count())
+                .where(Card.course_id == course.id)
+                .group_by(Card.topic_id)
+            )
+        ).all()
+        card_counts = roll_up(pairs, dict(topic_counts))
+        deck = await retrievability_service.get_deck_retrievability(
+            db, user_id, course_id=course.id, parameters=parameters, now=now
+        )
+        retrievability_sums = roll_up(pairs, deck.sum_by_topic())
+
+        def correct_prob(topic_id: uuid.UUID) -> float:
+            count = card_counts.get(topic_id, 0)
+            mean = retrievability_sums.get(topic_id, 0.0) / count if count else 0.0
+            return GUESS_RATE + (1 - GUESS_RATE) * mean
+
+        parts = [t for t in topics if t.level == 0]
+        domains = [t for t in topics if t.level == 1]
+        if not domains:
+            return []
+
+        plugin = get_plugin(course.code)
+        total_questions = plugin.exam_config.total_questions if plugin else 100
+        config_sections = plugin.exam_config.sections if plugin else []
+
+        def section(name: str, spec: dict | None, members: list, weights: list[float]) -> ExamSection:
+            weight_pct = float((spec or {}).get("weight_pct") or 100)
+            questions = (spec or {}).get("questions") or round(total_questions * weight_pct / 100)
+            return ExamSection(
+                name=name,
+                questions=max(int(questions), 1),
+                weight=weight_pct,
+                topic_weights=_normalized(weights),
+                correct_probs=np.array([correct_prob(t.id) for t in members]),
+            )
+
+        if config_sections and len(config_sections) == len(parts):
+            sections = []
+            for spec, part in zip(config_sections, parts, strict=True):
+                children = [t for t in domains if t.parent_id == part.id]
+                if children:
+                    sections.append(
+                        section(
+                            spec.get("name", part.name),
+                            spec,
+                            children,
+                            [float(t.weight_pct or 0) for t in children],
+                        )
+                    )
+            return sections
+
+        if config_sections and len(config_sections) == len(domains):
+            return [
+                section(spec.get("name", domain.name), spec, [domain], [1.0])
+                for spec, domain in zip(config_sections, domains, strict=True)
+            ]
+
+        part_shares = dict(
+            zip(
+                [t.id for t in parts],
+                _normalized([float(t.weight_pct or 0) for t in parts]),
+                strict=True,
+            )
+        )
+        weights = []
+        for domain in domains:
+            siblings = [t for t in domains if t.parent_id == domain.parent_id]
+            share = _normalized([float(t.weight_pct or 0) for t in siblings])[siblings.index(domain)]
+            weights.append(part_shares.get(domain.parent_id, 1.0) * share)
+        return [
+            section(
+                course.name,
+                {"questions": total_questions, "weight_pct": 100},
+                domains,
+                weights,
+            )
+        ]
+
+
+# シングルトン
+pass_simulation_service = PassSimulationService()
@@ -0,0 +1,292 @@
+"""Prediction service - コース別合格予測 + ユーザー単位のキャッシュ
+
+予測の入力 (総カード数・習熟カード数・Domain (level=1) トピックの重みと習熟度・
+直近の予測スナップショット) は1回の CTE クエリで取得する。Domain の習熟度は
+topic_closure 経由で配下の全トピックの集計を合算する。
+結果は (ユーザー, コース) ごとに最終レビュー日時をスタンプとしてキャッシュし、
+score_predictions へのスナップショット保存は合格確率が
+settings.prediction_snapshot_min_delta 以上変化した場合のみ行う。
+"""
+
+import math
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy import Float, and_, cast, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import Card, CardReview
+from src.models.course import Course, Topic
+from src.models.mastery import ScorePrediction, TopicStat
+from src.plugins.registry import get_plugin
+from src.schemas.prediction import PredictionHistoryPoint, PredictionResponse, WeakTopicPrediction
+from src.services.dashboard_service import MASTERED_STABILITY_DAYS
+from src.services.topic_tree_service import topic_tree_service
+
+PREDICTION_CACHE_SIZE = 1024
+
+# 弱点トピックの閾値 (習熟度がこれ未満)
+WEAK_MASTERY_THRESHOLD = 0.5
+
+
+def passing_score_ratio(code: str, exam_config: dict | None) -> float:
+    """合格ライン (0.0-1.0): プラグインの ExamConfig を優先し、なければ exam_config から推定"""
+    plugin = get_plugin(code)
+    if plugin is not None:
+        return plugin.exam_config.passing_score
+    return _passing_score_pct(exam_config) / 100
+
+
+def _passing_score_pct(exam_config: dict | None) -> int:
+    """exam_config からスコア形式の合格ライン(%)を推定"""
+    if not exam_config:
+        return 70
+    raw = exam_config.get("passing_score", "")
+    if isinstance(raw, (int, float)):
+        return int(raw * 100) if raw <= 1 else int(raw)
+    s = str(raw)
+    if "75/99" in s:
+        return 76  # USCPA scaled
+    if "60%" in s or "60/100" in s:
+        return 60
+    if "120/200" in s:
+        return 60
+    if "70/100" in s:
+        return 70
+    if "75%" in s:
+        return 75
+    return 70
+
+
+def _recommendation(pass_prob: float, weak_count: int, remaining: int) -> str:
+    """学習状況に基づく推奨アクション"""
+    if pass_prob >= 0.8:
+        return "合格圏内です。弱点トピックの仕上げと模試演習で安定させましょう。"
+    if pass_prob >= 0.5:
+        if weak_count > 0:
+            return f"合格に近づいています。弱点{weak_count}トピックの集中復習が効果的です。"
+        return "順調です。未学習カードの消化を優先しましょう。"
+    if remaining > 0:
+        return f"残り{remaining}枚のカードがあります。まず基礎トピックから取り組みましょう。"
+    return "カードを追加して学習を開始しましょう。"
+
+
+class PredictionService:
+    """合格予測の計算 + スナップショット保存 + キャッシュ (次回レビュー・問題回答で無効化)"""
+
+    def __init__(self, cache_size: int = PREDICTION_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._cache: OrderedDict[tuple, tuple[tuple, PredictionResponse]] = OrderedDict()
+
+    async def predict(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID,
+        now: datetime | None = None,
+    ) -> PredictionResponse | None:
+        """コース別合格予測 (コースが存在しなければ None)"""
+        now = now or datetime.now(timezone.utc)
+        key = (user_id, course_id)
+        stamp = (now.date(), *(await self._review_stamp(db, user_id, course_id)))
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            self._cache.move_to_end(key)
+            return cached[1]
+
+        rows = await self.load_inputs(db, user_id, course_id)
+        if not rows:
+            return None
+        prediction = self.build(rows)
+
+        # 前回スナップショットから十分に変化した場合のみ保存
+        last = rows[0].last_pass_probability
+        pass_prob = prediction.pass_probability / 100
+        if last is None or abs(pass_prob - float(last)) >= settings.prediction_snapshot_min_delta:
+            db.add(
+                ScorePrediction(
+                    user_id=user_id,
+                    course_id=course_id,
+                    predicted_score=prediction.predicted_score,
+                    pass_probability=round(pass_prob, 4),
+                    weak_topic_count=len(prediction.weak_topics),
+                )
+            )
+
+        self._cache[key] = (stamp, prediction)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return prediction
+
+    async def _review_stamp(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID
+    ) -> tuple:
+        """最終レビュー日時・問題回答数・カード数 (予測の入力が変わると変化する)"""
+        last_review = (
+            select(func.max(CardReview.last_review))
+            .where(CardReview.user_id == user_id, CardReview.course_id == course_id)
+            .scalar_subquery()
+        )
+        attempts = (
+            select(func.sum(TopicStat.question_attempts))
+            .where(TopicStat.user_id == user_id, TopicStat.course_id == course_id)
+            .scalar_subquery()
+        )
+        cards = select(func.count(Card.id)).where(Card.course_id == course_id).scalar_subquery()
+        result = await db.execute(select(last_review, attempts, cards))
+        return tuple(result.one())
+
+    async def load_inputs(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID
+    ) -> list:
+        """予測の入力を1クエリで取得 (Domain トピックごとに1行、コース単位の値は各行に同じ値)"""
+        card_counts = (
+            select(
+                func.count(Card.id).label("total_cards"),
+                func.count(CardReview.id)
+                .filter(CardReview.state == 2, CardReview.stability > MASTERED_STABILITY_DAYS)
+                .label("mastered"),
+            )
+            .outerjoin(
+                CardReview,
+                and_(CardReview.card_id == Card.id, CardReview.user_id == user_id),
+            )
+            .where(Card.course_id == course_id)
+            .cte("card_counts")
+        )
+        subtree = topic_tree_service.subtree_stats(user_id, course_id)
+        last_snapshot = (
+            select(ScorePrediction.pass_probability)
+            .where(ScorePrediction.user_id == user_id, ScorePrediction.course_id == course_id)
+            .order_by(ScorePrediction.predicted_at.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                Course.code,
+                Course.exam_config,
+                card_counts.c.total_cards,
+                card_counts.c.mastered,
+                last_snapshot.label("last_pass_probability"),
+                Topic.id.label("topic_id"),
+                Topic.name.label("topic_name"),
+                Topic.weight_pct,
+                subtree.c.mastery_score,
+                subtree.c.card_count,
+                subtree.c.question_attempts,
+            )
+            .select_from(Course)
+            .join(card_counts, true())
+            .outerjoin(Topic, and_(Topic.course_id == Course.id, Topic.level == 1))
+            .outerjoin(subtree, subtree.c.ancestor_id == Topic.id)
+            .where(Course.id == course_id)
+        )
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    async def get_history(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID,
+        start: datetime,
+        end: datetime,
+        points: int,
+    ) -> list[PredictionHistoryPoint]:
+        """start〜end の予測スナップショットを points 個以下の等幅の時間バケットに平均化
+
+        バケット番号 = floor((予測日時 - start) / 幅) で SQL 側で集計し、
+        各バケットの平均日時・平均合格確率・平均予測スコアを返す (スナップショットのない
+        バケットは返さない)。ix_score_predictions_user_course_time の範囲スキャンで読む。
+        """
+        width = max((end - start).total_seconds() / points, 1e-6)
+        epoch = cast(func.extract("epoch", ScorePrediction.predicted_at), Float)
+        bucket = func.least(func.floor((epoch - start.timestamp()) / width), points - 1)
+        result = await db.execute(
+            select(
+                func.to_timestamp(func.avg(epoch)),
+                func.avg(ScorePrediction.pass_probability),
+                func.avg(ScorePrediction.predicted_score),
+                func.count(),
+            )
+            .where(
+                ScorePrediction.user_id == user_id,
+                ScorePrediction.course_id == course_id,
+                ScorePrediction.predicted_at >= start,
+                ScorePrediction.predicted_at <= end,
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        return [
+            PredictionHistoryPoint(
+                predicted_at=predicted_at,
+                pass_probability=round(float(pass_prob) * 100, 1),
+                predicted_score=round(float(score), 1),
+                samples=samples,
+            )
+            for predicted_at, pass_prob, score, samples in result.all()
+        ]
+
+    def build(self, rows: list) -> PredictionResponse:
+        """入力行から予測を組み立て
+
+        予測スコア = トピック重み (weight_pct) による習熟度の加重平均
+        (重みが全て0なら単純平均)、合格確率 = 合格ライン付近のシグモイド近似。
+        """
+        head = rows[0]
+        topics = [row for row in rows if row.topic_id is not None]
+        masteries = [float(row.mastery_score or 0.0) for row in topics]
+        weights = [float(row.weight_pct or 0) for row in topics]
+        if not any(weights):
+            weights = [1.0] * len(topics)
+
+        total_weight = sum(weights)
+        score = (
+            sum(w * m for w, m in zip(weights, masteries, strict=True)) / total_weight if total_weight else 0.0
+        )
+        passing = passing_score_ratio(head.code, head.exam_config)
+        pass_prob = 1.0 / (1.0 + math.exp(-(score - passing) * 10))
+
+        # 弱点トピック: 重み × 未習熟度 の大きい順に priority を付与
+        weak = sorted(
+            (
+                (w * (1.0 - m), row, m)
+                for row, w, m in zip(topics, weights, masteries, strict=True)
+                if m < WEAK_MASTERY_THRESHOLD
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        weak_topics = [
+            WeakTopicPrediction(
+                topic_id=row.topic_id,
+                topic_name=row.topic_name,
+                mastery_score=round(mastery, 4),
+                weight_pct=float(row.weight_pct or 0),
+                priority=i + 1,
+            )
+            for i, (_, row, mastery) in enumerate(weak)
+        ]
+
+        total_cards = head.total_cards or 0
+        mastered = head.mastered or 0
+        return PredictionResponse(
+            predicted_score=round(score * 100, 1),
+            pass_probability=round(pass_prob * 100, 1),
+            passing_score=round(passing * 100),
+            weak_topics=weak_topics[:5],
+            total_topics=len(topics),
+            studied_topics=sum(
+                1 for row in topics if (row.card_count or 0) + (row.question_attempts or 0) > 0
+            ),
+            recommendation=_recommendation(pass_prob, len(weak_topics), total_cards - mastered),
+        )
+
+
+# シングルトン
+prediction_service = PredictionService()
@@ -0,0 +1,137 @@
+"""Retrievability engine - デッキ全体の現在想起率をNumPyで一括計算
+
+CardReview.retrievability はレビュー時点の値しか保持しないため、
+ダッシュボード・合格予測・弱点ランキングでは (stability, last_review) から
+「現在」の想起率をFSRS忘却曲線で再計算する。
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+from fsrs.scheduler import DEFAULT_PARAMETERS
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.card import Card, CardReview
+
+SECONDS_PER_DAY = 86400
+
+
+def forgetting_curve(
+    stability: np.ndarray,
+    elapsed_days: np.ndarray,
+    decay: float = DEFAULT_PARAMETERS[20],
+) -> np.ndarray:
+    """FSRS忘却曲線 R = (1 + FACTOR * t / S) ^ (-decay)
+
+    py-fsrs の Scheduler.get_card_retrievability と同じ式 (経過日数は切り捨て)。
+    未レビュー (stability <= 0 または経過日数NaN) のカードは 0 を返す。
+    """
+    factor = 0.9 ** (1 / -decay) - 1
+    stability = np.asarray(stability, dtype=np.float64)
+    elapsed = np.floor(np.maximum(np.asarray(elapsed_days, dtype=np.float64), 0))
+
+    reviewed = (stability > 0) & ~np.isnan(elapsed)
+    safe_stability = np.where(reviewed, stability, 1.0)
+    retrievability = (1 + factor * np.nan_to_num(elapsed) / safe_stability) ** -decay
+    return np.where(reviewed, retrievability, 0.0)
+
+
+@dataclass
+class DeckRetrievability:
+    """ユーザーのデッキ全体の現在想起率 (カード単位の配列)"""
+
+    course_ids: np.ndarray
+    topic_ids: np.ndarray
+    retrievability: np.ndarray
+    reviewed: np.ndarray  # 1回以上レビュー済みか
+
+    def __len__(self) -> int:
+        return len(self.retrievability)
+
+    def mean(self) -> float:
+        """デッキ全体の平均想起率"""
+        return float(self.retrievability.mean()) if len(self) else 0.0
+
+    def by_topic(self, reviewed_only: bool = False) -> dict[uuid.UUID, float]:
+        """トピック別の平均想起率 (reviewed_only: 未レビューカードを除外)"""
+        return self._group_mean(self.topic_ids, reviewed_only)
+
+    def by_course(self, reviewed_only: bool = False) -> dict[uuid.UUID, float]:
+        """コース別の平均想起率 (reviewed_only: 未レビューカードを除外)"""
+        return self._group_mean(self.course_ids, reviewed_only)
+
+    def sum_by_topic(self) -> dict[uuid.UUID, float]:
+        """トピック別の想起率の合計 (未学習カードを含む平均の分子に使う)"""
+        if not len(self):
+            return {}
+        unique, inverse = np.unique(self.topic_ids, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.retrievability)
+        return {key: float(s) for key, s in zip(unique, sums, strict=True)}
+
+    def _group_mean(self, keys: np.ndarray, reviewed_only: bool) -> dict[uuid.UUID, float]:
+        values = self.retrievability
+        if reviewed_only:
+            keys, values = keys[self.reviewed], values[self.reviewed]
+        if not len(values):
+            return {}
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values)
+        counts = np.bincount(inverse)
+        return {key: float(s / c) for key, s, c in zip(unique, sums, counts, strict=True)}
+
+
+class RetrievabilityService:
+    """(stability, last_review) を配列で読み込み、現在想起率を一括評価"""
+
+    async def get_deck_retrievability(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID | None = None,
+        parameters: tuple[float, ...] | None = None,
+        now: datetime | None = None,
+    ) -> DeckRetrievability:
+        """ユーザーの全カード (またはコース内カード) の現在想起率を計算"""
+        stmt = (
+            select(
+                Card.course_id,
+                Card.topic_id,
+                cast(CardReview.stability, Float),
+                cast(func.extract("epoch", CardReview.last_review), Float),
+            )
+            .join(Card, CardReview.card_id == Card.id)
+            .where(CardReview.user_id == user_id)
+        )
+        if course_id:
+            stmt = stmt.where(Card.course_id == course_id)
+        rows = (await db.execute(stmt)).all()
+
+        if not rows:
+            empty = np.array([], dtype=object)
+            return DeckRetrievability(
+                empty, empty, np.array([], dtype=np.float64), np.array([], dtype=bool)
+            )
+
+        course_ids, topic_ids, stability, last_review = zip(*rows, strict=True)
+        last_review_ts = np.array(last_review, dtype=np.float64)  # None → NaN
+        now_ts = (now or datetime.now(timezone.utc)).timestamp()
+        stability_arr = np.array(stability, dtype=np.float64)
+        decay = (parameters or DEFAULT_PARAMETERS)[20]
+
+        return DeckRetrievability(
+            course_ids=np.array(course_ids, dtype=object),
+            topic_ids=np.array(topic_ids, dtype=object),
+            retrievability=forgetting_curve(
+                stability_arr,
+                (now_ts - last_review_ts) / SECONDS_PER_DAY,
+                decay,
+            ),
+            reviewed=~np.isnan(last_review_ts) & (stability_arr > 0),
+        )
+
+
+# シングルトン
+retrievability_service = RetrievabilityService()
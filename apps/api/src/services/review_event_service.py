@@ -0,0 +1,314 @@
+"""Review side effects - レビューの副作用を write-behind で反映
+
+レビューAPIは FSRS の更新と review_events (outbox) への追記だけを行い、
+XP・デイリーミッション・バッジ・トピック習熟度の更新はワーカーが非同期に反映する。
+
+- レビューAPIは publish() でワーカーを起こす (プロセス内の通知のみ、内容は outbox が正)
+- ワーカーは少し待って連続レビューを溜め、未処理イベントを SKIP LOCKED でまとめて取り出す
+- ユーザーごとに増分を集約し、XP・ミッション・習熟度はユーザー単位の1回の更新にまとめる
+- 反映と processed_at の記録は同一トランザクション。ユーザーごとにセーブポイントで区切り、
+  失敗したユーザーのイベントだけ attempts を加算して再試行 (MAX_ATTEMPTS でデッドレター)
+  (プロセス停止中のイベントも定期ポーリング / `python -m src.jobs process-review-events` で回収)
+- 処理済みのイベントは `python -m src.jobs purge-review-events` で保持期間を過ぎたら削除する
+"""
+
+import asyncio
+import contextlib
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import settings
+from src.models.card import Card, ReviewEvent
+from src.models.course import Course
+from src.services.badge_service import badge_catalog
+from src.services.daily_stats_service import daily_stats_service
+from src.services.gamification_service import GamificationService, mission_today, review_xp
+from src.services.session_service import mastery_service, session_service
+
+# この回数反映に失敗したイベントは取り出し対象から外す
+MAX_ATTEMPTS = 5
+
+
+@dataclass
+class ClaimedEvent:
+    """取り出した未処理イベント (カード情報付き)"""
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    topic_id: uuid.UUID
+    course_code: str
+    is_synergy: bool
+    rating: int
+    response_time_ms: int
+    reviewed_at: datetime
+
+
+class ReviewEventProcessor:
+    """review_events を非同期に反映するワーカー"""
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        poll_seconds: float = 5.0,
+        flush_delay_seconds: float = 0.5,
+    ):
+        self._batch_size = batch_size
+        self._poll_seconds = poll_seconds
+        self._flush_delay_seconds = flush_delay_seconds
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def publish(self) -> None:
+        """新しいイベントをワーカーに通知"""
+        self._wakeup.set()
+
+    async def enqueue(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        reviews: list[tuple[uuid.UUID, int, int]],
+        reviewed_at: datetime,
+    ) -> None:
+        """レビュー (card_id, rating, response_time_ms) を outbox に追記して通知
+
+        レビューと同じトランザクションで1回の複数行INSERTを行う。
+        """
+        if not reviews:
+            return
+        await db.execute(
+            insert(ReviewEvent).values(
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "card_id": card_id,
+                        "rating": rating,
+                        "response_time_ms": response_time_ms,
+                        "reviewed_at": reviewed_at,
+                        "attempts": 0,
+                    }
+                    for card_id, rating, response_time_ms in reviews
+                ]
+            )
+        )
+        self.publish()
+
+    def start(self, session_factory: async_sessionmaker, workers: int = 1) -> None:
+        """ワーカー起動 (アプリ起動時)"""
+        self._tasks = [
+            asyncio.create_task(self._run(session_factory)) for _ in range(workers)
+        ]
+
+    async def stop(self) -> None:
+        """ワーカー停止 (アプリ終了時)。未処理イベントは outbox に残り次回起動時に反映"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, session_factory: async_sessionmaker) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_seconds)
+            self._wakeup.clear()
+            # 連続レビューを溜めてまとめて反映 (レビュー側のコミット待ちも兼ねる)
+            await asyncio.sleep(self._flush_delay_seconds)
+            try:
+                await self.drain(session_factory)
+            except Exception:
+                logger.exception("Review event processing failed")
+
+    async def drain(self, session_factory: async_sessionmaker) -> int:
+        """未処理イベントがなくなるまでバッチ単位で反映 (1バッチ1トランザクション)
+
+        反映に失敗したユーザーがいたバッチで止め、残りは次回のポーリングで再試行する。
+        """
+        total = 0
+        while True:
+            async with session_factory() as db:
+                events = await self._claim(db)
+                if not events:
+                    return total
+                try:
+                    applied = await self._apply(db, events)
+                    await db.commit()
+                except Exception:
+                    logger.exception(f"Review event batch failed: {len(events)} events")
+                    await db.rollback()
+                    return total
+            total += applied
+            if applied < len(events):
+                return total
+
+    async def process_batch(self, db: AsyncSession) -> int:
+        """1バッチ分を反映 (コミットは呼び出し側)
+
+        Returns:
+            取り出したイベント数 (0なら未処理イベントなし)
+        """
+        events = await self._claim(db)
+        if events:
+            await self._apply(db, events)
+        return len(events)
+
+    async def purge(self, db: AsyncSession, retention_days: int) -> int:
+        """処理済みから retention_days 日を過ぎたイベントを削除 (コミットは呼び出し側)
+
+        未処理・デッドレターのイベント (processed_at が NULL) は残す。
+
+        Returns:
+            削除したイベント数
+        """
+        result = await db.execute(
+            delete(ReviewEvent).where(
+                ReviewEvent.processed_at < func.now() - timedelta(days=retention_days)
+            )
+        )
+        return result.rowcount
+
+    async def _claim(self, db: AsyncSession) -> list[ClaimedEvent]:
+        """未処理イベントを古い順に取り出す (他ワーカーが処理中の行は飛ばす)"""
+        stmt = (
+            select(
+                ReviewEvent.id,
+                ReviewEvent.user_id,
+                Card.topic_id,
+                Course.code,
+                Card.is_synergy,
+                ReviewEvent.rating,
+                ReviewEvent.response_time_ms,
+                ReviewEvent.reviewed_at,
+            )
+            .join(Card, ReviewEvent.card_id == Card.id)
+            .join(Course, Card.course_id == Course.id)
+            .where(ReviewEvent.processed_at.is_(None), ReviewEvent.attempts < MAX_ATTEMPTS)
+            .order_by(ReviewEvent.reviewed_at)
+            .limit(self._batch_size)
+            .with_for_update(of=ReviewEvent, skip_locked=True)
+        )
+        result = await db.execute(stmt)
+        return [ClaimedEvent(*row) for row in result.all()]
+
+    async def _apply(self, db: AsyncSession, events: list[ClaimedEvent]) -> int:
+        """ユーザーごとにセーブポイント内で反映し、成功したイベントを処理済みにする
+
+        失敗したユーザーのイベントだけを巻き戻して attempts を加算する (他ユーザーは反映)。
+
+        Returns:
+            反映したイベント数
+        """
+        by_user: dict[uuid.UUID, list[ClaimedEvent]] = defaultdict(list)
+        for event in events:
+            by_user[event.user_id].append(event)
+
+        failed: set[uuid.UUID] = set()
+        for user_id, user_events in by_user.items():
+            try:
+                async with db.begin_nested():
+                    await self._apply_user(db, user_id, user_events)
+            except Exception:
+                logger.exception(
+                    f"Review events failed for user {user_id}: {len(user_events)} events"
+                )
+                failed.update(e.id for e in user_events)
+
+        applied = [e.id for e in events if e.id not in failed]
+        if applied:
+            await db.execute(
+                update(ReviewEvent)
+                .where(ReviewEvent.id.in_(applied))
+                .values(processed_at=datetime.now(timezone.utc))
+            )
+        if failed:
+            await self._record_failures(db, list(failed))
+        return len(applied)
+
+    async def _record_failures(self, db: AsyncSession, event_ids: list[uuid.UUID]) -> None:
+        """失敗回数を加算し、MAX_ATTEMPTS に達したイベントをデッドレターとして記録
+
+        デッドレターのイベントは processed_at が NULL のまま取り出し対象から外れる
+        (原因を修正後、attempts を 0 に戻せば再処理される)。
+        """
+        result = await db.execute(
+            update(ReviewEvent)
+            .where(ReviewEvent.id.in_(event_ids))
+            .values(attempts=ReviewEvent.attempts + 1)
+            .returning(ReviewEvent.id, ReviewEvent.user_id, ReviewEvent.attempts)
+        )
+        for event_id, user_id, attempts in result.all():
+            if attempts < MAX_ATTEMPTS:
+                continue
+            logger.error(
+                f"Review event dead-lettered after {MAX_ATTEMPTS} attempts: "
+                f"id={event_id} user={user_id}"
+            )
+
+    async def _apply_user(
+        self, db: AsyncSession, user_id: uuid.UUID, events: list[ClaimedEvent]
+    ) -> None:
+        """1ユーザー分のイベントを集約して反映"""
+        gamification = GamificationService(db)
+
+        # XP: (資格, 評価) ごとに合算し、ミッション・バッジの報酬と合わせて最後に1回で反映
+        xp_totals: Counter[tuple[str, str]] = Counter()
+        review_counts: Counter[tuple[str, str]] = Counter()
+        for event in events:
+            amount, source = review_xp(event.rating, event.is_synergy)
+            xp_totals[(event.course_code, source)] += amount
+            review_counts[(event.course_code, source)] += 1
+        for (course_code, source), amount in xp_totals.items():
+            gamification.add_xp(
+                user_id, amount, source, f"{review_counts[course_code, source]}件のレビュー", course_code
+            )
+
+        # デイリーミッション: レビューした日 (UTC) × 種類ごとに増分をまとめて1回
+        # (日付変更をまたいだイベント・再試行したイベントも処理した日ではなくレビューした日に数える)
+        mission_increments: Counter[tuple[date, str]] = Counter()
+        for event in events:
+            day = mission_today(event.reviewed_at)
+            mission_increments[(day, "review_cards")] += 1
+            mission_increments[(day, "review_good")] += event.rating >= 3
+            mission_increments[(day, "synergy_study")] += event.is_synergy
+        for (day, mission_type), increment in mission_increments.items():
+            if increment:
+                await gamification.update_mission_progress(
+                    user_id, mission_type, increment, mission_date=day
+                )
+
+        # トピック習熟度: Good以上を正解として順に反映
+        await mastery_service.update_mastery_bulk(
+            db,
+            user_id,
+            [(e.topic_id, e.rating >= 3, e.response_time_ms) for e in events],
+        )
+
+        # バッジ: 未獲得のバッジが残っている指標だけ判定 (ユーザーごとに1回)
+        # 累計は review_logs を走査せず daily_user_stats の集計行から読む
+        # (集計行はレビューと同じトランザクションで加算済み)
+        open_metrics = await badge_catalog.open_metrics(db, user_id)
+        metrics: dict = {}
+        if open_metrics & {"total_reviews", "synergy_reviews", "course_count"}:
+            total_reviews, synergy_reviews, courses_studied = await daily_stats_service.get_totals(db, user_id)
+            metrics.update(
+                total_reviews=total_reviews,
+                synergy_reviews=synergy_reviews,
+                courses_studied=courses_studied,
+            )
+        if "streak_days" in open_metrics:
+            metrics["streak_days"] = await session_service.get_streak_days(db, user_id)
+        if metrics:
+            await gamification.check_and_award_badges(user_id, **metrics)
+        await gamification.flush_xp()
+
+
+# シングルトン
+review_event_processor = ReviewEventProcessor(
+    batch_size=settings.review_event_batch_size,
+    poll_seconds=settings.review_event_poll_seconds,
+)
@@ -0,0 +1,265 @@
+"""ROI service - 実測の回答時間と状態遷移から残り学習時間を推定
+
+ReviewLog.response_time_ms のパーセンタイル (percentile_cont) をユーザー全体・トピック別に、
+レビュー前後の状態遷移の件数をユーザーごとに SQL で集計する。状態遷移は
+「習熟 (Review かつ stability > 21日) を吸収状態とするマルコフ連鎖」とみなし、
+各状態のカードが習熟するまでの期待レビュー回数を基本行列 (I - Q)^-1 から求める。
+履歴が少ないユーザーでも安定するよう、遷移確率には事前分布 (DEFAULT_TRANSITIONS) を混ぜる。
+
+推定値は roi_estimates に保存し、夜間ジョブ (precompute-roi) で直近の学習ユーザー分を
+事前計算する。API は保存済みの推定値を返し、存在しないか古い場合のみ再計算する。
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import and_, case, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.card import Card, CardReview, DailyUserStat, ReviewLog
+from src.models.enrollment import UserEnrollment
+from src.models.mastery import RoiEstimate
+from src.services.dashboard_service import MASTERED_STABILITY_DAYS
+
+# 状態: 0=New, 1=Learning, 2=Review (未習熟), 3=Relearning, 4=習熟 (吸収状態)
+STATES = 4
+MASTERED_STATE = 4
+
+# 履歴がない場合の遷移確率 (新規カード1枚 ≈ 5.5レビューで習熟)
+DEFAULT_TRANSITIONS = np.array(
+    [
+        [0.0, 0.85, 0.15, 0.0, 0.0],
+        [0.0, 0.3, 0.7, 0.0, 0.0],
+        [0.0, 0.0, 0.55, 0.1, 0.35],
+        [0.0, 0.0, 0.7, 0.3, 0.0],
+    ]
+)
+# 事前分布の重み (各状態の擬似レビュー件数)
+PRIOR_REVIEWS = 20
+# 1カードあたりの期待レビュー回数の上限
+MAX_EXPECTED_REVIEWS = 50.0
+
+# 回答時間の履歴がない場合の1レビューあたりの時間
+DEFAULT_RESPONSE_MS = 30000
+# トピック別の回答時間を使う最小レビュー件数 (未満ならユーザー全体の値)
+MIN_TOPIC_SAMPLES = 5
+
+
+def expected_reviews(transition_counts: np.ndarray) -> np.ndarray:
+    """状態遷移の件数 (4×5) → 各状態から習熟までの期待レビュー回数 (4,)
+
+    遷移確率 = (実測件数 + PRIOR_REVIEWS × DEFAULT_TRANSITIONS) の行正規化。
+    """
+    counts = np.asarray(transition_counts, dtype=np.float64) + PRIOR_REVIEWS * DEFAULT_TRANSITIONS
+    probs = counts / counts.sum(axis=1, keepdims=True)
+    fundamental = np.linalg.inv(np.eye(STATES) - probs[:, :STATES])
+    return np.minimum(fundamental.sum(axis=1), MAX_EXPECTED_REVIEWS)
+
+
+class RoiService:
+    """ROI推定の計算・保存・読み出し"""
+
+    async def get_estimate(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID
+    ) -> RoiEstimate:
+        """保存済みの推定値 (なければ、または max_age より古ければ再計算して保存)"""
+        estimate = await self._load(db, user_id, course_id)
+        max_age = timedelta(hours=settings.roi_estimate_max_age_hours)
+        if estimate is not None and estimate.computed_at > datetime.now(timezone.utc) - max_age:
+            return estimate
+
+        await self.compute(db, user_id, [course_id])
+        return await self._load(db, user_id, course_id)
+
+    async def _load(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID
+    ) -> RoiEstimate | None:
+        result = await db.execute(
+            select(RoiEstimate)
+            .where(RoiEstimate.user_id == user_id, RoiEstimate.course_id == course_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    async def compute(
+        self, db: AsyncSession, user_id: uuid.UUID, course_ids: list[uuid.UUID]
+    ) -> int:
+        """ユーザーの指定コースの推定値を計算して roi_estimates に UPSERT
+
+        Returns:
+            保存した行数
+        """
+        if not course_ids:
+            return 0
+        response_ms = await self.response_times(db, user_id)
+        user_p50, user_p90 = response_ms.get(None, (DEFAULT_RESPONSE_MS, DEFAULT_RESPONSE_MS))
+        per_state = expected_reviews(await self.transition_counts(db, user_id))
+
+        # コース × トピック × 状態ごとの未習熟カード数 (未学習カードは New)
+        state = func.coalesce(CardReview.state, 0)
+        is_mastered = (CardReview.state == 2) & (CardReview.stability > MASTERED_STABILITY_DAYS)
+        card_rows = (
+            await db.execute(
+                select(
+                    Card.course_id,
+                    Card.topic_id,
+                    state,
+                    func.count(Card.id),
+                    func.count(CardReview.id).filter(is_mastered),
+                )
+                .outerjoin(
+                    CardReview,
+                    and_(CardReview.card_id == Card.id, CardReview.user_id == user_id),
+                )
+                .where(Card.course_id.in_(course_ids))
+                .group_by(Card.course_id, Card.topic_id, state)
+            )
+        ).all()
+        study_ms = dict(
+            (
+                await db.execute(
+                    select(DailyUserStat.course_id, func.sum(DailyUserStat.time_spent_ms))
+                    .where(
+                        DailyUserStat.user_id == user_id,
+                        DailyUserStat.course_id.in_(course_ids),
+                    )
+                    .group_by(DailyUserStat.course_id)
+                )
+            ).all()
+        )
+
+        totals = {
+            course_id: {"total_cards": 0, "mastered_cards": 0, "expected_reviews": 0.0, "remaining_ms": 0.0}
+            for course_id in course_ids
+        }
+        for course_id, topic_id, card_state, cards, mastered in card_rows:
+            total = totals[course_id]
+            reviews = (cards - mastered) * float(per_state[card_state])
+            topic_p50 = response_ms.get(topic_id, (user_p50, user_p90))[0]
+            total["total_cards"] += cards
+            total["mastered_cards"] += mastered
+            total["expected_reviews"] += reviews
+            total["remaining_ms"] += reviews * topic_p50
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "course_id": course_id,
+                "total_cards": total["total_cards"],
+                "mastered_cards": total["mastered_cards"],
+                "expected_reviews": round(total["expected_reviews"], 1),
+                "median_response_ms": round(user_p50),
+                "p90_response_ms": round(user_p90),
+                "estimated_hours_remaining": round(total["remaining_ms"] / 3_600_000, 1),
+                "total_study_hours": round(int(study_ms.get(course_id) or 0) / 3_600_000, 1),
+                "computed_at": func.now(),
+            }
+            for course_id, total in totals.items()
+        ]
+        stmt = insert(RoiEstimate).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_roi_estimates_user_course",
+            set_={
+                column: getattr(stmt.excluded, column)
+                for column in (
+                    "total_cards",
+                    "mastered_cards",
+                    "expected_reviews",
+                    "median_response_ms",
+                    "p90_response_ms",
+                    "estimated_hours_remaining",
+                    "total_study_hours",
+                    "computed_at",
+                )
+            },
+        )
+        await db.execute(stmt)
+        return len(rows)
+
+    async def response_times(
+        self, db: AsyncSession, user_id: uuid.UUID
+    ) -> dict[uuid.UUID | None, tuple[float, float]]:
+        """回答時間の (中央値, 90パーセンタイル) ms: トピック別 + ユーザー全体 (キー None)
+
+        GROUPING SETS でトピック別とユーザー全体を1クエリで集計する。
+        サンプルが MIN_TOPIC_SAMPLES 未満のトピックは含めない。
+        """
+        result = await db.execute(
+            select(
+                Card.topic_id,
+                func.percentile_cont(0.5).within_group(ReviewLog.response_time_ms),
+                func.percentile_cont(0.9).within_group(ReviewLog.response_time_ms),
+                func.count(),
+                func.grouping(Card.topic_id),
+            )
+            .select_from(ReviewLog)
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .join(Card, CardReview.card_id == Card.id)
+            .where(CardReview.user_id == user_id, ReviewLog.response_time_ms > 0)
+            .group_by(func.grouping_sets(tuple_(Card.topic_id), tuple_()))
+        )
+        times: dict[uuid.UUID | None, tuple[float, float]] = {}
+        for topic_id, p50, p90, samples, is_total in result.all():
+            if is_total:
+                times[None] = (float(p50), float(p90))
+            elif samples >= MIN_TOPIC_SAMPLES:
+                times[topic_id] = (float(p50), float(p90))
+        return times
+
+    async def transition_counts(self, db: AsyncSession, user_id: uuid.UUID) -> np.ndarray:
+        """未習熟カードのレビュー前後の状態遷移の件数 (4×5、列4は習熟への遷移)"""
+        mastered_after = (ReviewLog.state_after == 2) & (
+            ReviewLog.stability_after > MASTERED_STABILITY_DAYS
+        )
+        target = case((mastered_after, MASTERED_STATE), else_=ReviewLog.state_after)
+        result = await db.execute(
+            select(ReviewLog.state_before, target, func.count())
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .where(CardReview.user_id == user_id)
+            .where(
+                or_(
+                    ReviewLog.state_before != 2,
+                    ReviewLog.stability_before <= MASTERED_STABILITY_DAYS,
+                )
+            )
+            .group_by(ReviewLog.state_before, target)
+        )
+        counts = np.zeros((STATES, STATES + 1))
+        for before, after, count in result.all():
+            counts[before, after] += count
+        return counts
+
+    async def precompute(self, db: AsyncSession, today: date | None = None) -> int:
+        """直近 roi_active_days 日にレビューしたユーザーの登録コースの推定値を再計算
+
+        Returns:
+            保存した行数
+        """
+        today = today or datetime.now(timezone.utc).date()
+        active = (
+            select(DailyUserStat.user_id)
+            .where(DailyUserStat.stat_date >= today - timedelta(days=settings.roi_active_days))
+            .distinct()
+        )
+        result = await db.execute(
+            select(UserEnrollment.user_id, UserEnrollment.course_id)
+            .where(UserEnrollment.is_active == True)  # noqa: E712
+            .where(UserEnrollment.user_id.in_(active))
+            .order_by(UserEnrollment.user_id)
+        )
+        courses_by_user: dict[uuid.UUID, list[uuid.UUID]] = {}
+        for user_id, course_id in result.all():
+            courses_by_user.setdefault(user_id, []).append(course_id)
+
+        rows = 0
+        for user_id, course_ids in courses_by_user.items():
+            rows += await self.compute(db, user_id, course_ids)
+        return rows
+
+
+# シングルトン
+roi_service = RoiService()
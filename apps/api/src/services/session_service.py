@@ -1,14 +1,26 @@
-"""Study Session + Score Prediction サービス"""
+"""Study Session + Mastery サービス"""
 
 import uuid
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
 
-from sqlalchemy import func, select
+from sqlalchemy import Date, Float, Integer, case, cast, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.models.card import Card, CardReview, ReviewLog
-from src.models.course import Course, Topic
-from src.models.mastery import ScorePrediction, StudySession, UserTopicMastery
+from src.config import settings
+from src.models.card import CardReview
+from src.models.course import Topic
+from src.models.mastery import StudySession, UserStreak, UserTopicMastery
+from src.models.user import User
+from src.services.daily_stats_service import daily_stats_service
+from src.services.fsrs_service import fsrs_service
+
+
+def local_date(tz_name: str | None, at: datetime | None = None) -> date:
+    """ユーザーのタイムゾーンでの日付 (未設定なら settings.default_timezone)"""
+    at = at or datetime.now(timezone.utc)
+    return at.astimezone(ZoneInfo(tz_name or settings.default_timezone)).date()
 
 
 class SessionService:
@@ -21,16 +33,110 @@ class SessionService:
         course_id: uuid.UUID,
         session_type: str = "review",
     ) -> StudySession:
-        """セッション開始"""
+        """セッション開始 (review セッションは復習キューを作成)"""
         session = StudySession(
             user_id=user_id,
             course_id=course_id,
             session_type=session_type,
         )
+        if session_type == "review":
+            session.review_queue = await self._queue_card_ids(db, user_id, course_id)
+            session.queue_position = 0
+            session.queue_built_at = datetime.now(timezone.utc)
         db.add(session)
         await db.flush()
         return session
 
+    async def pop_review_queue(
+        self,
+        db: AsyncSession,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        n: int = 1,
+    ) -> tuple[list[uuid.UUID], int] | None:
+        """復習キューの先頭から n 件取り出す
+
+        キューは枯渇時、または作成後に (再)学習カードの期日が来た場合のみ再構築する。
+        取り出しは1回の UPDATE ... RETURNING で行い、同時リクエストでも重複しない。
+
+        Returns:
+            (カードID, 残り件数)。セッションが存在しない場合は None
+        """
+        now = datetime.now(timezone.utc)
+        row = (
+            await db.execute(
+                select(
+                    StudySession.course_id,
+                    StudySession.queue_position,
+                    func.coalesce(func.cardinality(StudySession.review_queue), 0),
+                    StudySession.queue_built_at,
+                ).where(StudySession.id == session_id, StudySession.user_id == user_id)
+            )
+        ).one_or_none()
+        if row is None:
+            return None
+        course_id, position, size, built_at = row
+
+        if (
+            built_at is None
+            or position >= size
+            or await self._relearning_due(db, user_id, course_id, built_at, now)
+        ):
+            await db.execute(
+                update(StudySession)
+                .where(StudySession.id == session_id)
+                .values(
+                    review_queue=await self._queue_card_ids(db, user_id, course_id),
+                    queue_position=0,
+                    queue_built_at=now,
+                )
+            )
+
+        # 位置を n 進め、進める前の位置から n 件を返す (PostgreSQL配列は1始まり)
+        new_position = StudySession.queue_position
+        result = await db.execute(
+            update(StudySession)
+            .where(StudySession.id == session_id)
+            .values(queue_position=StudySession.queue_position + n)
+            .returning(
+                StudySession.review_queue[new_position - n + 1 : new_position],
+                func.greatest(func.cardinality(StudySession.review_queue) - new_position, 0),
+            )
+        )
+        card_ids, remaining = result.one()
+        return list(card_ids or []), remaining
+
+    async def _queue_card_ids(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID
+    ) -> list[uuid.UUID]:
+        """復習キューの中身 (/cards/due と同じ順序、0件なら未学習カードを導入)"""
+        card_reviews = await fsrs_service.get_due_or_new_cards(
+            db, user_id, course_id=course_id, limit=settings.review_queue_size
+        )
+        return [cr.card_id for cr in card_reviews]
+
+    async def _relearning_due(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        course_id: uuid.UUID,
+        built_at: datetime,
+        now: datetime,
+    ) -> bool:
+        """キュー作成後に期日が来た (再)学習カードがあるか (セッション中の Again など)"""
+        stmt = select(
+            select(CardReview.id)
+            .where(
+                CardReview.user_id == user_id,
+                CardReview.course_id == course_id,
+                CardReview.due > built_at,
+                CardReview.due <= now,
+                CardReview.state.in_((1, 3)),  # Learning / Relearning
+            )
+            .exists()
+        )
+        return bool((await db.execute(stmt)).scalar())
+
     async def end_session(
         self,
         db: AsyncSession,
@@ -67,41 +173,129 @@ class SessionService:
         result = await db.execute(stmt)
         return list(result.scalars().all())
 
-    async def get_streak_days(self, db: AsyncSession, user_id: uuid.UUID) -> int:
-        """連続学習日数を計算"""
-        stmt = (
-            select(func.date(StudySession.started_at))
-            .where(StudySession.user_id == user_id)
-            .distinct()
-            .order_by(func.date(StudySession.started_at).desc())
+    async def record_activity(
+        self, db: AsyncSession, user_id: uuid.UUID, day: date
+    ) -> None:
+        """学習した日 (ローカル日付) を連続学習日数に反映 (1回のUPSERT)
+
+        同日2回目以降は更新しない。前日に続く日なら +1、間が空いたら 1 に戻す。
+        """
+        continued = case(
+            (UserStreak.last_active_date == day - timedelta(days=1), UserStreak.current_streak + 1),
+            else_=1,
         )
-        result = await db.execute(stmt)
-        dates = [row[0] for row in result.fetchall()]
+        stmt = insert(UserStreak).values(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            current_streak=1,
+            longest_streak=1,
+            last_active_date=day,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserStreak.user_id],
+            set_={
+                "current_streak": continued,
+                "longest_streak": func.greatest(UserStreak.longest_streak, continued),
+                "last_active_date": day,
+            },
+            where=UserStreak.last_active_date < day,
+        )
+        await db.execute(stmt)
+
+    async def get_streak(
+        self, db: AsyncSession, user_id: uuid.UUID, today: date | None = None
+    ) -> tuple[int, int]:
+        """(連続学習日数, 最長連続学習日数)。今日・昨日に学習していなければ連続は0"""
+        row = (
+            await db.execute(
+                select(
+                    UserStreak.current_streak,
+                    UserStreak.longest_streak,
+                    UserStreak.last_active_date,
+                    User.timezone,
+                )
+                .select_from(User)
+                .outerjoin(UserStreak, UserStreak.user_id == User.id)
+                .where(User.id == user_id)
+            )
+        ).one_or_none()
+        if row is None or row.last_active_date is None:
+            return 0, 0
+
+        today = today or local_date(row.timezone)
+        current = row.current_streak if row.last_active_date >= today - timedelta(days=1) else 0
+        return current, row.longest_streak
+
+    async def get_streak_days(self, db: AsyncSession, user_id: uuid.UUID) -> int:
+        """連続学習日数"""
+        current, _ = await self.get_streak(db, user_id)
+        return current
 
-        if not dates:
-            return 0
+    async def rebuild_streaks(self, db: AsyncSession, user_id: uuid.UUID | None = None) -> int:
+        """study_sessions から連続学習日数を再構築 (user_id 省略時は全ユーザー)
 
-        streak = 1
-        for i in range(1, len(dates)):
-            diff = dates[i - 1] - dates[i]
-            if diff.days == 1:
-                streak += 1
-            else:
-                break
-        return streak
+        ローカル日付の連続区間 (日付 - 行番号 が等しい区間) を集計し、
+        最新区間の長さを現在の連続日数、最長区間の長さを最長連続日数とする。
+
+        Returns:
+            再構築後の行数
+        """
+        tz = func.coalesce(User.timezone, settings.default_timezone)
+        day = cast(func.timezone(tz, StudySession.started_at), Date)
+        days = (
+            select(StudySession.user_id, day.label("day"))
+            .join(User, StudySession.user_id == User.id)
+            .distinct()
+        )
+        if user_id is not None:
+            days = days.where(StudySession.user_id == user_id)
+        days = days.subquery()
+
+        row_number = func.row_number().over(partition_by=days.c.user_id, order_by=days.c.day)
+        islands = select(
+            days.c.user_id,
+            days.c.day,
+            (days.c.day - cast(row_number, Integer)).label("run_key"),
+        ).subquery()
+        runs = (
+            select(
+                islands.c.user_id,
+                func.count().label("length"),
+                func.max(islands.c.day).label("end_day"),
+            )
+            .group_by(islands.c.user_id, islands.c.run_key)
+            .subquery()
+        )
+        source = select(
+            func.gen_random_uuid(),
+            runs.c.user_id,
+            array_agg(aggregate_order_by(runs.c.length, runs.c.end_day.desc()))[1],
+            func.max(runs.c.length),
+            func.max(runs.c.end_day),
+        ).group_by(runs.c.user_id)
+
+        clear = delete(UserStreak)
+        if user_id is not None:
+            clear = clear.where(UserStreak.user_id == user_id)
+
+        await db.execute(clear)
+        result = await db.execute(
+            insert(UserStreak).from_select(
+                ["id", "user_id", "current_streak", "longest_streak", "last_active_date"], source
+            )
+        )
+        return result.rowcount
 
     async def get_today_stats(
-        self, db: AsyncSession, user_id: uuid.UUID
+        self, db: AsyncSession, user_id: uuid.UUID, tz_name: str | None = None
     ) -> dict:
-        """今日の学習統計"""
-        today_start = datetime.now(timezone.utc).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
+        """今日の学習統計 (レビュー数は daily_user_stats、セッション数・時間は study_sessions)"""
+        today = local_date(tz_name)
+        today_start = datetime.combine(today, time(), tzinfo=ZoneInfo(tz_name or settings.default_timezone))
+        day = await daily_stats_service.get_day(db, user_id, today)
 
         stmt = (
             select(
-                func.sum(StudySession.cards_reviewed),
-                func.sum(StudySession.cards_correct),
                 func.sum(StudySession.duration_seconds),
                 func.count(StudySession.id),
             )
@@ -112,13 +306,17 @@ class SessionService:
         row = result.one()
 
         return {
-            "cards_reviewed": row[0] or 0,
-            "cards_correct": row[1] or 0,
-            "duration_seconds": row[2] or 0,
-            "session_count": row[3] or 0,
+            "cards_reviewed": day.reviews,
+            "cards_correct": day.correct,
+            "duration_seconds": row[0] or 0,
+            "session_count": row[1] or 0,
         }
 
 
+# 習熟度・回答時間の指数移動平均の係数
+MASTERY_ALPHA = 0.3
+
+
 class MasteryService:
     """トピック習熟度管理"""
 
@@ -129,38 +327,77 @@ class MasteryService:
         topic_id: uuid.UUID,
         is_correct: bool,
         response_ms: int = 0,
-    ) -> UserTopicMastery:
+    ) -> None:
         """レビュー結果を反映して習熟度更新"""
-        stmt = select(UserTopicMastery).where(
-            UserTopicMastery.user_id == user_id,
-            UserTopicMastery.topic_id == topic_id,
-        )
-        result = await db.execute(stmt)
-        mastery = result.scalar_one_or_none()
-
-        if mastery is None:
-            mastery = UserTopicMastery(
-                user_id=user_id,
-                topic_id=topic_id,
-            )
-            db.add(mastery)
+        await self.update_mastery_bulk(db, user_id, [(topic_id, is_correct, response_ms)])
 
-        mastery.total_reviews += 1
-        if is_correct:
-            mastery.correct_reviews += 1
-
-        # 指数移動平均で習熟度更新 (alpha=0.3)
-        alpha = 0.3
-        new_score = 1.0 if is_correct else 0.0
-        mastery.mastery_score = alpha * new_score + (1 - alpha) * float(mastery.mastery_score)
-
-        # 回答時間の移動平均
-        if response_ms > 0:
-            mastery.avg_response_ms = int(
-                alpha * response_ms + (1 - alpha) * mastery.avg_response_ms
+    async def update_mastery_bulk(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        reviews: list[tuple[uuid.UUID, bool, int]],
+    ) -> None:
+        """複数のレビュー結果 (topic_id, is_correct, response_ms) を順に反映
+
+        k 回の指数移動平均 (alpha=MASTERY_ALPHA) は
+        新しい値 = (1-alpha)^k × 現在値 + Σ alpha (1-alpha)^(k-j) × x_j
+        と書けるため、右辺第2項 (増分) だけを Python で求め、
+        現在値との合成は1回の複数行UPSERTの中で SQL で行う (読み込み不要)。
+        新規行は現在値0として増分がそのまま初期値になる。
+        """
+        totals: dict[uuid.UUID, dict[str, float]] = {}
+        for topic_id, is_correct, response_ms in reviews:
+            total = totals.setdefault(
+                topic_id,
+                {"reviews": 0, "correct": 0, "score": 0.0, "timed": 0, "response": 0.0},
             )
-
-        return mastery
+            total["reviews"] += 1
+            total["correct"] += int(is_correct)
+            total["score"] = MASTERY_ALPHA * float(is_correct) + (1 - MASTERY_ALPHA) * total["score"]
+            # 回答時間の移動平均 (計測値のあるレビューのみ)
+            if response_ms > 0:
+                total["timed"] += 1
+                total["response"] = MASTERY_ALPHA * response_ms + (1 - MASTERY_ALPHA) * total["response"]
+        if not totals:
+            return
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "topic_id": topic_id,
+                "mastery_score": round(total["score"], 4),
+                "total_reviews": total["reviews"],
+                "correct_reviews": total["correct"],
+                "avg_response_ms": round(total["response"]),
+            }
+            for topic_id, total in totals.items()
+        ]
+        stmt = insert(UserTopicMastery).values(rows)
+        # 回答時間の減衰率はトピックごとの計測回数で決まるため topic_id で引く
+        response_decay = case(
+            {
+                topic_id: literal((1 - MASTERY_ALPHA) ** total["timed"], Float)
+                for topic_id, total in totals.items()
+            },
+            value=stmt.excluded.topic_id,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_topic_mastery_user_topic",
+            set_={
+                "mastery_score": func.power(literal(1 - MASTERY_ALPHA, Float), stmt.excluded.total_reviews)
+                * UserTopicMastery.mastery_score
+                + stmt.excluded.mastery_score,
+                "total_reviews": UserTopicMastery.total_reviews + stmt.excluded.total_reviews,
+                "correct_reviews": UserTopicMastery.correct_reviews + stmt.excluded.correct_reviews,
+                "avg_response_ms": cast(
+                    response_decay * UserTopicMastery.avg_response_ms + stmt.excluded.avg_response_ms,
+                    Integer,
+                ),
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
 
     async def get_course_mastery(
         self,
@@ -196,162 +433,6 @@ class MasteryService:
         ]
 
 
-class ScorePredictionService:
-    """合格確率予測"""
-
-    async def predict_pass_probability(
-        self,
-        db: AsyncSession,
-        user_id: uuid.UUID,
-        course_id: uuid.UUID,
-    ) -> dict:
-        """合格確率を推定
-
-        簡易モデル: 加重平均習熟度 × トピック重み → 予測スコア
-        """
-        # コースの全トピック + 習熟度を取得
-        stmt = (
-            select(Topic, UserTopicMastery)
-            .outerjoin(
-                UserTopicMastery,
-                (UserTopicMastery.topic_id == Topic.id)
-                & (UserTopicMastery.user_id == user_id),
-            )
-            .where(Topic.course_id == course_id)
-        )
-        result = await db.execute(stmt)
-        rows = result.all()
-
-        if not rows:
-            return {
-                "predicted_score": 0.0,
-                "pass_probability": 0.0,
-                "weak_topics": [],
-                "recommendation": "学習を開始してください",
-            }
-
-        # 加重平均スコア計算
-        total_weight = sum(float(t.weight_pct) for t, _ in rows)
-        if total_weight == 0:
-            total_weight = 1.0
-
-        weighted_score = sum(
-            float(t.weight_pct) * (float(m.mastery_score) if m else 0.0)
-            for t, m in rows
-        ) / total_weight
-
-        # コースの合格基準取得
-        course = await db.get(Course, course_id)
-        from src.plugins.registry import get_plugin
-
-        plugin = get_plugin(course.code) if course else None
-        passing_score = plugin.exam_config.passing_score if plugin else 0.75
-
-        # 合格確率 (シグモイド近似)
-        import math
-        # スコアが合格基準の付近でシグモイドカーブ
-        x = (weighted_score - passing_score) * 10
-        pass_prob = 1.0 / (1.0 + math.exp(-x))
-
-        # 弱点トピック (習熟度 < 0.5)
-        weak_topics = [
-            {
-                "topic_id": str(t.id),
-                "topic_name": t.name,
-                "mastery_score": float(m.mastery_score) if m else 0.0,
-                "weight_pct": float(t.weight_pct),
-                "priority": float(t.weight_pct) * (1.0 - (float(m.mastery_score) if m else 0.0)),
-            }
-            for t, m in rows
-            if (float(m.mastery_score) if m else 0.0) < 0.5
-        ]
-        weak_topics.sort(key=lambda x: x["priority"], reverse=True)
-
-        # 推奨アクション生成
-        if pass_prob >= 0.85:
-            recommendation = "合格圏内です。模擬試験で本番慣れしましょう。"
-        elif pass_prob >= 0.6:
-            recommendation = f"弱点トピック{len(weak_topics)}件に集中して学習を継続してください。"
-        elif pass_prob >= 0.3:
-            recommendation = "基礎固めが必要です。低難易度カードから復習しましょう。"
-        else:
-            recommendation = "学習を開始して、まず各トピックの基本概念を押さえましょう。"
-
-        # 予測結果を保存
-        prediction = ScorePrediction(
-            user_id=user_id,
-            course_id=course_id,
-            predicted_score=round(weighted_score * 100, 1),
-            pass_probability=round(pass_prob, 4),
-            weak_topic_count=len(weak_topics),
-        )
-        db.add(prediction)
-
-        return {
-            "predicted_score": round(weighted_score * 100, 1),
-            "pass_probability": round(pass_prob * 100, 1),
-            "passing_score": passing_score * 100,
-            "weak_topics": weak_topics[:5],
-            "total_topics": len(rows),
-            "studied_topics": sum(1 for _, m in rows if m and m.total_reviews > 0),
-            "recommendation": recommendation,
-        }
-
-    async def get_study_roi(
-        self,
-        db: AsyncSession,
-        user_id: uuid.UUID,
-        course_id: uuid.UUID,
-    ) -> dict:
-        """学習ROI - あと何時間で合格確率が上がるか推定"""
-        # 直近の学習速度を計算
-        stmt = (
-            select(
-                func.sum(StudySession.duration_seconds),
-                func.sum(StudySession.cards_reviewed),
-            )
-            .where(StudySession.user_id == user_id)
-            .where(StudySession.course_id == course_id)
-        )
-        result = await db.execute(stmt)
-        row = result.one()
-
-        total_seconds = row[0] or 0
-        total_cards = row[1] or 0
-        avg_seconds_per_card = total_seconds / total_cards if total_cards > 0 else 120
-
-        # 未学習カード数
-        stmt = (
-            select(func.count(Card.id))
-            .where(Card.course_id == course_id)
-        )
-        result = await db.execute(stmt)
-        total_course_cards = result.scalar() or 0
-
-        stmt = (
-            select(func.count(CardReview.id))
-            .where(CardReview.user_id == user_id)
-            .join(Card, CardReview.card_id == Card.id)
-            .where(Card.course_id == course_id)
-            .where(CardReview.state >= 2)  # Review state = mastered
-        )
-        result = await db.execute(stmt)
-        mastered_cards = result.scalar() or 0
-
-        remaining_cards = total_course_cards - mastered_cards
-        estimated_hours = (remaining_cards * avg_seconds_per_card) / 3600
-
-        return {
-            "total_cards": total_course_cards,
-            "mastered_cards": mastered_cards,
-            "remaining_cards": remaining_cards,
-            "avg_seconds_per_card": round(avg_seconds_per_card, 1),
-            "estimated_hours_remaining": round(estimated_hours, 1),
-            "total_study_hours": round(total_seconds / 3600, 1),
-        }
-
-
 # シングルトン
 session_service = SessionService()
 mastery_service = MasteryService()
-score_prediction_service = ScorePredictionService()
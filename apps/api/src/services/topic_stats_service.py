@@ -0,0 +1,220 @@
+"""Topic stats service - (ユーザー, トピック) 単位のレビュー・問題演習集計を増分管理
+
+弱点トピックのランキングや合格予測のトピック別習熟度は card_reviews → cards → topics を
+毎回集計せず、topic_stats の集計行から読み出す。レビュー・問題回答時に
+トピックごとにまとめて1回の複数行UPSERTで加算し、rebuild で履歴から再構築する。
+習熟度 (mastery_score) は集計列から計算される生成列 (models.mastery.TOPIC_MASTERY_SQL)。
+"""
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import Float, cast, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.card import Card, CardReview, ReviewLog
+from src.models.course import Course, Topic
+from src.models.mastery import TopicStat
+from src.models.question import Question, QuestionAttempt
+
+# 評価 → ヒストグラム列
+RATING_COLUMNS = {1: "again_count", 2: "hard_count", 3: "good_count", 4: "easy_count"}
+
+# レビュー由来の加算列
+REVIEW_COLUMNS = (
+    "card_count",
+    "lapses",
+    *RATING_COLUMNS.values(),
+    "retrievability_sum",
+    "recall_reviews",
+)
+QUESTION_COLUMNS = ("question_attempts", "question_correct")
+
+
+@dataclass
+class TopicReview:
+    """トピック集計に反映する1レビュー (ReviewLog の列値 + カードのトピック)"""
+
+    topic_id: uuid.UUID
+    course_id: uuid.UUID
+    rating: int
+    state_before: int
+    state_after: int
+    retrievability_before: float | None = None
+
+    @classmethod
+    def from_log(cls, topic_id: uuid.UUID, course_id: uuid.UUID, log: dict) -> "TopicReview":
+        return cls(
+            topic_id=topic_id,
+            course_id=course_id,
+            rating=log["rating"],
+            state_before=log["state_before"],
+            state_after=log["state_after"],
+            retrievability_before=log["retrievability_before"],
+        )
+
+
+class TopicStatsService:
+    """topic_stats の増分更新・読み出し・再構築"""
+
+    async def record_reviews(
+        self, db: AsyncSession, user_id: uuid.UUID, reviews: list[TopicReview]
+    ) -> None:
+        """レビュー結果をトピック集計に加算"""
+        totals: dict[tuple[uuid.UUID, uuid.UUID], dict[str, float]] = defaultdict(
+            lambda: dict.fromkeys(REVIEW_COLUMNS, 0)
+        )
+        for review in reviews:
+            total = totals[(review.topic_id, review.course_id)]
+            total[RATING_COLUMNS[review.rating]] += 1
+            if review.state_before == 0:
+                total["card_count"] += 1
+            # Relearning (3) に遷移 = lapse (CardReview.lapses と同じ定義)
+            if review.state_after == 3 and review.state_before != 3:
+                total["lapses"] += 1
+            if review.retrievability_before is not None:
+                total["retrievability_sum"] += float(review.retrievability_before)
+                total["recall_reviews"] += 1
+
+        await self._upsert(db, user_id, totals, REVIEW_COLUMNS)
+
+    async def record_questions(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        attempts: list[tuple[uuid.UUID, uuid.UUID, bool]],
+    ) -> None:
+        """問題回答 (topic_id, course_id, is_correct) をトピック集計に加算"""
+        totals: dict[tuple[uuid.UUID, uuid.UUID], dict[str, float]] = defaultdict(
+            lambda: dict.fromkeys(QUESTION_COLUMNS, 0)
+        )
+        for topic_id, course_id, is_correct in attempts:
+            total = totals[(topic_id, course_id)]
+            total["question_attempts"] += 1
+            total["question_correct"] += int(is_correct)
+
+        await self._upsert(db, user_id, totals, QUESTION_COLUMNS)
+
+    async def _upsert(
+        self,
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        totals: dict[tuple[uuid.UUID, uuid.UUID], dict[str, float]],
+        columns: tuple[str, ...],
+    ) -> None:
+        """加算値を1回の複数行UPSERTで反映 (新規行の他の列は0)"""
+        if not totals:
+            return
+        zeros = dict.fromkeys((*REVIEW_COLUMNS, *QUESTION_COLUMNS), 0)
+        rows = [
+            {
+                **zeros,
+                **values,
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "topic_id": topic_id,
+                "course_id": course_id,
+            }
+            for (topic_id, course_id), values in totals.items()
+        ]
+        stmt = insert(TopicStat).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_topic_stats_user_topic",
+            set_={
+                column: getattr(TopicStat, column) + getattr(stmt.excluded, column)
+                for column in columns
+            },
+        )
+        await db.execute(stmt)
+
+    async def get_weakest(self, db: AsyncSession, user_id: uuid.UUID, limit: int = 5) -> list:
+        """習熟度の低いトピック上位 limit 件 (ix_topic_stats_user_mastery の順に読む)"""
+        stmt = (
+            select(
+                TopicStat.topic_id,
+                Topic.name,
+                Course.code,
+                Course.color,
+                TopicStat.mastery_score,
+                TopicStat.card_count,
+                TopicStat.lapses,
+            )
+            .join(Topic, TopicStat.topic_id == Topic.id)
+            .join(Course, TopicStat.course_id == Course.id)
+            .where(TopicStat.user_id == user_id)
+            .order_by(TopicStat.mastery_score)
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return list(result.all())
+
+    async def rebuild(self, db: AsyncSession, user_id: uuid.UUID | None = None) -> int:
+        """review_logs・question_attempts から集計を再構築 (user_id 省略時は全ユーザー)
+
+        削除後に同時レビュー・問題演習が作成した行とは ON CONFLICT で加算して合流する。
+
+        Returns:
+            再構築後の集計行数
+        """
+        is_lapse = (ReviewLog.state_after == 3) & (ReviewLog.state_before != 3)
+        reviews = (
+            select(
+                func.gen_random_uuid(),
+                CardReview.user_id,
+                Card.topic_id,
+                Card.course_id,
+                func.count().filter(ReviewLog.state_before == 0),
+                func.count().filter(is_lapse),
+                *(func.count().filter(ReviewLog.rating == rating) for rating in RATING_COLUMNS),
+                func.coalesce(func.sum(cast(ReviewLog.retrievability_before, Float)), 0),
+                func.count(ReviewLog.retrievability_before),
+                literal(0),
+                literal(0),
+            )
+            .join(CardReview, ReviewLog.card_review_id == CardReview.id)
+            .join(Card, CardReview.card_id == Card.id)
+            .group_by(CardReview.user_id, Card.topic_id, Card.course_id)
+        )
+        questions = (
+            select(
+                func.gen_random_uuid(),
+                QuestionAttempt.user_id,
+                Question.topic_id,
+                Question.course_id,
+                *(literal(0) for _ in REVIEW_COLUMNS),
+                func.count(),
+                func.count().filter(QuestionAttempt.is_correct.is_(True)),
+            )
+            .join(Question, QuestionAttempt.question_id == Question.id)
+            .group_by(QuestionAttempt.user_id, Question.topic_id, Question.course_id)
+        )
+        clear = delete(TopicStat)
+        if user_id is not None:
+            reviews = reviews.where(CardReview.user_id == user_id)
+            questions = questions.where(QuestionAttempt.user_id == user_id)
+            clear = clear.where(TopicStat.user_id == user_id)
+
+        columns = ["id", "user_id", "topic_id", "course_id", *REVIEW_COLUMNS, *QUESTION_COLUMNS]
+        await db.execute(clear)
+        # 問題演習はレビュー集計の行に合流 (問題のみのトピックは新規行)
+        for source, added in ((reviews, REVIEW_COLUMNS), (questions, QUESTION_COLUMNS)):
+            stmt = insert(TopicStat).from_select(columns, source)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_topic_stats_user_topic",
+                set_={
+                    column: getattr(TopicStat, column) + getattr(stmt.excluded, column)
+                    for column in added
+                },
+            )
+            await db.execute(stmt)
+
+        count = select(func.count()).select_from(TopicStat)
+        if user_id is not None:
+            count = count.where(TopicStat.user_id == user_id)
+        return (await db.execute(count)).scalar() or 0
+
+
+# シングルトン
+topic_stats_service = TopicStatsService()
@@ -0,0 +1,145 @@
+"""Topic tree service - トピック階層の閉包テーブル (topic_closure) の同期と階層集計
+
+topic_closure は (祖先, 子孫, 深さ) を自身 (depth=0) も含めて全組み合わせ保持する。
+Part / Domain など任意の階層への集計は「子孫の集計行 → closure → 祖先トピック」の
+1回のインデックス結合で行い、再帰CTEや Python での木の走査を使わない。
+閉包テーブル自体は再帰CTEでコース単位に delete → INSERT ... SELECT で再構築する。
+"""
+
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import and_, delete, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.course import Topic, TopicClosure
+from src.models.mastery import TOPIC_MASTERY_SQL, TopicStat
+
+# 習熟度 (TOPIC_MASTERY_SQL) の計算に使う topic_stats の加算列
+MASTERY_INPUT_COLUMNS = (
+    "card_count",
+    "lapses",
+    "retrievability_sum",
+    "recall_reviews",
+    "question_attempts",
+    "question_correct",
+)
+
+
+def roll_up(
+    pairs: list[tuple[uuid.UUID, uuid.UUID]], values: dict[uuid.UUID, float]
+) -> dict[uuid.UUID, float]:
+    """子孫トピック別の値を (祖先, 子孫) の組で祖先ごとに合計"""
+    totals: dict[uuid.UUID, float] = defaultdict(float)
+    for ancestor_id, descendant_id in pairs:
+        totals[ancestor_id] += values.get(descendant_id, 0)
+    return dict(totals)
+
+
+class TopicTreeService:
+    """topic_closure の再構築・階層集計"""
+
+    async def rebuild(self, db: AsyncSession, course_id: uuid.UUID | None = None) -> int:
+        """topics.parent_id から閉包テーブルを再構築 (course_id 省略時は全コース)
+
+        トピックの追加・親の変更後に呼び出す。
+
+        Returns:
+            再構築した行数
+        """
+        roots = select(
+            Topic.id.label("ancestor_id"),
+            Topic.id.label("descendant_id"),
+            literal(0).label("depth"),
+        )
+        clear = delete(TopicClosure)
+        if course_id is not None:
+            roots = roots.where(Topic.course_id == course_id)
+            clear = clear.where(
+                TopicClosure.descendant_id.in_(select(Topic.id).where(Topic.course_id == course_id))
+            )
+        tree = roots.cte("tree", recursive=True)
+        tree = tree.union_all(
+            select(tree.c.ancestor_id, Topic.id, tree.c.depth + 1).join(
+                Topic, Topic.parent_id == tree.c.descendant_id
+            )
+        )
+
+        await db.execute(clear)
+        result = await db.execute(
+            insert(TopicClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"], select(tree)
+            )
+        )
+        return result.rowcount
+
+    async def ancestor_pairs(
+        self, db: AsyncSession, course_id: uuid.UUID, max_level: int | None = None
+    ) -> list[tuple[uuid.UUID, uuid.UUID]]:
+        """コース内の (祖先, 子孫) の組 (max_level 指定時は祖先の階層がそれ以下のもの)"""
+        stmt = (
+            select(TopicClosure.ancestor_id, TopicClosure.descendant_id)
+            .join(Topic, Topic.id == TopicClosure.ancestor_id)
+            .where(Topic.course_id == course_id)
+        )
+        if max_level is not None:
+            stmt = stmt.where(Topic.level <= max_level)
+        return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+    def subtree_stats(self, user_id: uuid.UUID, course_id: uuid.UUID):
+        """祖先トピックごとに子孫の topic_stats を合計した副問い合わせ
+
+        列: ancestor_id, card_count, question_attempts, mastery_score。
+        習熟度は合計した集計列に TOPIC_MASTERY_SQL を適用する (葉トピックでは
+        topic_stats.mastery_score と一致)。
+        """
+        sums = (
+            select(
+                TopicClosure.ancestor_id,
+                *(
+                    func.sum(getattr(TopicStat, column)).label(column)
+                    for column in MASTERY_INPUT_COLUMNS
+                ),
+            )
+            .join(
+                TopicStat,
+                and_(
+                    TopicStat.topic_id == TopicClosure.descendant_id,
+                    TopicStat.user_id == user_id,
+                ),
+            )
+            .where(TopicStat.course_id == course_id)
+            .group_by(TopicClosure.ancestor_id)
+            .subquery("subtree_sums")
+        )
+        return select(
+            sums.c.ancestor_id,
+            sums.c.card_count,
+            sums.c.question_attempts,
+            literal_column(TOPIC_MASTERY_SQL).label("mastery_score"),
+        ).subquery("subtree_stats")
+
+    async def rollup(
+        self, db: AsyncSession, user_id: uuid.UUID, course_id: uuid.UUID, level: int
+    ) -> list:
+        """指定階層のトピックごとの習熟度・学習カード数・問題回答数 (未学習トピックは0)"""
+        stats = self.subtree_stats(user_id, course_id)
+        result = await db.execute(
+            select(
+                Topic.id.label("topic_id"),
+                Topic.name.label("topic_name"),
+                Topic.weight_pct,
+                func.coalesce(stats.c.mastery_score, 0).label("mastery_score"),
+                func.coalesce(stats.c.card_count, 0).label("card_count"),
+                func.coalesce(stats.c.question_attempts, 0).label("question_attempts"),
+            )
+            .outerjoin(stats, stats.c.ancestor_id == Topic.id)
+            .where(Topic.course_id == course_id, Topic.level == level)
+            .order_by(Topic.sort_order)
+        )
+        return list(result.all())
+
+
+# シングルトン
+topic_tree_service = TopicTreeService()
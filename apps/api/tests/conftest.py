@@ -15,6 +15,7 @@ from src.models.card import Card
 from src.models.course import Course, Topic
 from src.models.question import Question
 from src.models.user import User
+from src.services.topic_tree_service import topic_tree_service
 
 
 # テスト用エンジン: NullPoolでイベントループ間の接続プール問題を回避
@@ -126,6 +127,7 @@ async def seed_all_courses():
                         back=f"{code} テスト回答 {i+1}",
                         difficulty_tier=1,
                     ))
+        await topic_tree_service.rebuild(session)
         await session.commit()
     return course_ids
 
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 from sqlalchemy.pool import NullPool
 
 from src.config import settings
+from src.models.card import DueCounter
 from src.models.user import User
 
 _test_engine = create_async_engine(settings.database_url, poolclass=NullPool)
@@ -108,3 +109,65 @@ async def test_admin_courses_has_plugins(client: AsyncClient, seed_all_courses):
     # プラグイン登録済みコースが含まれる
     codes = [c.get("code") or c.get("course_code", "") for c in courses]
     assert any("CIA" in str(c) for c in codes) or len(courses) > 0
+
+
+@pytest.mark.integration
+async def test_admin_fsrs_optimize_insufficient_history(client: AsyncClient):
+    """レビュー履歴不足のユーザーは最適化しない → 400"""
+    admin_token, _ = await _make_admin(client)
+    learner_token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(learner_token))
+
+    resp = await client.post(
+        f"/api/v1/admin/fsrs/optimize/{me.json()['id']}",
+        headers=_auth_headers(admin_token),
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.integration
+async def test_admin_fsrs_optimize_non_admin(client: AsyncClient):
+    """非管理者 → 403"""
+    token = await _register_and_login(client)
+    resp = await client.post(
+        f"/api/v1/admin/fsrs/optimize/{uuid.uuid4()}",
+        headers=_auth_headers(token),
+    )
+    assert resp.status_code == 403
+
+
+@pytest.mark.integration
+async def test_admin_job_reconcile_due_counters(client: AsyncClient, seed_all_courses):
+    """カウンターのずれを再構築ジョブで修復"""
+    admin_token, _ = await _make_admin(client)
+    learner_token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(learner_token)
+    )
+    due_count = len(cards_resp.json()["cards"])
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(learner_token))
+
+    async with _test_session_factory() as session:
+        await session.execute(
+            update(DueCounter).where(DueCounter.user_id == uuid.UUID(me.json()["id"])).values(count=99)
+        )
+        await session.commit()
+
+    resp = await client.post(
+        "/api/v1/admin/jobs/reconcile-due-counters", headers=_auth_headers(admin_token)
+    )
+    assert resp.status_code == 200
+    assert resp.json()["result"]["due_counter_rows"] >= 1
+
+    summary = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(learner_token))
+    cia = next(c for c in summary.json()["courses"] if c["course_id"] == course_id)
+    assert cia["due_today"] == due_count
+
+
+@pytest.mark.integration
+async def test_admin_job_unknown(client: AsyncClient):
+    """未登録ジョブ → 404"""
+    admin_token, _ = await _make_admin(client)
+    resp = await client.post("/api/v1/admin/jobs/no-such-job", headers=_auth_headers(admin_token))
+    assert resp.status_code == 404
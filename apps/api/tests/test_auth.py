@@ -5,6 +5,8 @@ import uuid
 import pytest
 from httpx import AsyncClient
 
+from tests.conftest import auth_headers, register_and_login
+
 
 @pytest.mark.integration
 async def test_register_success(client: AsyncClient):
@@ -159,3 +161,24 @@ async def test_protected_route_with_auth(client: AsyncClient):
         headers={"Authorization": f"Bearer {token}"},
     )
     assert resp.status_code == 200
+
+
+@pytest.mark.integration
+async def test_update_me_timezone(client: AsyncClient):
+    """タイムゾーンはプロフィール更新で設定・解除でき、不正な名前は 422"""
+    token = await register_and_login(client)
+    headers = auth_headers(token)
+
+    resp = await client.put("/api/v1/auth/me", headers=headers, json={"timezone": "America/New_York"})
+    assert resp.status_code == 200
+    assert resp.json()["timezone"] == "America/New_York"
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["timezone"] == "America/New_York"
+
+    resp = await client.put("/api/v1/auth/me", headers=headers, json={"timezone": "Mars/Olympus"})
+    assert resp.status_code == 422
+
+    # 表示名だけの更新ではタイムゾーンを変えない、null で既定に戻す
+    resp = await client.put("/api/v1/auth/me", headers=headers, json={"display_name": "Renamed"})
+    assert resp.json()["timezone"] == "America/New_York"
+    resp = await client.put("/api/v1/auth/me", headers=headers, json={"timezone": None})
+    assert resp.json()["timezone"] is None
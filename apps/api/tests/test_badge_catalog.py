@@ -0,0 +1,68 @@
+"""バッジカタログ (定義の版確認・再読み込み) のユニットテスト"""
+
+import uuid
+
+import pytest
+
+from src.models.gamification import Badge
+from src.services.badge_service import BadgeCatalog
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def one(self):
+        return self._rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _DB:
+    """バッジ定義の版確認 (md5)・定義の読み込み・獲得済みバッジ (なし) に応答する"""
+
+    def __init__(self, badges: list[Badge]):
+        self.badges = badges
+        self.version_checks = 0
+
+    async def execute(self, stmt):
+        if "md5" in str(stmt):
+            self.version_checks += 1
+            return _Result((len(self.badges), "|".join(b.code for b in self.badges)))
+        if "user_badges" in str(stmt):
+            return _Result([])
+        return _Result(self.badges)
+
+
+def _badge(code: str, count: int) -> Badge:
+    return Badge(
+        id=uuid.uuid4(),
+        code=code,
+        name=code,
+        icon="*",
+        condition={"type": "reviews", "count": count},
+        xp_reward=10,
+    )
+
+
+@pytest.mark.unit
+async def test_catalog_reloads_when_definitions_change():
+    """版の確認間隔を過ぎると件数・内容の変化を検知して定義を読み直す"""
+    db = _DB([_badge("reviews_10", 10)])
+    catalog = BadgeCatalog(check_seconds=3600)
+    user_id = uuid.uuid4()
+
+    assert [r.code for r in await catalog.evaluate(db, user_id, {"total_reviews": 50})] == ["reviews_10"]
+    db.badges.append(_badge("reviews_50", 50))
+    # 確認間隔内は読み込み済みの定義を使い、版も確認しない
+    await catalog.evaluate(db, user_id, {"total_reviews": 50})
+    assert db.version_checks == 1
+
+    catalog._check_at = 0.0  # 確認間隔の経過
+    newly = await catalog.evaluate(db, user_id, {"total_reviews": 50})
+    assert [r.code for r in newly] == ["reviews_10", "reviews_50"]
+    assert db.version_checks == 2
@@ -1,8 +1,15 @@
 """カード・レビューエンドポイントのテスト"""
+import asyncio
 import uuid
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, select
+
+from src.config import settings
+from src.models.card import Card
+from src.services.fsrs_service import fsrs_service
+from tests.conftest import _test_engine, _test_session_factory
 
 
 async def _register_and_login(client: AsyncClient) -> str:
@@ -122,3 +129,218 @@ async def test_submit_review_invalid_rating(client: AsyncClient, seed_all_course
         json={"card_id": str(uuid.uuid4()), "rating": 5, "response_time_ms": 1000},
     )
     assert resp.status_code == 422
+
+
+@pytest.mark.integration
+async def test_submit_review_batch(client: AsyncClient, seed_all_courses):
+    """一括レビュー送信 (存在しないカードは個別に失敗)"""
+    token = await _register_and_login(client)
+    cards_resp = await client.get("/api/v1/cards/due", headers=_auth_headers(token))
+    cards = cards_resp.json()["cards"]
+    assert len(cards) >= 2
+    missing_id = str(uuid.uuid4())
+
+    resp = await client.post(
+        "/api/v1/cards/review/batch",
+        headers=_auth_headers(token),
+        json={
+            "reviews": [
+                {"card_id": cards[0]["id"], "rating": 3, "response_time_ms": 4000},
+                {"card_id": cards[1]["id"], "rating": 1, "response_time_ms": 6000},
+                {"card_id": missing_id, "rating": 3, "response_time_ms": 1000},
+            ]
+        },
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["succeeded"] == 2
+    assert data["failed"] == 1
+    results = {r["card_id"]: r for r in data["results"]}
+    assert results[cards[0]["id"]]["success"] is True
+    assert results[cards[0]["id"]]["review"]["state"] > 0
+    assert results[missing_id]["success"] is False
+    assert results[missing_id]["error"]
+
+
+@pytest.mark.integration
+async def test_submit_review_batch_empty(client: AsyncClient, seed_all_courses):
+    """空の一括レビュー → 422"""
+    token = await _register_and_login(client)
+    resp = await client.post(
+        "/api/v1/cards/review/batch",
+        headers=_auth_headers(token),
+        json={"reviews": []},
+    )
+    assert resp.status_code == 422
+
+
+@pytest.mark.integration
+async def test_submit_review_honors_desired_retention(client: AsyncClient, seed_all_courses):
+    """登録コースの目標記憶率が低いほど次回レビュー間隔が長くなる"""
+    course_id = str(seed_all_courses["CIA"])
+    hours = {}
+    for retention in (0.7, 0.9):
+        token = await _register_and_login(client)
+        await client.post(
+            "/api/v1/enrollments",
+            headers=_auth_headers(token),
+            json={"course_id": course_id, "desired_retention": retention},
+        )
+        cards_resp = await client.get(
+            f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+        )
+        card_id = cards_resp.json()["cards"][0]["id"]
+        resp = await client.post(
+            "/api/v1/cards/review",
+            headers=_auth_headers(token),
+            json={"card_id": card_id, "rating": 4, "response_time_ms": 2000},
+        )
+        assert resp.status_code == 200
+        hours[retention] = resp.json()["next_review_in_hours"]
+
+    assert hours[0.7] > hours[0.9]
+
+
+@pytest.mark.integration
+async def test_submit_review_unknown_card(client: AsyncClient, seed_all_courses):
+    """存在しないカードへのレビュー → 404"""
+    token = await _register_and_login(client)
+    resp = await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": str(uuid.uuid4()), "rating": 3, "response_time_ms": 1000},
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.integration
+async def test_forecast(client: AsyncClient, seed_all_courses):
+    """復習数予測: 新規カードは初日に数え、レビュー後は予測が更新される"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"]
+
+    resp = await client.get("/api/v1/cards/forecast?days=14", headers=_auth_headers(token))
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["forecast"]) == 14
+    assert data["forecast"][0]["reviews"] == len(cards)
+
+    # Easy → 初日から外れる (キャッシュは次回レビューで無効化)
+    await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": cards[0]["id"], "rating": 4, "response_time_ms": 2000},
+    )
+    resp = await client.get("/api/v1/cards/forecast?days=14", headers=_auth_headers(token))
+    assert resp.json()["forecast"][0]["reviews"] == len(cards) - 1
+
+    resp = await client.get(
+        "/api/v1/cards/forecast?days=14&monte_carlo=true&runs=50", headers=_auth_headers(token)
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["monte_carlo"] is True
+    assert data["runs"] == 50
+    assert all(d["p10"] <= d["p90"] for d in data["forecast"])
+
+
+@pytest.mark.integration
+async def test_forecast_invalid_days(client: AsyncClient):
+    """予測日数の範囲外 → 422"""
+    token = await _register_and_login(client)
+    resp = await client.get("/api/v1/cards/forecast?days=0", headers=_auth_headers(token))
+    assert resp.status_code == 422
+
+
+@pytest.mark.integration
+async def test_forecast_too_large(client: AsyncClient, seed_all_courses, monkeypatch):
+    """runs × カード数 × 日数が上限を超える → 422"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    await client.get(f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token))
+    monkeypatch.setattr(settings, "forecast_max_cells", 100)
+    resp = await client.get(
+        "/api/v1/cards/forecast?days=30&monte_carlo=true&runs=100", headers=_auth_headers(token)
+    )
+    assert resp.status_code == 422
+
+
+@pytest.mark.integration
+async def test_introduce_new_cards_idempotent(client: AsyncClient, seed_all_courses):
+    """未学習カードの一括導入は2回目以降に重複行を作らない"""
+    token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(token))
+    user_id = uuid.UUID(me.json()["id"])
+    course_id = seed_all_courses["CIA"]
+
+    async with _test_session_factory() as session:
+        first = await fsrs_service.introduce_new_cards(session, user_id, course_id=course_id, limit=2)
+        second = await fsrs_service.introduce_new_cards(session, user_id, course_id=course_id, limit=100)
+        third = await fsrs_service.introduce_new_cards(session, user_id, course_id=course_id, limit=100)
+        await session.commit()
+
+    assert len(first) == 2
+    assert len(second) == 1  # 残り1枚のみ
+    assert third == []
+    assert {cr.card_id for cr in first}.isdisjoint(cr.card_id for cr in second)
+    assert all(cr.state == 0 and cr.user_id == user_id for cr in first + second)
+
+
+@pytest.mark.integration
+async def test_get_or_create_reviews_concurrent(client: AsyncClient, seed_all_courses):
+    """同じ未学習カードを同時に作成しても一意制約違反にならず、先に作成された行を使う"""
+    token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(token))
+    user_id = uuid.UUID(me.json()["id"])
+    async with _test_session_factory() as session:
+        card_id = await session.scalar(
+            select(Card.id).where(Card.course_id == seed_all_courses["CIA"]).limit(1)
+        )
+
+    async with _test_session_factory() as first, _test_session_factory() as second:
+        created = await fsrs_service.get_or_create_reviews(first, user_id, [card_id])
+        # 2つ目は1つ目のコミットまで一意インデックスで待ち、ON CONFLICT DO NOTHING → 読み直し
+        pending = asyncio.create_task(fsrs_service.get_or_create_reviews(second, user_id, [card_id]))
+        await asyncio.sleep(0.1)
+        await first.commit()
+        reselected = await pending
+
+    assert created[card_id].created is True
+    assert reselected[card_id].created is False
+    assert reselected[card_id].card_review.id == created[card_id].card_review.id
+
+
+@pytest.mark.integration
+async def test_get_due_cards_loads_cards_in_one_query(client: AsyncClient, seed_all_courses):
+    """カード内容は件数によらず1回のクエリで取得する"""
+    token = await _register_and_login(client)
+    await client.get("/api/v1/cards/due?limit=100", headers=_auth_headers(token))
+
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(_test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        resp = await client.get("/api/v1/cards/due?limit=100", headers=_auth_headers(token))
+    finally:
+        event.remove(_test_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert len(resp.json()["cards"]) > 1
+    assert sum(1 for sql in statements if "FROM cards" in sql) == 1
+
+
+@pytest.mark.integration
+async def test_get_due_cards_compact(client: AsyncClient, seed_all_courses):
+    """compact=true はレビューUI用の項目のみ返す"""
+    token = await _register_and_login(client)
+    resp = await client.get("/api/v1/cards/due?compact=true", headers=_auth_headers(token))
+    assert resp.status_code == 200
+    cards = resp.json()["cards"]
+    assert len(cards) > 0
+    assert set(cards[0]) == {"id", "course_id", "front", "back", "state", "due"}
@@ -1,6 +1,14 @@
 """コースエンドポイントのテスト"""
+import uuid
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select
+
+from src.models.course import Course, Topic, TopicClosure
+from src.services.topic_stats_service import topic_stats_service
+from src.services.topic_tree_service import topic_tree_service
+from tests.conftest import _test_session_factory, register_and_login
 
 
 @pytest.mark.integration
@@ -37,7 +45,6 @@ async def test_get_course_by_id(client: AsyncClient, seed_courses):
 @pytest.mark.integration
 async def test_get_course_not_found(client: AsyncClient):
     """存在しないコース → エラー"""
-    import uuid
     resp = await client.get(f"/api/v1/courses/{uuid.uuid4()}")
     assert resp.status_code in (404, 500)
 
@@ -63,3 +70,53 @@ async def test_list_topics_has_name(client: AsyncClient, seed_all_courses):
     if topics:
         assert "name" in topics[0]
         assert "id" in topics[0]
+
+
+@pytest.mark.integration
+async def test_topic_closure_rollup(client: AsyncClient):
+    """閉包テーブル経由で Level 2 トピックの集計が Domain・Part に合算される"""
+    token = await register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    user_id = uuid.UUID(me.json()["id"])
+
+    async with _test_session_factory() as db:
+        course = Course(code=f"T{uuid.uuid4().hex[:8]}", name="Tree", color="#000000")
+        db.add(course)
+        await db.flush()
+        part = Topic(course_id=course.id, name="Part", level=0)
+        db.add(part)
+        await db.flush()
+        domain = Topic(course_id=course.id, parent_id=part.id, name="Domain", level=1)
+        db.add(domain)
+        await db.flush()
+        leaves = [
+            Topic(course_id=course.id, parent_id=domain.id, name=f"Leaf {i}", level=2)
+            for i in range(2)
+        ]
+        db.add_all(leaves)
+        await db.flush()
+
+        assert await topic_tree_service.rebuild(db, course.id) == 4 + 3 + 2
+        depths = dict(
+            (
+                await db.execute(
+                    select(TopicClosure.ancestor_id, TopicClosure.depth).where(
+                        TopicClosure.descendant_id == leaves[0].id
+                    )
+                )
+            ).all()
+        )
+        assert depths == {leaves[0].id: 0, domain.id: 1, part.id: 2}
+
+        await topic_stats_service.record_questions(
+            db,
+            user_id,
+            [(leaves[0].id, course.id, True), (leaves[1].id, course.id, False),
+             (leaves[1].id, course.id, True), (leaves[1].id, course.id, True)],
+        )
+        for level, topic in ((0, part), (1, domain)):
+            (row,) = await topic_tree_service.rollup(db, user_id, course.id, level)
+            assert row.topic_id == topic.id
+            assert row.question_attempts == 4
+            assert float(row.mastery_score) == pytest.approx(0.75)
+        await db.rollback()
@@ -72,3 +72,138 @@ async def test_history(client: AsyncClient, seed_all_courses):
 async def test_history_unauthenticated(client: AsyncClient):
     resp = await client.get("/api/v1/dashboard/history")
     assert resp.status_code == 401
+
+
+@pytest.mark.integration
+async def test_dashboard_summary_retrievability(client: AsyncClient, seed_all_courses):
+    """レビュー済みカードの現在想起率がサマリーに反映される"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    card_id = cards_resp.json()["cards"][0]["id"]
+    await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": card_id, "rating": 3, "response_time_ms": 3000},
+    )
+
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    assert resp.status_code == 200
+    cia = next(c for c in resp.json()["courses"] if c["course_id"] == course_id)
+    assert 0 < cia["avg_retrievability"] <= 1
+
+    resp = await client.get("/api/v1/dashboard/weak-topics", headers=_auth_headers(token))
+    assert resp.status_code == 200
+
+
+@pytest.mark.integration
+async def test_dashboard_summary_due_today_counters(client: AsyncClient, seed_all_courses):
+    """今日の復習数は due_counters から読み、レビューでdue日が移ると減る"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"]
+
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    cia = next(c for c in resp.json()["courses"] if c["course_id"] == course_id)
+    assert cia["due_today"] == len(cards)
+
+    # Easy → 数日後にdue
+    await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": cards[0]["id"], "rating": 4, "response_time_ms": 3000},
+    )
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    cia = next(c for c in resp.json()["courses"] if c["course_id"] == course_id)
+    assert cia["due_today"] == len(cards) - 1
+
+
+@pytest.mark.integration
+async def test_dashboard_summary_cache_invalidated_on_review(client: AsyncClient, seed_all_courses):
+    """サマリーはキャッシュされ、レビュー送信で版が変わり再集計される"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"]
+
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    assert resp.headers["X-Cache"] == "MISS"
+    assert "summary;dur=" in resp.headers["Server-Timing"]
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    assert resp.headers["X-Cache"] == "HIT"
+
+    await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": cards[0]["id"], "rating": 3, "response_time_ms": 3000},
+    )
+    resp = await client.get("/api/v1/dashboard/summary", headers=_auth_headers(token))
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.json()["total_studied_today"] == 1
+
+
+@pytest.mark.integration
+async def test_history_from_daily_stats(client: AsyncClient, seed_all_courses):
+    """学習履歴・ヒートマップ・今日の統計は日別集計から読む"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"][:2]
+    await client.post(
+        "/api/v1/cards/review/batch",
+        headers=_auth_headers(token),
+        json={
+            "reviews": [
+                {"card_id": cards[0]["id"], "rating": 3, "response_time_ms": 60000},
+                {"card_id": cards[1]["id"], "rating": 1, "response_time_ms": 60000},
+            ]
+        },
+    )
+
+    resp = await client.get("/api/v1/dashboard/history", headers=_auth_headers(token))
+    today = resp.json()["history"][-1]
+    assert today["cards_reviewed"] == 2
+    assert today["correct"] == 1
+    assert today["minutes"] == 2
+
+    resp = await client.get("/api/v1/dashboard/history/heatmap", headers=_auth_headers(token))
+    data = resp.json()
+    assert data["end"] == today["date"]
+    assert data["days"] == [{"date": today["date"], "count": 2}]
+
+    resp = await client.get("/api/v1/sessions/today", headers=_auth_headers(token))
+    assert resp.json()["cards_reviewed"] == 2
+    assert resp.json()["cards_correct"] == 1
+
+
+@pytest.mark.integration
+async def test_weak_topics_from_topic_stats(client: AsyncClient, seed_all_courses):
+    """レビューはトピック別集計に加算され、Again の多いトピックが上位に来る"""
+    token = await _register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=_auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"]
+    await client.post(
+        "/api/v1/cards/review/batch",
+        headers=_auth_headers(token),
+        json={"reviews": [{"card_id": c["id"], "rating": 3} for c in cards]},
+    )
+
+    resp = await client.get("/api/v1/dashboard/weak-topics", headers=_auth_headers(token))
+    topics = resp.json()["topics"]
+    assert topics
+    assert all(t["failed_cards"] == 0 for t in topics)
+    assert sum(t["total_cards"] for t in topics) <= len(cards)
+    scores = [t["mastery_score"] for t in topics]
+    assert scores == sorted(scores)
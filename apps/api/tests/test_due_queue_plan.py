@@ -0,0 +1,47 @@
+"""復習キュークエリの実行計画テスト (EXPLAIN)"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from src.services.fsrs_service import FSRSService
+from tests.conftest import _test_session_factory
+
+
+async def _explain(stmt) -> str:
+    """EXPLAIN結果を文字列で返す (テストDBは小さいためSeq Scanを無効化して評価)"""
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    async with _test_session_factory() as session:
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await session.execute(text(f"EXPLAIN {sql}"))
+        return "\n".join(row[0] for row in result)
+
+
+@pytest.mark.integration
+async def test_due_queue_uses_user_due_index():
+    """ユーザー全体の復習キューは (user_id, due, state) の範囲スキャン
+
+    同じく user_id 先頭の一意制約 (user_id, card_id) では due で絞り込めないため選ばれない。
+    """
+    stmt = FSRSService.due_cards_stmt(uuid.uuid4(), datetime.now(timezone.utc), limit=25)
+    plan = await _explain(stmt)
+    assert "ix_card_reviews_user_due_state" in plan
+    assert "uq_card_reviews_user_card" not in plan
+    assert "due <=" in plan.split("Index Cond:")[1]
+
+
+@pytest.mark.integration
+async def test_due_queue_by_course_uses_course_index_without_join():
+    """コース別復習キューは cards をJOINせず (user_id, course_id, due, state) を使う"""
+    stmt = FSRSService.due_cards_stmt(
+        uuid.uuid4(), datetime.now(timezone.utc), course_id=uuid.uuid4(), limit=25
+    )
+    plan = await _explain(stmt)
+    assert "ix_card_reviews_user_course_due_state" in plan
+    assert "uq_card_reviews_user_card" not in plan
+    assert "due <=" in plan.split("Index Cond:")[1]
+    assert "cards" not in plan.replace("card_reviews", "")
+    assert "Join" not in plan
@@ -0,0 +1,100 @@
+"""復習数予測シミュレーターのユニットテスト"""
+
+import numpy as np
+import pytest
+from fsrs import Rating, Scheduler
+
+from src.services.forecast_service import (
+    DeckState,
+    FSRSVectorModel,
+    simulate_reviews,
+    simulate_reviews_chunked,
+)
+
+
+def _deck(n: int, due_day: float = 0.0, retention: float = 0.9) -> DeckState:
+    return DeckState(
+        due_day=np.full(n, due_day),
+        last_review_day=np.full(n, np.nan),
+        stability=np.zeros(n),
+        difficulty=np.zeros(n),
+        is_new=np.ones(n, dtype=bool),
+        desired_retention=np.full(n, retention),
+    )
+
+
+@pytest.mark.unit
+def test_vector_model_matches_py_fsrs():
+    """状態遷移式が py-fsrs Scheduler と一致する"""
+    scheduler = Scheduler()
+    model = FSRSVectorModel()
+    rng = np.random.default_rng(0)
+    difficulty = rng.uniform(1, 10, size=40)
+    stability = rng.uniform(0.5, 300, size=40)
+    retrievability = rng.uniform(0.3, 1.0, size=40)
+    ratings = rng.integers(1, 5, size=40)
+
+    expected_s = [
+        scheduler._next_stability(
+            difficulty=float(d), stability=float(s), retrievability=float(r), rating=Rating(int(g))
+        )
+        for d, s, r, g in zip(difficulty, stability, retrievability, ratings, strict=True)
+    ]
+    expected_d = [
+        scheduler._next_difficulty(difficulty=float(d), rating=Rating(int(g)))
+        for d, g in zip(difficulty, ratings, strict=True)
+    ]
+    expected_i = [scheduler._next_interval(stability=float(s)) for s in stability]
+
+    np.testing.assert_allclose(
+        model.next_stability(difficulty, stability, retrievability, ratings), expected_s, rtol=1e-9
+    )
+    np.testing.assert_allclose(model.next_difficulty(difficulty, ratings), expected_d, rtol=1e-9)
+    np.testing.assert_array_equal(model.next_interval(stability, np.full(40, 0.9)), expected_i)
+
+
+@pytest.mark.unit
+def test_simulate_new_cards_deterministic():
+    """新規カードは初日に全件レビューされ、Good の初期安定度に応じた日に再登場する"""
+    model = FSRSVectorModel()
+    counts = simulate_reviews(_deck(5), days=30, model=model)
+
+    assert counts.shape == (1, 30)
+    assert counts[0, 0] == 5
+    first_interval = model.next_interval(model.initial_stability(np.array([3])), np.array([0.9]))[0]
+    assert counts[0, first_interval] == 5
+
+
+@pytest.mark.unit
+def test_simulate_monte_carlo_again_adds_reviews():
+    """Again のみの分布では毎回同日の追加レビューが発生する"""
+    again = np.array([1.0, 0.0, 0.0, 0.0])
+    counts = simulate_reviews(
+        _deck(10), days=5, model=FSRSVectorModel(), rating_probs_new=again,
+        rating_probs_review=again, runs=8, rng=np.random.default_rng(1),
+    )
+
+    assert counts.shape == (8, 5)
+    assert (counts[:, 0] == 20).all()
+
+
+@pytest.mark.unit
+def test_simulate_outside_horizon():
+    """予測期間外にdueのカードは数えない"""
+    counts = simulate_reviews(_deck(3, due_day=40), days=30, model=FSRSVectorModel())
+    assert counts.sum() == 0
+
+
+@pytest.mark.unit
+def test_simulate_chunked_runs():
+    """runs を分割しても全試行分の結果を返す (1回に保持するのは max_cells 以下)"""
+    model = FSRSVectorModel()
+    good = np.array([0.0, 0.0, 1.0, 0.0])
+    counts = simulate_reviews_chunked(
+        _deck(4), days=30, model=model, rating_probs_new=good, rating_probs_review=good,
+        runs=7, max_cells=8,
+    )
+
+    assert counts.shape == (7, 30)
+    expected = simulate_reviews(_deck(4), days=30, model=model)[0]
+    assert (counts == expected).all()
@@ -0,0 +1,37 @@
+"""FSRSサービスのユニットテスト"""
+
+from decimal import Decimal
+
+import pytest
+
+from src.services.fsrs_service import get_scheduler
+
+
+@pytest.mark.unit
+def test_scheduler_cache_reuses_instance():
+    """同じ目標記憶率・パラメータではSchedulerを再利用する"""
+    assert get_scheduler(0.85) is get_scheduler(0.85)
+    # Numeric列由来のDecimalも同じキーになる
+    assert get_scheduler(Decimal("0.850")) is get_scheduler(0.85)
+
+
+@pytest.mark.unit
+def test_scheduler_cache_keyed_by_retention():
+    """目標記憶率ごとに別のSchedulerを返す"""
+    scheduler = get_scheduler(0.8)
+    assert scheduler.desired_retention == 0.8
+    assert scheduler is not get_scheduler(0.9)
+
+
+@pytest.mark.unit
+def test_user_parameters():
+    """最適化済みパラメータのみSchedulerに渡す"""
+    from fsrs.scheduler import DEFAULT_PARAMETERS
+
+    from src.services.fsrs_service import user_parameters
+
+    assert user_parameters(None) is None
+    assert user_parameters({"parameters": [0.1] * 19}) is None  # 旧形式
+    params = user_parameters({"parameters": list(DEFAULT_PARAMETERS)})
+    assert params == DEFAULT_PARAMETERS
+    assert get_scheduler(0.9, params) is get_scheduler(0.9)
@@ -1,8 +1,23 @@
 """ゲーミフィケーションエンドポイントのテスト"""
+import asyncio
 import uuid
+from datetime import date, datetime, timedelta, timezone
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from src.models.gamification import DailyMission, UserXP, XPLog
+from src.services.daily_stats_service import daily_stats_service
+from src.services.gamification_service import (
+    MISSIONS_PER_DAY,
+    GamificationService,
+    _calc_level,
+    mission_today,
+    pick_mission_templates,
+    seed_badges,
+)
+from tests.conftest import _test_session_factory
 
 
 async def _register_and_login(client: AsyncClient) -> str:
@@ -72,6 +87,177 @@ async def test_get_leaderboard(client: AsyncClient):
     assert resp.status_code == 200
     assert "leaderboard" in resp.json()
 
+@pytest.mark.integration
+async def test_leaderboard_my_rank(client: AsyncClient):
+    """XP付与が累計・週間ランキングと自分の順位に反映される"""
+    token = await _register_and_login(client)
+    headers = _auth_headers(token)
+    # ランキングを読み込んでから付与し、増分反映を確認
+    for window in ("all", "weekly"):
+        await client.get(f"/api/v1/gamification/leaderboard/me?window={window}", headers=headers)
+    await client.post("/api/v1/gamification/xp/award?amount=1000&source=test", headers=headers)
+
+    for window in ("all", "weekly"):
+        resp = await client.get(f"/api/v1/gamification/leaderboard/me?window={window}", headers=headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["window"] == window
+        assert data["rank"] >= 1
+        assert data["xp"] >= 1000
+        assert any(n["rank"] == data["rank"] and n["xp"] == data["xp"] for n in data["neighbors"])
+
+    resp = await client.get("/api/v1/gamification/leaderboard?window=weekly&limit=50")
+    ranks = [entry["rank"] for entry in resp.json()["leaderboard"]]
+    assert ranks == list(range(1, len(ranks) + 1))
+
+
+@pytest.mark.integration
+async def test_concurrent_xp_awards_not_lost(client: AsyncClient):
+    """別セッションからの同時付与でも加算が失われず、XPLog は付与ごとに1行"""
+    token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(token))
+    user_id = uuid.UUID(me.json()["id"])
+
+    async def award(amounts: list[int]) -> None:
+        async with _test_session_factory() as db:
+            svc = GamificationService(db)
+            for amount in amounts:
+                svc.add_xp(user_id, amount, "test", course_code="CIA")
+            await svc.flush_xp()
+            await db.commit()
+
+    await asyncio.gather(*(award([10, 20, 30]) for _ in range(5)))
+
+    async with _test_session_factory() as db:
+        xp = (await db.execute(select(UserXP).where(UserXP.user_id == user_id))).scalar_one()
+        logs = await db.scalar(select(func.count()).where(XPLog.user_id == user_id))
+    assert (xp.total_xp, xp.cia_xp) == (300, 300)
+    assert xp.level == _calc_level(300)
+    assert logs == 15
+
+
+@pytest.mark.integration
+async def test_badges_only_relevant_rules_and_once(client: AsyncClient):
+    """渡した指標の条件タイプだけ判定し、同じバッジは2回付与しない"""
+    token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(token))
+    user_id = uuid.UUID(me.json()["id"])
+
+    async with _test_session_factory() as db:
+        await seed_badges(db)
+        svc = GamificationService(db)
+        # 連続日数だけ渡すとレビュー数のバッジは判定しない
+        earned = await svc.check_and_award_badges(user_id, streak_days=3)
+        assert [b["code"] for b in earned] == ["streak_3"]
+
+        earned = await svc.check_and_award_badges(user_id, total_reviews=60, streak_days=3)
+        assert sorted(b["code"] for b in earned) == ["first_review", "reviews_50"]
+        assert await svc.check_and_award_badges(user_id, total_reviews=60, streak_days=3) == []
+        result = await svc.flush_xp()
+        await db.commit()
+
+    assert result[user_id]["xp_gained"] == 50 + 20 + 100
+    resp = await client.get("/api/v1/gamification/badges", headers=_auth_headers(token))
+    assert resp.json()["badge_count"] == 3
+
+
+@pytest.mark.unit
+def test_pick_mission_templates_deterministic():
+    """(ユーザー, 日付) ごとに同じ選択、種類の重複なし"""
+    user_id = uuid.uuid4()
+    picked = pick_mission_templates(user_id, date(2026, 10, 18))
+
+    assert picked == pick_mission_templates(user_id, date(2026, 10, 18))
+    assert len(picked) == MISSIONS_PER_DAY
+    assert len({tmpl["type"] for tmpl in picked}) == MISSIONS_PER_DAY
+
+
+@pytest.mark.unit
+def test_mission_today_uses_utc_date_of_review():
+    """ミッションの日付はレビュー日時の UTC 日付 (サーバーのタイムゾーンに依存しない)"""
+    jst = timezone(timedelta(hours=9))
+    assert mission_today(datetime(2026, 10, 18, 8, 0, tzinfo=jst)) == date(2026, 10, 17)
+    assert mission_today(datetime(2026, 10, 18, 9, 0, tzinfo=jst)) == date(2026, 10, 18)
+
+
+@pytest.mark.integration
+async def test_concurrent_mission_generation(client: AsyncClient):
+    """プロフィールとミッションを同時に取得しても1セットだけ生成される"""
+    token = await _register_and_login(client)
+    headers = _auth_headers(token)
+    profile, missions = await asyncio.gather(
+        client.get("/api/v1/gamification/profile", headers=headers),
+        client.get("/api/v1/gamification/missions", headers=headers),
+    )
+    assert profile.status_code == missions.status_code == 200
+
+    resp = await client.get("/api/v1/gamification/missions", headers=headers)
+    assert len(resp.json()["missions"]) == MISSIONS_PER_DAY
+
+
+@pytest.mark.integration
+async def test_pregenerate_daily_missions(client: AsyncClient, seed_all_courses):
+    """一括生成は遅延生成と同じテンプレートを選び、再実行しても重複しない"""
+    token = await _register_and_login(client)
+    me = await client.get("/api/v1/auth/me", headers=_auth_headers(token))
+    user_id = uuid.UUID(me.json()["id"])
+    today = mission_today()
+
+    async with _test_session_factory() as db:
+        await daily_stats_service.record(db, user_id, today, [(seed_all_courses["CIA"], 3, 1000, False)])
+        svc = GamificationService(db)
+        assert await svc.pregenerate_daily_missions(today) >= MISSIONS_PER_DAY
+        await svc.pregenerate_daily_missions(today)
+        missions = (
+            await db.execute(
+                select(DailyMission).where(
+                    DailyMission.user_id == user_id, DailyMission.mission_date == today
+                )
+            )
+        ).scalars().all()
+        await db.rollback()
+
+    expected = pick_mission_templates(user_id, today)
+    assert sorted((m.mission_type, m.target_value) for m in missions) == sorted(
+        (tmpl["type"], tmpl["target"]) for tmpl in expected
+    )
+
+
+@pytest.mark.integration
+async def test_concurrent_mission_progress(client: AsyncClient):
+    """同じミッションを同時に進めても増分は失われず、完了XPは1回だけ"""
+    token = await _register_and_login(client)
+    headers = _auth_headers(token)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=headers)).json()["id"])
+    missions = (await client.get("/api/v1/gamification/missions", headers=headers)).json()["missions"]
+    mission = missions[0]
+    step = max(mission["target"] - 1, 1)
+
+    async def progress() -> list[dict]:
+        async with _test_session_factory() as db:
+            completed = await GamificationService(db).update_mission_progress(
+                user_id, mission["type"], step
+            )
+            await db.commit()
+            return completed
+
+    results = await asyncio.gather(progress(), progress())
+    assert sum(len(completed) for completed in results) == 1
+
+    resp = await client.get("/api/v1/gamification/missions", headers=headers)
+    updated = next(m for m in resp.json()["missions"] if m["id"] == mission["id"])
+    assert updated["is_completed"] is True
+    # 1回目で完了しなければ2回分が加算される (完了後の更新は行わない)
+    assert updated["current"] == (2 * step if step < mission["target"] else step)
+
+
+@pytest.mark.integration
+async def test_leaderboard_invalid_window(client: AsyncClient):
+    """未対応の集計期間 → 422"""
+    resp = await client.get("/api/v1/gamification/leaderboard?window=daily")
+    assert resp.status_code == 422
+
+
 @pytest.mark.integration
 async def test_gamification_unauthenticated(client: AsyncClient):
     """未認証 → 401"""
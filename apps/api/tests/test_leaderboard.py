@@ -0,0 +1,111 @@
+"""リーダーボード (SortedScoreSet・集計期間) のユニットテスト"""
+
+import math
+import random
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from src.services.leaderboard_service import (
+    LeaderboardService,
+    SortedScoreSet,
+    leaderboard_service,
+    window_start,
+)
+
+
+def _ranking(scores: dict[uuid.UUID, int]) -> list[uuid.UUID]:
+    return sorted(scores, key=lambda member: (-scores[member], member))
+
+
+@pytest.mark.unit
+def test_sorted_score_set_matches_full_sort():
+    """増分更新後の順位・範囲が全件ソートと一致する"""
+    rng = random.Random(0)
+    members = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(200)]
+    scores = {member: rng.randrange(0, 50) for member in members[:100]}
+    board = SortedScoreSet()
+    board.load(scores)
+
+    for _ in range(500):
+        member = rng.choice(members)
+        amount = rng.randrange(1, 30)
+        scores[member] = scores.get(member, 0) + amount
+        assert board.incr(member, amount) == scores[member]
+
+    expected = _ranking(scores)
+    assert len(board) == len(scores)
+    assert [member for member, _ in board.range(0, len(board))] == expected
+    for member in members:
+        assert board.rank(member) == (expected.index(member) if member in scores else None)
+    assert board.range(5, 8) == [(m, scores[m]) for m in expected[5:8]]
+
+
+@pytest.mark.unit
+def test_sorted_score_set_set_and_missing():
+    """set は既存スコアを置き換え、未登録メンバーの順位は None"""
+    a, b = uuid.UUID(int=1), uuid.UUID(int=2)
+    board = SortedScoreSet()
+    board.set(a, 10)
+    board.set(b, 20)
+    board.set(a, 30)
+
+    assert board.range(0, 10) == [(a, 30), (b, 20)]
+    assert board.rank(b) == 1
+    assert board.rank(uuid.UUID(int=3)) is None
+
+
+@pytest.mark.unit
+def test_window_start():
+    """週は月曜0時、月は1日0時 (UTC)、累計は None"""
+    now = datetime(2026, 10, 17, 15, 30, tzinfo=timezone.utc)  # 土曜
+
+    assert window_start("weekly", now) == datetime(2026, 10, 12, tzinfo=timezone.utc)
+    assert window_start("monthly", now) == datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert window_start("all", now) is None
+
+
+@pytest.mark.unit
+def test_record_after_commit_skips_rolled_back_awards(monkeypatch):
+    """コミットされた付与だけがランキングに載る (セーブポイント・全体のロールバック分は載らない)"""
+    board = SortedScoreSet()
+    monkeypatch.setattr(leaderboard_service, "_boards", {"all": (None, math.inf, board)})
+    committed, in_savepoint, rolled_back = (uuid.uuid4() for _ in range(3))
+
+    with Session(create_engine("sqlite://")) as session:
+        session.execute(text("SELECT 1"))
+        leaderboard_service.record_after_commit(session, committed, 100, 100)
+        with pytest.raises(RuntimeError), session.begin_nested():
+            leaderboard_service.record_after_commit(session, in_savepoint, 50, 50)
+            raise RuntimeError
+        assert len(board) == 0
+        session.commit()
+
+        session.execute(text("SELECT 1"))
+        leaderboard_service.record_after_commit(session, rolled_back, 70, 70)
+        session.rollback()
+
+    assert board.range(0, 10) == [(committed, 100)]
+
+
+@pytest.mark.unit
+async def test_record_during_reload_is_kept():
+    """読み込みの応答待ち中に record された付与は差し替え後のランキングに残る"""
+    service = LeaderboardService()
+    loaded, recorded = uuid.uuid4(), uuid.uuid4()
+
+    class _Result:
+        def all(self):
+            return [(loaded, 100)]
+
+    class _DB:
+        async def execute(self, stmt):
+            service.record(recorded, 30, 30)
+            return _Result()
+
+    entries = await service.top(_DB(), "all")
+    assert [(e.user_id, e.xp) for e in entries] == [(loaded, 100), (recorded, 30)]
+
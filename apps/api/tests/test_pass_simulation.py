@@ -0,0 +1,55 @@
+"""合格確率 Monte Carlo シミュレーションのユニットテスト"""
+
+import numpy as np
+import pytest
+
+from src.services.pass_simulation_service import ExamSection, simulate_exams, wilson_interval
+
+
+def _section(questions: int, probs: list[float], weights: list[float] | None = None, weight: float = 50.0):
+    weights = np.asarray(weights or [1.0] * len(probs), dtype=np.float64)
+    return ExamSection(
+        name="section",
+        questions=questions,
+        weight=weight,
+        topic_weights=weights / weights.sum(),
+        correct_probs=np.asarray(probs, dtype=np.float64),
+    )
+
+
+@pytest.mark.unit
+def test_simulate_exams_extremes():
+    """全問正答・全問誤答の確率では得点が決定的になる"""
+    rng = np.random.default_rng(0)
+    assert np.all(simulate_exams([_section(100, [1.0, 1.0])], 500, rng) == 1.0)
+    assert np.all(simulate_exams([_section(100, [0.0])], 500, rng) == 0.0)
+    assert np.all(simulate_exams([], 10, rng) == 0.0)
+
+
+@pytest.mark.unit
+def test_simulate_exams_weighted_mean():
+    """得点の平均は出題比率・配点比率による正答確率の加重平均に一致する"""
+    rng = np.random.default_rng(1)
+    sections = [
+        _section(125, [0.9, 0.5], weights=[3, 1], weight=25),  # 期待値 0.8
+        _section(100, [0.4], weight=75),
+    ]
+    scores = simulate_exams(sections, 20000, rng)
+
+    assert scores.shape == (20000,)
+    assert scores.mean() == pytest.approx(0.25 * 0.8 + 0.75 * 0.4, abs=0.005)
+    # 1セクションの正答率の標準偏差 = sqrt(p(1-p)/n)
+    single = simulate_exams([_section(100, [0.6])], 20000, rng)
+    assert single.std() == pytest.approx(np.sqrt(0.6 * 0.4 / 100), rel=0.05)
+
+
+@pytest.mark.unit
+def test_wilson_interval():
+    """Wilson 区間は推定値を含み、試行回数が増えると狭くなる"""
+    low, high = wilson_interval(700, 1000)
+    assert low < 0.7 < high
+    wide = wilson_interval(70, 100)
+    assert wide[1] - wide[0] > high - low
+    assert wilson_interval(0, 1000)[0] == 0.0
+    assert wilson_interval(1000, 1000)[1] == 1.0
+    assert wilson_interval(0, 0) == (0.0, 0.0)
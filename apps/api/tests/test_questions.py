@@ -109,6 +109,22 @@ async def test_answer_question(client: AsyncClient, seed_questions):
     assert "correct_index" in data
     assert "explanation" in data
 
+@pytest.mark.integration
+async def test_answer_updates_topic_stats(client: AsyncClient, seed_questions):
+    """問題の正誤はトピック別集計に反映され、弱点トピックに現れる"""
+    token = await _register_and_login(client)
+    q_data = seed_questions["CIA"]
+    await client.post(
+        "/api/v1/questions/answer",
+        headers=_auth_headers(token),
+        json={"question_id": str(q_data["question_id"]), "selected_index": 1, "response_time_ms": 5000},
+    )
+    resp = await client.get("/api/v1/dashboard/weak-topics", headers=_auth_headers(token))
+    topics = resp.json()["topics"]
+    assert topics[0]["topic_id"] == str(q_data["topic_id"])
+    assert topics[0]["mastery_score"] == 0
+    assert topics[0]["total_cards"] == 0
+
 @pytest.mark.integration
 async def test_answer_nonexistent_question(client: AsyncClient, seed_all_courses):
     """存在しない問題 → 404"""
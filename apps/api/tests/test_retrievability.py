@@ -0,0 +1,56 @@
+"""想起率エンジンのユニットテスト"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fsrs import Card as FSRSCard
+from fsrs import Scheduler, State
+
+from src.services.retrievability_service import DeckRetrievability, forgetting_curve
+
+
+@pytest.mark.unit
+def test_forgetting_curve_matches_py_fsrs():
+    """py-fsrs の get_card_retrievability と一致する"""
+    scheduler = Scheduler()
+    now = datetime.now(timezone.utc)
+    rng = np.random.default_rng(42)
+    stability = rng.uniform(0.5, 200, size=50)
+    elapsed_hours = rng.uniform(0, 24 * 400, size=50)
+
+    expected = [
+        scheduler.get_card_retrievability(
+            FSRSCard(
+                state=State.Review,
+                stability=float(s),
+                difficulty=5.0,
+                last_review=now - timedelta(hours=float(h)),
+            ),
+            current_datetime=now,
+        )
+        for s, h in zip(stability, elapsed_hours, strict=True)
+    ]
+    actual = forgetting_curve(stability, elapsed_hours / 24, scheduler.parameters[20])
+    np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+
+@pytest.mark.unit
+def test_forgetting_curve_unreviewed_cards_are_zero():
+    """未レビュー (stability=0 / last_review なし) は 0"""
+    actual = forgetting_curve(np.array([0.0, 10.0]), np.array([3.0, np.nan]))
+    assert actual.tolist() == [0.0, 0.0]
+
+
+@pytest.mark.unit
+def test_deck_group_mean():
+    """トピック別平均 (reviewed_only で未レビューを除外)"""
+    deck = DeckRetrievability(
+        course_ids=np.array(["c1", "c1", "c2"], dtype=object),
+        topic_ids=np.array(["t1", "t1", "t2"], dtype=object),
+        retrievability=np.array([0.8, 0.0, 0.6]),
+        reviewed=np.array([True, False, True]),
+    )
+    assert deck.by_topic() == pytest.approx({"t1": 0.4, "t2": 0.6})
+    assert deck.by_topic(reviewed_only=True) == pytest.approx({"t1": 0.8, "t2": 0.6})
+    assert deck.by_course() == pytest.approx({"c1": 0.4, "c2": 0.6})
@@ -0,0 +1,137 @@
+"""レビュー副作用 (write-behind) のテスト"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+
+from src.models.card import ReviewEvent
+from src.services.gamification_service import seed_badges
+from src.services.review_event_service import review_event_processor
+from src.services.session_service import mastery_service
+from tests.conftest import _test_session_factory, auth_headers, register_and_login
+
+
+@pytest.mark.integration
+async def test_review_side_effects_applied_by_worker(client: AsyncClient, seed_all_courses):
+    """レビューAPIは outbox に積むだけで、XP・習熟度・バッジはワーカーが反映する"""
+    async with _test_session_factory() as session:
+        await seed_badges(session)
+
+    token = await register_and_login(client)
+    course_id = str(seed_all_courses["CIA"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={course_id}", headers=auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"]
+    await client.post(
+        "/api/v1/cards/review/batch",
+        headers=auth_headers(token),
+        json={"reviews": [{"card_id": c["id"], "rating": 3} for c in cards]},
+    )
+
+    profile = await client.get("/api/v1/gamification/profile", headers=auth_headers(token))
+    assert profile.json()["total_xp"] == 0
+
+    assert await review_event_processor.drain(_test_session_factory) >= len(cards)
+
+    profile = await client.get("/api/v1/gamification/profile", headers=auth_headers(token))
+    data = profile.json()
+    # Good 15XP × 枚数 + 初回レビューバッジ 20XP
+    assert data["total_xp"] == 15 * len(cards) + 20
+    assert data["course_xp"]["CIA"] == 15 * len(cards)
+    assert "first_review" in {b["code"] for b in data["badges"]}
+
+    mastery = await client.get(f"/api/v1/mastery/{course_id}", headers=auth_headers(token))
+    assert sum(t["total_reviews"] for t in mastery.json()["topics"]) == len(cards)
+
+    async with _test_session_factory() as session:
+        pending = await session.scalar(
+            select(func.count()).select_from(ReviewEvent).where(ReviewEvent.processed_at.is_(None))
+        )
+    assert pending == 0
+
+
+@pytest.mark.integration
+async def test_failing_user_does_not_block_batch(
+    client: AsyncClient, seed_all_courses, monkeypatch
+):
+    """1ユーザーの反映失敗はそのユーザーのイベントだけ巻き戻し、他ユーザーは反映する"""
+    course_id = str(seed_all_courses["CIA"])
+    tokens = [await register_and_login(client) for _ in range(2)]
+    user_ids = []
+    for token in tokens:
+        me = await client.get("/api/v1/auth/me", headers=auth_headers(token))
+        user_ids.append(uuid.UUID(me.json()["id"]))
+        cards_resp = await client.get(
+            f"/api/v1/cards/due?course_id={course_id}", headers=auth_headers(token)
+        )
+        await client.post(
+            "/api/v1/cards/review/batch",
+            headers=auth_headers(token),
+            json={"reviews": [{"card_id": c["id"], "rating": 3} for c in cards_resp.json()["cards"]]},
+        )
+    healthy, poisoned = user_ids
+
+    original = mastery_service.update_mastery_bulk
+
+    async def update_mastery_bulk(db, user_id, reviews):
+        if user_id == poisoned:
+            raise RuntimeError("poisoned event")
+        return await original(db, user_id, reviews)
+
+    monkeypatch.setattr(mastery_service, "update_mastery_bulk", update_mastery_bulk)
+    await review_event_processor.drain(_test_session_factory)
+
+    async with _test_session_factory() as session:
+        rows = (
+            await session.execute(
+                select(ReviewEvent.user_id, ReviewEvent.processed_at, ReviewEvent.attempts)
+                .where(ReviewEvent.user_id.in_(user_ids))
+            )
+        ).all()
+    assert rows
+    for user_id, processed_at, attempts in rows:
+        if user_id == healthy:
+            assert processed_at is not None and attempts == 0
+        else:
+            assert processed_at is None and attempts == 1
+
+    profile = await client.get("/api/v1/gamification/profile", headers=auth_headers(tokens[0]))
+    assert profile.json()["total_xp"] > 0
+    # 失敗したユーザーは XP・ミッション進捗もセーブポイントごと巻き戻る
+    profile = await client.get("/api/v1/gamification/profile", headers=auth_headers(tokens[1]))
+    assert profile.json()["total_xp"] == 0
+
+
+@pytest.mark.integration
+async def test_purge_keeps_pending_events(client: AsyncClient, seed_all_courses):
+    """保持期間を過ぎた処理済みイベントだけ削除し、未処理イベントは残す"""
+    token = await register_and_login(client)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=auth_headers(token))).json()["id"])
+    cards_resp = await client.get(
+        f"/api/v1/cards/due?course_id={seed_all_courses['CIA']}", headers=auth_headers(token)
+    )
+    cards = cards_resp.json()["cards"][:2]
+    await client.post(
+        "/api/v1/cards/review/batch",
+        headers=auth_headers(token),
+        json={"reviews": [{"card_id": c["id"], "rating": 3} for c in cards]},
+    )
+
+    async with _test_session_factory() as session:
+        event_ids = (
+            await session.scalars(select(ReviewEvent.id).where(ReviewEvent.user_id == user_id))
+        ).all()
+        await session.execute(
+            update(ReviewEvent)
+            .where(ReviewEvent.id == event_ids[0])
+            .values(processed_at=datetime.now(timezone.utc) - timedelta(days=8))
+        )
+        assert await review_event_processor.purge(session, retention_days=7) >= 1
+        remaining = (
+            await session.scalars(select(ReviewEvent.id).where(ReviewEvent.user_id == user_id))
+        ).all()
+        await session.rollback()
+    assert set(remaining) == set(event_ids[1:])
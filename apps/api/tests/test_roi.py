@@ -0,0 +1,35 @@
+"""学習ROI推定 (状態遷移からの期待レビュー回数) のユニットテスト"""
+
+import numpy as np
+import pytest
+
+from src.services.roi_service import DEFAULT_TRANSITIONS, MAX_EXPECTED_REVIEWS, expected_reviews
+
+
+@pytest.mark.unit
+def test_expected_reviews_prior_only():
+    """履歴がなければ事前分布の遷移確率から求めた回数 (新規カード ≈ 5.5回)"""
+    reviews = expected_reviews(np.zeros((4, 5)))
+
+    assert reviews.shape == (4,)
+    assert reviews[0] == pytest.approx(5.48, abs=0.01)
+    # New → Learning → Review と進むので、後の状態ほど残り回数が少ない
+    assert reviews[0] > reviews[1] > reviews[2]
+
+
+@pytest.mark.unit
+def test_expected_reviews_follow_history():
+    """実測の遷移が多いほど事前分布より履歴に近づく"""
+    fast = np.zeros((4, 5))
+    fast[0, 2] = fast[2, 4] = fast[1, 2] = fast[3, 2] = 1000  # New → Review → 習熟
+    slow = np.zeros((4, 5))
+    slow[0, 1] = slow[1, 1] = slow[2, 3] = slow[3, 3] = 1000  # 再学習を繰り返す
+
+    assert expected_reviews(fast)[0] == pytest.approx(2.0, abs=0.1)
+    assert expected_reviews(slow)[0] > expected_reviews(np.zeros((4, 5)))[0]
+    assert np.all(expected_reviews(slow) <= MAX_EXPECTED_REVIEWS)
+
+
+@pytest.mark.unit
+def test_default_transitions_are_distributions():
+    np.testing.assert_allclose(DEFAULT_TRANSITIONS.sum(axis=1), 1.0)
@@ -1,8 +1,16 @@
 """セッション・予測エンドポイントのテスト"""
 import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import func, select, update
+
+from src.models.card import CardReview
+from src.models.course import Topic
+from src.models.mastery import ScorePrediction, UserStreak, UserTopicMastery
+from src.services.session_service import MASTERY_ALPHA, mastery_service, session_service
+from tests.conftest import _test_session_factory
 
 
 async def _register_and_login(client: AsyncClient) -> str:
@@ -83,6 +91,88 @@ async def test_prediction(client: AsyncClient, seed_all_courses):
     assert "predicted_score" in data
     assert "pass_probability" in data
 
+
+@pytest.mark.integration
+async def test_prediction_snapshot_only_on_change(client: AsyncClient, seed_all_courses):
+    """合格予測の再取得では予測スナップショットを追加しない"""
+    token = await _register_and_login(client)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=_auth_headers(token))).json()["id"])
+    url = f"/api/v1/predictions/{seed_all_courses['CIA']}"
+
+    first = await client.get(url, headers=_auth_headers(token))
+    second = await client.get(url, headers=_auth_headers(token))
+    assert first.json() == second.json()
+
+    async with _test_session_factory() as db:
+        count = (
+            await db.execute(
+                select(func.count()).where(ScorePrediction.user_id == user_id)
+            )
+        ).scalar()
+    assert count == 1
+
+    resp = await client.get(f"/api/v1/predictions/{uuid.uuid4()}", headers=_auth_headers(token))
+    assert resp.status_code == 404
+
+@pytest.mark.integration
+async def test_prediction_history_downsampled(client: AsyncClient, seed_all_courses):
+    """合格予測の推移は points 個以下の時間バケット平均で返す"""
+    token = await _register_and_login(client)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=_auth_headers(token))).json()["id"])
+    course_id = seed_all_courses["CIA"]
+    end = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    async with _test_session_factory() as db:
+        db.add_all(
+            ScorePrediction(
+                user_id=user_id,
+                course_id=course_id,
+                predicted_score=50 + i,
+                pass_probability=i / 100,
+                weak_topic_count=0,
+                predicted_at=end - timedelta(hours=50 - i),
+            )
+            for i in range(50)
+        )
+        await db.commit()
+
+    resp = await client.get(
+        f"/api/v1/predictions/{course_id}/history",
+        params={"from": (end - timedelta(hours=50)).isoformat(), "to": end.isoformat(), "points": 5},
+        headers=_auth_headers(token),
+    )
+    assert resp.status_code == 200
+    points = resp.json()["points"]
+    assert len(points) == 5
+    assert sum(p["samples"] for p in points) == 50
+    # 1バケット10件 (i = 0..9 → 平均4.5%)
+    assert points[0]["pass_probability"] == 4.5
+    assert [p["predicted_at"] for p in points] == sorted(p["predicted_at"] for p in points)
+
+    bad = await client.get(
+        f"/api/v1/predictions/{course_id}/history",
+        params={"from": end.isoformat(), "to": (end - timedelta(days=1)).isoformat()},
+        headers=_auth_headers(token),
+    )
+    assert bad.status_code == 400
+
+
+@pytest.mark.integration
+async def test_pass_simulation(client: AsyncClient, seed_all_courses):
+    """Monte Carlo 合格確率 (未学習では当て推量のみで不合格)"""
+    token = await _register_and_login(client)
+    resp = await client.get(
+        f"/api/v1/predictions/{seed_all_courses['CIA']}/simulation?runs=2000",
+        headers=_auth_headers(token),
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["runs"] == 2000
+    assert data["ci_low"] <= data["pass_probability"] <= data["ci_high"]
+    assert data["pass_probability"] < 1.0
+    assert data["score_p5"] <= data["score_p50"] <= data["score_p95"]
+    assert data["sims_per_sec"] > 0
+
+
 @pytest.mark.integration
 async def test_roi(client: AsyncClient, seed_all_courses):
     """学習ROI"""
@@ -93,6 +183,18 @@ async def test_roi(client: AsyncClient, seed_all_courses):
         headers=_auth_headers(token),
     )
     assert resp.status_code == 200
+    data = resp.json()
+    assert data["remaining_cards"] == data["total_cards"] - data["mastered_cards"]
+    # 回答時間の履歴がなければ1レビュー30秒
+    assert data["median_seconds_per_review"] == 30.0
+    assert data["expected_reviews_remaining"] > data["remaining_cards"]
+
+    # 2回目は保存済みの推定値を返す
+    again = await client.get(
+        f"/api/v1/predictions/{course_ids['CIA']}/roi",
+        headers=_auth_headers(token),
+    )
+    assert again.json()["computed_at"] == data["computed_at"]
 
 @pytest.mark.integration
 async def test_mastery(client: AsyncClient, seed_all_courses):
@@ -105,8 +207,151 @@ async def test_mastery(client: AsyncClient, seed_all_courses):
     )
     assert resp.status_code == 200
 
+@pytest.mark.integration
+async def test_mastery_bulk_upsert(client: AsyncClient, seed_all_courses):
+    """一括更新は1レビューずつの指数移動平均と同じ結果になり、行は1つだけ"""
+    token = await _register_and_login(client)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=_auth_headers(token))).json()["id"])
+    async with _test_session_factory() as db:
+        topic_id = await db.scalar(
+            select(Topic.id).where(Topic.course_id == seed_all_courses["CIA"]).limit(1)
+        )
+        await mastery_service.update_mastery_bulk(
+            db, user_id, [(topic_id, True, 4000), (topic_id, False, 0)]
+        )
+        await mastery_service.update_mastery(db, user_id, topic_id, True, 2000)
+        await db.commit()
+
+        rows = (
+            await db.execute(
+                select(UserTopicMastery).where(
+                    UserTopicMastery.user_id == user_id, UserTopicMastery.topic_id == topic_id
+                )
+            )
+        ).scalars().all()
+
+    expected_score, expected_ms = 0.0, 0.0
+    for is_correct, response_ms in [(True, 4000), (False, 0), (True, 2000)]:
+        expected_score = MASTERY_ALPHA * is_correct + (1 - MASTERY_ALPHA) * expected_score
+        if response_ms:
+            expected_ms = MASTERY_ALPHA * response_ms + (1 - MASTERY_ALPHA) * expected_ms
+    assert len(rows) == 1
+    assert float(rows[0].mastery_score) == pytest.approx(expected_score, abs=1e-3)
+    assert rows[0].avg_response_ms == pytest.approx(expected_ms, abs=1)
+    assert (rows[0].total_reviews, rows[0].correct_reviews) == (3, 2)
+
+
 @pytest.mark.integration
 async def test_session_unauthenticated(client: AsyncClient):
     """未認証 → 401"""
     resp = await client.post("/api/v1/sessions/start", json={"course_id": "00000000-0000-0000-0000-000000000001"})
     assert resp.status_code == 401
+
+
+async def _start_review_session(client: AsyncClient, token: str, course_id) -> dict:
+    resp = await client.post(
+        "/api/v1/sessions/start",
+        headers=_auth_headers(token),
+        json={"course_id": str(course_id), "session_type": "review"},
+    )
+    return resp.json()
+
+
+@pytest.mark.integration
+async def test_session_queue_pop(client: AsyncClient, seed_all_courses):
+    """復習キューを先頭から取り出し、重複なく消化する"""
+    token = await _register_and_login(client)
+    session = await _start_review_session(client, token, seed_all_courses["CIA"])
+    assert session["queue_size"] == 3
+
+    first = await client.get(
+        f"/api/v1/sessions/{session['session_id']}/next?n=2", headers=_auth_headers(token)
+    )
+    assert first.status_code == 200
+    assert len(first.json()["cards"]) == 2
+    assert first.json()["remaining"] == 1
+
+    second = await client.get(
+        f"/api/v1/sessions/{session['session_id']}/next?n=2&compact=true",
+        headers=_auth_headers(token),
+    )
+    cards = second.json()["cards"]
+    assert len(cards) == 1
+    assert set(cards[0]) == {"id", "course_id", "front", "back", "state", "due"}
+    assert second.json()["remaining"] == 0
+    assert cards[0]["id"] not in {c["id"] for c in first.json()["cards"]}
+
+
+@pytest.mark.integration
+async def test_session_queue_requeues_relearning_card(client: AsyncClient, seed_all_courses):
+    """キュー作成後に期日が来た再学習カードは、キュー枯渇前でも再投入される"""
+    token = await _register_and_login(client)
+    session = await _start_review_session(client, token, seed_all_courses["CIA"])
+    first = await client.get(
+        f"/api/v1/sessions/{session['session_id']}/next?n=2", headers=_auth_headers(token)
+    )
+    failed_id = first.json()["cards"][0]["id"]
+    await client.post(
+        "/api/v1/cards/review",
+        headers=_auth_headers(token),
+        json={"card_id": failed_id, "rating": 1, "response_time_ms": 4000},
+    )
+    # 学習ステップ (数分後) の経過を再現
+    async with _test_session_factory() as db:
+        await db.execute(
+            update(CardReview)
+            .where(CardReview.card_id == uuid.UUID(failed_id))
+            .values(due=func.now())
+        )
+        await db.commit()
+
+    resp = await client.get(
+        f"/api/v1/sessions/{session['session_id']}/next?n=5", headers=_auth_headers(token)
+    )
+    ids = [c["id"] for c in resp.json()["cards"]]
+    assert failed_id in ids
+    assert len(ids) >= 2  # 未消化の1枚 + 再学習カード
+
+
+@pytest.mark.integration
+async def test_session_queue_other_user(client: AsyncClient, seed_all_courses):
+    """他ユーザーのセッション → 404"""
+    owner = await _register_and_login(client)
+    session = await _start_review_session(client, owner, seed_all_courses["CIA"])
+    other = await _register_and_login(client)
+    resp = await client.get(
+        f"/api/v1/sessions/{session['session_id']}/next", headers=_auth_headers(other)
+    )
+    assert resp.status_code == 404
+
+
+@pytest.mark.integration
+async def test_streak_tracking(client: AsyncClient, seed_all_courses):
+    """セッション開始で連続学習日数を増分更新し、study_sessions から再構築できる"""
+    token = await _register_and_login(client)
+    user_id = uuid.UUID((await client.get("/api/v1/auth/me", headers=_auth_headers(token))).json()["id"])
+
+    await _start_review_session(client, token, seed_all_courses["CIA"])
+    await _start_review_session(client, token, seed_all_courses["CIA"])
+    resp = await client.get("/api/v1/sessions/today", headers=_auth_headers(token))
+    assert resp.json()["streak_days"] == 1
+
+    # 昨日まで4日連続 → 今日の学習で5日
+    async with _test_session_factory() as db:
+        await db.execute(
+            update(UserStreak)
+            .where(UserStreak.user_id == user_id)
+            .values(current_streak=4, longest_streak=4, last_active_date=UserStreak.last_active_date - 1)
+        )
+        await db.commit()
+    await _start_review_session(client, token, seed_all_courses["CIA"])
+    resp = await client.get("/api/v1/sessions/today", headers=_auth_headers(token))
+    assert resp.json()["streak_days"] == 5
+    assert resp.json()["longest_streak"] == 5
+
+    # セッションは今日の分だけ → 再構築で1日
+    async with _test_session_factory() as db:
+        assert await session_service.rebuild_streaks(db, user_id) == 1
+        await db.commit()
+    resp = await client.get("/api/v1/sessions/today", headers=_auth_headers(token))
+    assert resp.json()["streak_days"] == 1